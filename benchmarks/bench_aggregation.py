@@ -0,0 +1,64 @@
+# Dashboard metrics: the per-metric Python loops of the former
+# update_dashboard() vs the single-pass NumPy aggregation.
+# Run from the repository root: python -m benchmarks.bench_aggregation
+import time
+from collections import defaultdict
+from src.common.aggregation import variant_table, summarize
+from src.common.models import Product, Variant
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = ['noir', 'blanc', 'rouge', 'bleu', 'vert', 'gris', 'beige', 'marine', 'rose', 'jaune']
+
+def make_products(n_variants, variants_per_product=4):
+    return [Product(i, f"REF{i:07d}", f"Produit {i}", i % 50 + 1, i % 20 + 1, 5.0 + i % 90,
+                    [Variant(SIZES[(i + j) % len(SIZES)], COLORS[(i * 7 + j) % len(COLORS)], (i + j) % 25)
+                     for j in range(variants_per_product)])
+            for i in range(1, n_variants // variants_per_product + 1)]
+
+def loop_metrics(products):
+    # One pass per metric, as the dashboard used to compute them
+    total_value = sum(p.price * sum(v.quantity for v in p.variants) for p in products)
+    low_stock = sum(1 for p in products if sum(v.quantity for v in p.variants) < 10)
+    by_category = defaultdict(int)
+    for p in products:
+        by_category[p.category_id] += sum(v.quantity for v in p.variants)
+    by_color = defaultdict(int)
+    for p in products:
+        for v in p.variants:
+            by_color[v.color] += v.quantity
+    sizes = sorted({v.size for p in products for v in p.variants})
+    colors = sorted({v.color for p in products for v in p.variants})
+    heatmap = [[0 for _ in colors] for _ in sizes]
+    for p in products:
+        for v in p.variants:
+            heatmap[sizes.index(v.size)][colors.index(v.color)] += v.quantity
+    by_supplier = defaultdict(int)
+    for p in products:
+        by_supplier[p.supplier_id] += sum(v.quantity for v in p.variants)
+    return total_value, low_stock, by_category, by_color, heatmap, by_supplier
+
+def run(n_variants):
+    products = make_products(n_variants)
+
+    start = time.perf_counter()
+    total_value, low_stock, by_category, by_color, heatmap, by_supplier = loop_metrics(products)
+    loops = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = variant_table(products)
+    flatten = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = summarize(table)
+    aggregate = time.perf_counter() - start
+
+    assert abs(summary.total_value - total_value) < 1e-6 * max(total_value, 1)
+    assert summary.low_stock_count == low_stock
+    assert summary.by_category == by_category and summary.by_supplier == by_supplier
+    assert summary.by_color == by_color and summary.size_color.tolist() == heatmap
+    print(f"{n_variants:>9} variants: loops {loops * 1000:7.0f} ms, "
+          f"single pass {(flatten + aggregate) * 1000:7.0f} ms "
+          f"(flatten {flatten * 1000:.0f} ms, aggregate {aggregate * 1000:.1f} ms)")
+
+if __name__ == '__main__':
+    for n_variants in (10_000, 100_000, 1_000_000):
+        run(n_variants)
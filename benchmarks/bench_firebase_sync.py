@@ -0,0 +1,46 @@
+# Delta sync throughput against the in-process Realtime Database fake.
+# Run from the repository root: python -m benchmarks.bench_firebase_sync
+import os
+import tempfile
+import time
+from src.common.firebase_fake import FakeRealtimeDatabase
+from src.common.firebase_sync import FirebaseSync
+
+def run(n_records=100_000, batch_size=500):
+    fake = FakeRealtimeDatabase()
+    outbox = os.path.join(tempfile.mkdtemp(), 'outbox.jsonl')
+    sync = FirebaseSync(fake.reference('/'), outbox, batch_size=batch_size)
+    sync.seeded = True
+    updates = {f"movements/{i}": {'id': i, 'product_id': i % 1000, 'type': 'in', 'quantity': 1,
+                                  'reason': '', 'user': '', 'date': '2024-01-01T00:00:00'}
+               for i in range(1, n_records + 1)}
+
+    start = time.perf_counter()
+    sync.enqueue(updates)
+    enqueue_time = time.perf_counter() - start
+
+    # Offline: nothing leaves the queue
+    fake.offline = True
+    sync.push()
+    assert sync.pending_count() == n_records
+
+    fake.offline = False
+    start = time.perf_counter()
+    pushed = sync.push(force=True)
+    push_time = time.perf_counter() - start
+
+    assert pushed == n_records and sync.pending_count() == 0
+    assert len(fake.reference('/movements').get()) == n_records
+    print(f"{n_records} records: enqueue {enqueue_time * 1000:.0f} ms, "
+          f"push {push_time * 1000:.0f} ms ({n_records / push_time:,.0f} records/s, "
+          f"{fake.calls} update() calls, {fake.bytes_sent / 1e6:.1f} MB)")
+
+    # A single edit afterwards costs one small call
+    calls, sent = fake.calls, fake.bytes_sent
+    sync.enqueue({'movements/1': None})
+    sync.push()
+    print(f"single delete: {fake.calls - calls} call, {fake.bytes_sent - sent} bytes")
+
+if __name__ == '__main__':
+    for n in (1_000, 10_000, 100_000):
+        run(n)
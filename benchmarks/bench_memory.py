@@ -0,0 +1,103 @@
+# Memory retained per loaded record: the former __dict__ dataclasses against
+# the slotted, interned models.
+# Run from the repository root: python -m benchmarks.bench_memory
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+from src.common import fastjson
+from src.common.serialization import FROM_DICTS
+
+@dataclass
+class LegacyVariant:
+    size: str
+    color: str
+    quantity: int
+    sku: str = ""
+
+@dataclass
+class LegacyProduct:
+    id: int
+    reference: str
+    name: str
+    category_id: int
+    supplier_id: int
+    price: float
+    variants: List[LegacyVariant] = field(default_factory=list)
+    photos: List[str] = field(default_factory=list)
+    barcode: str = ""
+    description: str = ""
+    created_at: datetime = field(default_factory=datetime.now)
+    updated_at: datetime = field(default_factory=datetime.now)
+
+@dataclass
+class LegacyMovement:
+    id: int
+    product_id: int
+    type: str
+    quantity: int
+    reason: str = ""
+    user: str = ""
+    date: datetime = field(default_factory=datetime.now)
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = ['rouge', 'bleu', 'vert', 'noir', 'blanc', 'gris', 'beige', 'marine']
+
+def make_json(n_products, variants_per_product, n_movements):
+    date = datetime(2024, 1, 1).isoformat()
+    products = [{'id': i, 'reference': f"REF{i:06d}", 'name': f"Produit {i}", 'category_id': 1000 + i % 40,
+                 'supplier_id': 1000 + i % 15, 'price': 19.9,
+                 'variants': [{'size': SIZES[j % 6], 'color': COLORS[j % 8], 'quantity': j, 'sku': f"{i}-{j}"}
+                              for j in range(variants_per_product)],
+                 'photos': [], 'barcode': '', 'description': '', 'created_at': date, 'updated_at': date}
+                for i in range(1, n_products + 1)]
+    movements = [{'id': i, 'product_id': 1000 + i % n_products, 'type': 'in' if i % 3 else 'out', 'quantity': 1,
+                  'reason': 'réception', 'user': 'admin', 'date': date}
+                 for i in range(1, n_movements + 1)]
+    return json.dumps(products).encode(), json.dumps(movements).encode()
+
+def legacy_products(items):
+    return [LegacyProduct(**{**d, 'variants': [LegacyVariant(**v) for v in d['variants']],
+                             'created_at': datetime.fromisoformat(d['created_at']),
+                             'updated_at': datetime.fromisoformat(d['updated_at'])}) for d in items]
+
+def legacy_movements(items):
+    return [LegacyMovement(**{**d, 'date': datetime.fromisoformat(d['date'])}) for d in items]
+
+def slotted_products(items):
+    records = FROM_DICTS['products'](items)
+    for p in records:
+        # Materialize the lazy variants and dates, as the dashboard does
+        p.variants, p.created_at, p.updated_at
+    return records
+
+def slotted_movements(items):
+    records = FROM_DICTS['movements'](items)
+    for m in records:
+        m.date
+    return records
+
+def retained(loader, data):
+    gc.collect()
+    tracemalloc.start()
+    records = loader(fastjson.loads(data))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, len(records)
+
+def run(n_products=50_000, variants_per_product=10, n_movements=200_000):
+    products_json, movements_json = make_json(n_products, variants_per_product, n_movements)
+    n_variants = n_products * variants_per_product
+    print(f"{n_products} products ({n_variants} variants), {n_movements} movements")
+    for label, data, loaders in (
+            ('products', products_json, (('before', legacy_products), ('after', slotted_products))),
+            ('movements', movements_json, (('before', legacy_movements), ('after', slotted_movements)))):
+        for version, loader in loaders:
+            size, count = retained(loader, data)
+            print(f"  {label:9} {version:6}: {size / 1e6:7.1f} MB, {size / count:6.0f} bytes per record")
+
+if __name__ == '__main__':
+    run()
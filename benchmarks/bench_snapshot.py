@@ -0,0 +1,64 @@
+# Cold-start load time and file size: JSON files vs the binary snapshot.
+# Run from the repository root: python -m benchmarks.bench_snapshot
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from src.common import fastjson, snapshot
+from src.common.models import Category, Supplier, Product, Movement, Variant
+from src.common.serialization import TO_DICT, FROM_DICTS
+
+def make_collections(n_products, n_movements):
+    now = datetime(2024, 1, 1)
+    return {
+        'categories': [Category(i, f"Catégorie {i}") for i in range(1, 51)],
+        'suppliers': [Supplier(i, f"Fournisseur {i}", 'contact', 'a@b.fr', '0102030405') for i in range(1, 21)],
+        'products': [Product(i, f"REF{i:06d}", f"Produit {i}", i % 50 + 1, i % 20 + 1, 9.99,
+                             [Variant('M', 'rouge', 3, f"SKU{i}-M"), Variant('L', 'bleu', 5, f"SKU{i}-L")],
+                             barcode=f"{i:013d}", created_at=now, updated_at=now)
+                     for i in range(1, n_products + 1)],
+        'movements': [Movement(i, i % n_products + 1, 'in', 1, 'réception', 'admin', now)
+                      for i in range(1, n_movements + 1)],
+    }
+
+def run(n_products, n_movements):
+    collections = make_collections(n_products, n_movements)
+    directory = tempfile.mkdtemp()
+
+    # JSON layout as written by storage (one indented file per collection)
+    start = time.perf_counter()
+    json_size = 0
+    for data_type, records in collections.items():
+        path = os.path.join(directory, f"{data_type}.json")
+        with open(path, 'w') as f:
+            json.dump([TO_DICT[data_type](r) for r in records], f, indent=4)
+        json_size += os.path.getsize(path)
+    json_save = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data_type in collections:
+        FROM_DICTS[data_type](fastjson.load_file(os.path.join(directory, f"{data_type}.json")))
+    json_load = time.perf_counter() - start
+    print(f"{n_products} products / {n_movements} movements")
+    print(f"  json ({fastjson.BACKEND}): {json_size / 1e6:6.1f} MB, save {json_save * 1000:6.0f} ms, "
+          f"load {json_load * 1000:6.0f} ms")
+
+    compressions = ['none', 'gzip'] + (['zstd'] if snapshot.zstandard is not None else [])
+    for compression in compressions:
+        path = os.path.join(directory, f"stock.{compression}.snapshot")
+        start = time.perf_counter()
+        size = snapshot.write_snapshot(path, collections, {'journal_seq': 0}, compression)
+        save_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded, _ = snapshot.read_snapshot(path)
+        load_time = time.perf_counter() - start
+        assert len(loaded['movements']) == n_movements
+        assert loaded['products'][-1].variants[-1].sku == f"SKU{n_products}-L"
+        print(f"  snapshot {compression:>4}: {size / 1e6:6.1f} MB, save {save_time * 1000:6.0f} ms, "
+              f"load {load_time * 1000:6.0f} ms")
+
+if __name__ == '__main__':
+    for n_products, n_movements in ((1_000, 10_000), (10_000, 100_000), (50_000, 1_000_000)):
+        run(n_products, n_movements)
@@ -0,0 +1,441 @@
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .models import products, raw_value, RawRecords
+from .movement_store import StringPool
+from .events import change_bus, REMOVED, RELOADED
+
+# Dashboard metrics in one pass: the products are flattened once into a
+# variant table (one row per variant, sizes and colors as codes), then every
+# metric is a NumPy bincount / dot product over those arrays. Between two
+# full passes, StockAggregates keeps the same metrics up to date per event.
+
+LOW_STOCK_THRESHOLD = 10
+TOP_PRODUCTS = 10
+
+@dataclass
+class VariantTable:
+    # Per product
+    product_ids: np.ndarray
+    prices: np.ndarray
+    category_ids: np.ndarray  # -1 when unset
+    supplier_ids: np.ndarray
+    # Per variant
+    product_rows: np.ndarray  # row of the variant's product in the arrays above
+    quantities: np.ndarray
+    size_codes: np.ndarray
+    color_codes: np.ndarray
+    sizes: StringPool
+    colors: StringPool
+
+@dataclass
+class StockSummary:
+    total_value: float = 0.0
+    product_count: int = 0
+    low_stock_count: int = 0
+    by_category: Dict[int, int] = field(default_factory=dict)  # category id (-1: none) -> quantity
+    by_supplier: Dict[int, int] = field(default_factory=dict)
+    by_color: Dict[str, int] = field(default_factory=dict)
+    # Heatmap: size_color[i][j] for sizes[i], colors[j], both sorted
+    sizes: List[str] = field(default_factory=list)
+    colors: List[str] = field(default_factory=list)
+    size_color: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=np.int64))
+    top_products: List[Tuple[int, int]] = field(default_factory=list)  # (product id, quantity), most stocked first
+
+def variant_table(records=None):
+    records = products if records is None else records
+    count = len(records)
+    sizes = StringPool()
+    colors = StringPool()
+    size_code = sizes.code
+    color_code = colors.code
+    product_rows = []
+    quantities = []
+    size_codes = []
+    color_codes = []
+    for row, p in enumerate(records):
+        # Loader dicts are read as is, without building Variant objects
+        variants = raw_value(p, 'variants')
+        if type(variants) is RawRecords:
+            for v in variants:
+                product_rows.append(row)
+                quantities.append(v.get('quantity', 0))
+                size_codes.append(size_code(v['size']))
+                color_codes.append(color_code(v['color']))
+        else:
+            for v in variants:
+                product_rows.append(row)
+                quantities.append(v.quantity)
+                size_codes.append(size_code(v.size))
+                color_codes.append(color_code(v.color))
+    return VariantTable(
+        product_ids=np.fromiter((p.id for p in records), dtype=np.int64, count=count),
+        prices=np.fromiter((p.price for p in records), dtype=np.float64, count=count),
+        category_ids=np.fromiter((-1 if p.category_id is None else p.category_id for p in records),
+                                 dtype=np.int64, count=count),
+        supplier_ids=np.fromiter((-1 if p.supplier_id is None else p.supplier_id for p in records),
+                                 dtype=np.int64, count=count),
+        product_rows=np.array(product_rows, dtype=np.int64),
+        quantities=np.array(quantities, dtype=np.int64),
+        size_codes=np.array(size_codes, dtype=np.int64),
+        color_codes=np.array(color_codes, dtype=np.int64),
+        sizes=sizes,
+        colors=colors,
+    )
+
+def _sum_by(keys, weights):
+    # {key: sum of weights}, keys being arbitrary ints (ids)
+    if not len(keys):
+        return {}
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=weights, minlength=len(unique))
+    return dict(zip(unique.tolist(), sums.astype(np.int64).tolist()))
+
+def summarize(table, low_stock_threshold=LOW_STOCK_THRESHOLD, top=TOP_PRODUCTS):
+    count = len(table.product_ids)
+    if not count:
+        return StockSummary()
+    product_quantities = np.bincount(table.product_rows, weights=table.quantities,
+                                     minlength=count).astype(np.int64)
+
+    # Heatmap: one bincount over size * n_colors + color, then sorted labels
+    n_sizes = len(table.sizes.values)
+    n_colors = len(table.colors.values)
+    cells = np.bincount(table.size_codes * n_colors + table.color_codes, weights=table.quantities,
+                        minlength=n_sizes * n_colors).astype(np.int64).reshape(n_sizes, n_colors)
+    size_order = np.argsort(np.array(table.sizes.values, dtype=object), kind='stable')
+    color_order = np.argsort(np.array(table.colors.values, dtype=object), kind='stable')
+    by_color = cells.sum(axis=0)
+
+    # Most stocked products, ties in store order: only the rows reaching
+    # the top-th quantity are sorted
+    top_rows = np.arange(count)
+    if count > top:
+        kth = np.partition(product_quantities, count - top)[count - top]
+        top_rows = np.flatnonzero(product_quantities >= kth)
+    top_rows = top_rows[np.argsort(-product_quantities[top_rows], kind='stable')][:top]
+    return StockSummary(
+        total_value=float(table.prices @ product_quantities),
+        product_count=count,
+        low_stock_count=int((product_quantities < low_stock_threshold).sum()),
+        by_category=_sum_by(table.category_ids, product_quantities),
+        by_supplier=_sum_by(table.supplier_ids, product_quantities),
+        by_color=dict(zip(table.colors.values, by_color.tolist())),
+        sizes=[table.sizes.values[i] for i in size_order],
+        colors=[table.colors.values[i] for i in color_order],
+        size_color=cells[np.ix_(size_order, color_order)],
+        top_products=list(zip(table.product_ids[top_rows].tolist(), product_quantities[top_rows].tolist())),
+    )
+
+def stock_summary(records=None, low_stock_threshold=LOW_STOCK_THRESHOLD):
+    return summarize(variant_table(records), low_stock_threshold)
+
+@dataclass(frozen=True, slots=True)
+class StockState:
+    # What the aggregates hold of a product, to undo its contribution when
+    # it changes
+    price: float
+    quantity: int
+    name: str
+    category_id: int
+    supplier_id: int
+    cells: Tuple  # (size, color, quantity) per variant
+
+def stock_state(product):
+    variants = raw_value(product, 'variants')
+    if type(variants) is RawRecords:
+        cells = tuple((v['size'], v['color'], v.get('quantity', 0)) for v in variants)
+    else:
+        cells = tuple((v.size, v.color, v.quantity) for v in variants)
+    return StockState(product.price, sum(c[2] for c in cells), product.name,
+                      -1 if product.category_id is None else product.category_id,
+                      -1 if product.supplier_id is None else product.supplier_id, cells)
+
+def _add(totals, key, quantity):
+    # Zero totals are dropped (_matches() drops them from the full recompute)
+    total = totals.get(key, 0) + quantity
+    if total:
+        totals[key] = total
+    else:
+        totals.pop(key, None)
+
+def _nonzero(totals):
+    return {k: v for k, v in totals.items() if v}
+
+class StockTotals:
+    # The metrics of a set of products, with the state of each product they
+    # sum: an edit subtracts the product's previous contribution and adds
+    # the new one, in O(variants). Plain data, so it can be built on a
+    # worker thread from a list of products.
+    def __init__(self, low_stock_threshold=LOW_STOCK_THRESHOLD, top=TOP_PRODUCTS):
+        self.low_stock_threshold = low_stock_threshold
+        self.top = top
+        self.states = {}  # product id -> StockState
+        self.product_count = 0
+        self.total_value = 0.0
+        self.low_stock_count = 0
+        self.by_category = {}
+        self.by_supplier = {}
+        self.by_color = {}
+        self.by_cell = {}  # (size, color) -> quantity
+        self.ranked = None  # top [(product id, quantity)], recomputed when it may have changed
+        self.changed = set()  # metrics changed since StockAggregates.take_changes()
+        self.version = 0  # bumped by apply()
+
+    @classmethod
+    def build(cls, records, low_stock_threshold=LOW_STOCK_THRESHOLD, top=TOP_PRODUCTS):
+        totals = cls(low_stock_threshold, top)
+        for p in records:
+            totals.apply(p.id, None, stock_state(p))
+        totals.changed = set(METRICS)
+        return totals
+
+    def frozen(self):
+        # Copy for a worker thread: the states are immutable, the dicts are
+        # not. Ranking needs every state; once ranked, the top ones are enough.
+        copy = StockTotals(self.low_stock_threshold, self.top)
+        if self.ranked is None:
+            copy.states = dict(self.states)
+        else:
+            copy.states = {pid: self.states[pid] for pid, _ in self.ranked}
+        copy.product_count = self.product_count
+        copy.total_value = self.total_value
+        copy.low_stock_count = self.low_stock_count
+        copy.by_category = dict(self.by_category)
+        copy.by_supplier = dict(self.by_supplier)
+        copy.by_color = dict(self.by_color)
+        copy.by_cell = dict(self.by_cell)
+        copy.ranked = self.ranked
+        copy.version = self.version
+        return copy
+
+    def apply(self, product_id, old, new):
+        # Moves the product from its old state to the new one (None: absent)
+        self.version += 1
+        changed = self.changed
+        top = self.ranked
+        if old is not None:
+            if new is None:
+                del self.states[product_id]
+                self.product_count -= 1
+            self.total_value -= old.price * old.quantity
+            self.low_stock_count -= old.quantity < self.low_stock_threshold
+            _add(self.by_category, old.category_id, -old.quantity)
+            _add(self.by_supplier, old.supplier_id, -old.quantity)
+            for size, color, quantity in old.cells:
+                _add(self.by_color, color, -quantity)
+                _add(self.by_cell, (size, color), -quantity)
+        if new is not None:
+            # Updated in place: the dict keeps the store order for top ties
+            if old is None:
+                self.product_count += 1
+            self.states[product_id] = new
+            self.total_value += new.price * new.quantity
+            self.low_stock_count += new.quantity < self.low_stock_threshold
+            _add(self.by_category, new.category_id, new.quantity)
+            _add(self.by_supplier, new.supplier_id, new.quantity)
+            for size, color, quantity in new.cells:
+                _add(self.by_color, color, quantity)
+                _add(self.by_cell, (size, color), quantity)
+
+        if old is None or new is None:
+            changed.update(METRICS)
+            self.ranked = None
+            return
+        if old.price != new.price or old.quantity != new.quantity:
+            changed.add('value')
+        if old.quantity != new.quantity:
+            changed.update(('low_stock', 'category', 'supplier'))
+        if old.category_id != new.category_id:
+            changed.add('category')
+        if old.supplier_id != new.supplier_id:
+            changed.add('supplier')
+        if old.cells != new.cells:
+            changed.update(('color', 'size_color'))
+        # The top list only changes if the product is in it or enters it
+        if top is not None and (old.quantity != new.quantity or old.name != new.name):
+            in_top = any(pid == product_id for pid, _ in top)
+            if in_top or len(top) < self.top or new.quantity >= top[-1][1]:
+                self.ranked = None
+                changed.add('top_products')
+
+    def apply_event(self, event):
+        for p in event.records:
+            old = self.states.get(p.id)
+            if event.kind == REMOVED:
+                if old is not None:
+                    self.apply(p.id, old, None)
+            else:
+                self.apply(p.id, old, stock_state(p))
+
+    def top_products(self):
+        if self.ranked is None:
+            # Ties in store order, as in summarize()
+            ranked = heapq.nlargest(self.top, enumerate(self.states.items()),
+                                    key=lambda item: (item[1][1].quantity, -item[0]))
+            self.ranked = [(pid, state.quantity) for _, (pid, state) in ranked]
+        return self.ranked
+
+    def summary(self):
+        # The totals as a StockSummary, without a pass over the products
+        sizes = sorted({size for size, _ in self.by_cell})
+        colors = sorted({color for _, color in self.by_cell})
+        size_color = np.array([[self.by_cell.get((size, color), 0) for color in colors] for size in sizes],
+                              dtype=np.int64).reshape(len(sizes), len(colors))
+        return StockSummary(
+            total_value=self.total_value,
+            product_count=self.product_count,
+            low_stock_count=self.low_stock_count,
+            by_category=dict(self.by_category),
+            by_supplier=dict(self.by_supplier),
+            by_color=dict(self.by_color),
+            sizes=sizes,
+            colors=colors,
+            size_color=size_color,
+            top_products=list(self.top_products()),
+        )
+
+def _matches(actual, expected):
+    # actual from StockTotals.summary(), expected from stock_summary()
+    rows = expected.size_color.any(axis=1)
+    columns = expected.size_color.any(axis=0)
+    return (abs(actual.total_value - expected.total_value) <= 1e-6 * max(abs(expected.total_value), 1.0)
+            and actual.product_count == expected.product_count
+            and actual.low_stock_count == expected.low_stock_count
+            and actual.by_category == _nonzero(expected.by_category)
+            and actual.by_supplier == _nonzero(expected.by_supplier)
+            and actual.by_color == _nonzero(expected.by_color)
+            and actual.sizes == [s for s, keep in zip(expected.sizes, rows) if keep]
+            and actual.colors == [c for c, keep in zip(expected.colors, columns) if keep]
+            and np.array_equal(actual.size_color, expected.size_color[np.ix_(rows, columns)]))
+
+@dataclass
+class AggregatesSnapshot:
+    # Taken by StockAggregates.snapshot() on the GUI thread, computed by
+    # compute_aggregates() on a worker
+    epoch: int
+    totals: Optional[StockTotals]  # frozen copy, None when not built yet
+    records: Optional[list] = None  # products to build from or check against
+    start: int = 0  # events published after the snapshot: backlog[start:]
+    low_stock_threshold: int = LOW_STOCK_THRESHOLD
+    top: int = TOP_PRODUCTS
+
+@dataclass
+class AggregatesResult:
+    snapshot: AggregatesSnapshot
+    summary: StockSummary
+    product_names: Dict[int, str]  # of the top products
+    ranked: List[Tuple[int, int]]
+    rebuilt: Optional[StockTotals] = None
+    drift: float = 0.0  # rounding drift of total_value found by a check
+
+def compute_aggregates(snapshot):
+    # Worker side: builds the totals, or checks them against a full
+    # recompute (rebuilding them on a mismatch), then summarizes
+    totals = snapshot.totals
+    rebuilt = None
+    drift = 0.0
+    if totals is None:
+        rebuilt = totals = StockTotals.build(snapshot.records, snapshot.low_stock_threshold, snapshot.top)
+    elif snapshot.records is not None:
+        expected = stock_summary(snapshot.records, snapshot.low_stock_threshold)
+        if _matches(totals.summary(), expected):
+            drift = expected.total_value - totals.total_value
+        else:
+            # A record edited without touch()...
+            rebuilt = totals = StockTotals.build(snapshot.records, snapshot.low_stock_threshold, snapshot.top)
+    summary = totals.summary()
+    names = {pid: totals.states[pid].name for pid, _ in summary.top_products}
+    return AggregatesResult(snapshot, summary, names, totals.ranked, rebuilt, drift)
+
+class StockAggregates:
+    # Dashboard metrics kept up to date from the product change events.
+    # Stock movements change quantities through the product they touch, so
+    # they need no handling of their own. Building the totals and checking
+    # them against a full recompute are left to a worker: snapshot() hands
+    # out what it needs, adopt() takes the result back and replays the
+    # events published in between.
+    def __init__(self, store, low_stock_threshold=LOW_STOCK_THRESHOLD, top=TOP_PRODUCTS):
+        self.store = store
+        self.low_stock_threshold = low_stock_threshold
+        self.top = top
+        self._totals = None  # StockTotals
+        # Bumped by invalidate(): results of older snapshots are dropped
+        self._epoch = 0
+        # Events since the first snapshot holding records that is not
+        # adopted yet, None when there is none
+        self._backlog = None
+        change_bus.subscribe(self._on_change, store.name)
+
+    def invalidate(self):
+        # Rebuilt by the next snapshot; events are ignored until then
+        self._totals = None
+        self._backlog = None
+        self._epoch += 1
+
+    def building(self):
+        return self._totals is None and self._backlog is not None
+
+    def _on_change(self, event):
+        if event.kind == RELOADED:
+            self.invalidate()
+            return
+        if self._backlog is not None:
+            self._backlog.append(event)
+        if self._totals is not None:
+            self._totals.apply_event(event)
+
+    def take_changes(self):
+        # Metrics changed since the last call: all of them when not built,
+        # none while a build is in flight (adopting it reports the changes)
+        if self._totals is None:
+            return set() if self.building() else set(METRICS)
+        changed, self._totals.changed = self._totals.changed, set()
+        return changed
+
+    def snapshot(self, check=False):
+        # What compute_aggregates() needs; None while a build is in flight.
+        # Only a build or a check copies the product list.
+        if self.building():
+            return None
+        records = None
+        start = 0
+        if self._totals is None or check:
+            records = list(self.store)
+            if self._backlog is None:
+                self._backlog = []
+            start = len(self._backlog)
+        totals = self._totals.frozen() if self._totals is not None else None
+        return AggregatesSnapshot(self._epoch, totals, records, start, self.low_stock_threshold, self.top)
+
+    def adopt(self, result):
+        # Takes back what compute_aggregates() found. Returns True when the
+        # totals were replaced (built, or rebuilt after a failed check).
+        snapshot = result.snapshot
+        if snapshot.epoch != self._epoch:
+            return False
+        totals = self._totals
+        if snapshot.records is None:
+            if totals is not None and totals.ranked is None and totals.version == snapshot.totals.version:
+                totals.ranked = result.ranked
+            return False
+        if self._backlog is None:
+            return False  # a newer snapshot was adopted first
+        backlog, self._backlog = self._backlog[snapshot.start:], None
+        if result.rebuilt is None:
+            # Checked and matched: clears the rounding drift of the running sum
+            totals.total_value += result.drift
+            return False
+        if totals is not None:
+            print("Agrégats du dashboard incohérents, recalcul complet")
+        self._totals = totals = result.rebuilt
+        totals.changed = set()
+        for event in backlog:
+            totals.apply_event(event)
+        return True
+
+# Metric names reported by StockAggregates.take_changes()
+METRICS = ('value', 'low_stock', 'category', 'supplier', 'color', 'size_color', 'top_products')
+
+stock_aggregates = StockAggregates(products)
@@ -0,0 +1,201 @@
+import json
+import sqlite3
+from datetime import datetime
+from .models import Category, Supplier, Product, Movement, Variant, NO_PHOTOS, intern_value, iso_string, raw_value
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    parent_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS suppliers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    contact TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    reference TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category_id INTEGER,
+    supplier_id INTEGER,
+    price REAL NOT NULL DEFAULT 0,
+    photos TEXT NOT NULL DEFAULT '[]',
+    barcode TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS variants (
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    size TEXT NOT NULL DEFAULT '',
+    color TEXT NOT NULL DEFAULT '',
+    quantity INTEGER NOT NULL DEFAULT 0,
+    sku TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (product_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS movements (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    reason TEXT NOT NULL DEFAULT '',
+    user TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_products_reference ON products(reference);
+CREATE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
+CREATE INDEX IF NOT EXISTS idx_products_supplier ON products(supplier_id);
+CREATE INDEX IF NOT EXISTS idx_variants_sku ON variants(sku);
+CREATE INDEX IF NOT EXISTS idx_movements_product_date ON movements(product_id, date);
+"""
+
+def connect(path, check_same_thread=True):
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+# Row <-> record conversion
+
+def _category_row(c):
+    return (c.id, c.name, c.parent_id)
+
+def _supplier_row(s):
+    return (s.id, s.name, s.contact, s.email, s.phone)
+
+def _product_row(p):
+    return (p.id, p.reference, p.name, p.category_id, p.supplier_id, p.price, json.dumps(p.photos),
+            p.barcode, p.description, iso_string(raw_value(p, 'created_at')), iso_string(raw_value(p, 'updated_at')))
+
+def _variant_rows(p):
+    return [(p.id, i, v.size, v.color, v.quantity, v.sku) for i, v in enumerate(p.variants)]
+
+def _movement_row(m):
+    return (m.id, m.product_id, m.type, m.quantity, m.reason, m.user, iso_string(raw_value(m, 'date')))
+
+UPSERT_SQL = {
+    'categories': "INSERT OR REPLACE INTO categories (id, name, parent_id) VALUES (?, ?, ?)",
+    'suppliers': "INSERT OR REPLACE INTO suppliers (id, name, contact, email, phone) VALUES (?, ?, ?, ?, ?)",
+    'products': """INSERT INTO products (id, reference, name, category_id, supplier_id, price, photos, barcode, description, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET reference=excluded.reference, name=excluded.name,
+                   category_id=excluded.category_id, supplier_id=excluded.supplier_id, price=excluded.price,
+                   photos=excluded.photos, barcode=excluded.barcode, description=excluded.description,
+                   created_at=excluded.created_at, updated_at=excluded.updated_at""",
+    'movements': "INSERT OR REPLACE INTO movements (id, product_id, type, quantity, reason, user, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+}
+
+VARIANT_SQL = "INSERT INTO variants (product_id, position, size, color, quantity, sku) VALUES (?, ?, ?, ?, ?, ?)"
+
+ROW_BUILDERS = {
+    'categories': _category_row,
+    'suppliers': _supplier_row,
+    'products': _product_row,
+    'movements': _movement_row,
+}
+
+def _row_bytes(row):
+    return sum(len(v) if isinstance(v, str) else 8 for v in row if v is not None)
+
+def upsert_many(conn, data_type, records):
+    # Returns the approximate payload size written, in bytes
+    rows = [ROW_BUILDERS[data_type](r) for r in records]
+    if not rows:
+        return 0
+    conn.executemany(UPSERT_SQL[data_type], rows)
+    written = sum(_row_bytes(row) for row in rows)
+    if data_type == 'products':
+        # Variants are owned by their product: rewrite them as a block
+        conn.executemany("DELETE FROM variants WHERE product_id = ?", [(p.id,) for p in records])
+        variant_rows = [row for p in records for row in _variant_rows(p)]
+        conn.executemany(VARIANT_SQL, variant_rows)
+        written += sum(_row_bytes(row) for row in variant_rows)
+    return written
+
+def delete_many(conn, data_type, record_ids):
+    conn.executemany(f"DELETE FROM {data_type} WHERE id = ?", [(i,) for i in record_ids])
+
+def apply_changes(conn, changes):
+    # changes: {data_type: ChangeSet}, committed as a single transaction.
+    # Returns {data_type: (records, bytes)}
+    written = {}
+    with conn:
+        for data_type, change_set in changes.items():
+            records = change_set.added + change_set.updated
+            nbytes = upsert_many(conn, data_type, records)
+            delete_many(conn, data_type, change_set.removed_ids)
+            written[data_type] = (len(records) + len(change_set.removed_ids), nbytes)
+    return written
+
+def load_all(conn):
+    cats = [Category(id=r[0], name=r[1], parent_id=r[2])
+            for r in conn.execute("SELECT id, name, parent_id FROM categories ORDER BY id")]
+    sups = [Supplier(id=r[0], name=r[1], contact=r[2], email=r[3], phone=r[4])
+            for r in conn.execute("SELECT id, name, contact, email, phone FROM suppliers ORDER BY id")]
+
+    variants_by_product = {}
+    for r in conn.execute("SELECT product_id, size, color, quantity, sku FROM variants ORDER BY product_id, position"):
+        variants_by_product.setdefault(r[0], []).append(
+            Variant(size=intern_value(r[1]), color=intern_value(r[2]), quantity=r[3], sku=r[4]))
+
+    prods = []
+    for r in conn.execute("""SELECT id, reference, name, category_id, supplier_id, price, photos, barcode,
+                             description, created_at, updated_at FROM products ORDER BY id"""):
+        prods.append(Product(
+            id=r[0],
+            reference=r[1],
+            name=r[2],
+            category_id=intern_value(r[3]),
+            supplier_id=intern_value(r[4]),
+            price=r[5],
+            variants=variants_by_product.get(r[0], []),
+            photos=json.loads(r[6]) or NO_PHOTOS,
+            barcode=r[7],
+            description=r[8],
+            created_at=r[9],
+            updated_at=r[10]
+        ))
+
+    # Dates stay ISO strings until first read (see models.LazyField)
+    movs = [Movement(id=r[0], product_id=intern_value(r[1]), type=intern_value(r[2]), quantity=r[3],
+                     reason=intern_value(r[4]), user=intern_value(r[5]), date=r[6])
+            for r in conn.execute("SELECT id, product_id, type, quantity, reason, user, date FROM movements ORDER BY id")]
+    return cats, sups, prods, movs
+
+def migrate_from_json(conn, collections):
+    # One-shot import of the legacy data/*.json content
+    if get_meta(conn, 'migrated_from_json'):
+        return False
+    cats, sups, prods, movs = collections
+    with conn:
+        upsert_many(conn, 'categories', cats)
+        upsert_many(conn, 'suppliers', sups)
+        upsert_many(conn, 'products', prods)
+        upsert_many(conn, 'movements', movs)
+        set_meta(conn, 'migrated_from_json', datetime.now().isoformat())
+    return True
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Tuple
+
+# Typed change events published by the global stores (see models.Store),
+# so views apply only what changed instead of rebuilding themselves.
+# Events carry the records of one change; a bulk change (an import chunk)
+# is one event rather than one per record.
+ADDED = 'added'
+UPDATED = 'updated'
+REMOVED = 'removed'
+# The whole store was replaced (loading, reloading); records is the new content
+RELOADED = 'reloaded'
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    entity: str  # store name: 'products', 'categories', 'suppliers', 'movements'
+    kind: str
+    records: Tuple = ()
+
+    @property
+    def ids(self):
+        return tuple(r.id for r in self.records)
+
+class ChangeBus:
+    def __init__(self):
+        self._handlers = []  # (handler, entities or None for all)
+        self._held = None
+
+    def subscribe(self, handler, *entities):
+        # handler(event), for the given store names (all stores if none)
+        self._handlers.append((handler, frozenset(entities) or None))
+
+    def unsubscribe(self, handler):
+        self._handlers = [(h, e) for h, e in self._handlers if h != handler]
+
+    def publish(self, event):
+        if self._held is not None:
+            held = self._held
+            # Consecutive events of the same store and kind are merged, so
+            # an import held chunk after chunk is delivered as one event
+            if held and held[-1][0] == event.entity and held[-1][1] == event.kind and event.kind != RELOADED:
+                held[-1][2].extend(event.records)
+            else:
+                held.append((event.entity, event.kind, list(event.records)))
+            return
+        for handler, entities in list(self._handlers):
+            if entities is None or event.entity in entities:
+                handler(event)
+
+    @contextmanager
+    def hold(self):
+        # Delivers the events of a batch of changes once it is over
+        if self._held is not None:
+            yield
+            return
+        self._held = []
+        try:
+            yield
+        finally:
+            held, self._held = self._held, None
+            for entity, kind, records in held:
+                if kind == UPDATED:
+                    records = {r.id: r for r in records}.values()
+                self.publish(ChangeEvent(entity, kind, tuple(records)))
+
+    def store_changed(self, store, added=(), removed=(), updated=(), reloaded=False):
+        if reloaded:
+            self.publish(ChangeEvent(store.name, RELOADED, tuple(store)))
+            return
+        if removed:
+            self.publish(ChangeEvent(store.name, REMOVED, tuple(removed)))
+        if added:
+            self.publish(ChangeEvent(store.name, ADDED, tuple(added)))
+        if updated:
+            self.publish(ChangeEvent(store.name, UPDATED, tuple(updated)))
+
+change_bus = ChangeBus()
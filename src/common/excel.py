@@ -0,0 +1,132 @@
+from datetime import datetime
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from .models import raw_value, RawRecords
+from .exporters import COLUMNS, record_batches, write_atomically, EXPORT_BATCH_SIZE
+from .importers import import_chunks, CHUNK_SIZE
+from . import fastjson
+
+# One sheet per entity. Workbooks are written with openpyxl's write-only
+# mode and read in read-only mode: rows are streamed, never held as cells.
+PRODUCT_COLUMNS = [name for name, _ in COLUMNS['products'][:11]]
+VARIANT_COLUMNS = ['reference', 'size', 'color', 'quantity', 'sku']
+MOVEMENT_COLUMNS = [name for name, _ in COLUMNS['movements']]
+
+# Sheet title -> data type, in import order (variants need their products)
+SHEETS = {
+    'Produits': 'products',
+    'Variantes': 'products',
+    'Mouvements': 'movements',
+}
+
+def _date(value):
+    return datetime.fromisoformat(value) if type(value) is str else value
+
+def _product_rows(chunk):
+    for p in chunk:
+        yield (p.id, p.reference, p.name, p.category_id, p.supplier_id, p.price, p.barcode, p.description,
+               ','.join(p.photos), _date(raw_value(p, 'created_at')), _date(raw_value(p, 'updated_at')))
+
+def _variant_rows(chunk):
+    for p in chunk:
+        variants = raw_value(p, 'variants')
+        if type(variants) is RawRecords:
+            for v in variants:
+                yield p.reference, v['size'], v['color'], v.get('quantity', 0), v.get('sku', '')
+        else:
+            for v in variants:
+                yield p.reference, v.size, v.color, v.quantity, v.sku
+
+def _movement_rows(chunk):
+    for m in chunk:
+        yield m.id, m.product_id, m.type, m.quantity, m.reason, m.user, _date(raw_value(m, 'date'))
+
+def export_xlsx(path, progress=None, cancelled=None, records=None, batch_size=EXPORT_BATCH_SIZE):
+    # records: optional {'products': [...], 'movements': [...]} copies of the
+    # stores. progress(fraction) covers the three sheets. Returns the number
+    # of rows written.
+    records = records or {}
+    sheets = [
+        ('Produits', PRODUCT_COLUMNS, 'products', _product_rows),
+        ('Variantes', VARIANT_COLUMNS, 'products', _variant_rows),
+        ('Mouvements', MOVEMENT_COLUMNS, 'movements', _movement_rows),
+    ]
+    written = 0
+
+    def write(part_path):
+        nonlocal written
+        workbook = Workbook(write_only=True)
+        for index, (title, columns, data_type, rows_of) in enumerate(sheets):
+            sheet = workbook.create_sheet(title)
+            sheet.append(columns)
+            for chunk, fraction in record_batches(data_type, records.get(data_type), batch_size, cancelled):
+                for row in rows_of(chunk):
+                    sheet.append(row)
+                    written += 1
+                if progress is not None:
+                    progress((index + fraction) / len(sheets))
+        workbook.save(part_path)
+
+    write_atomically(path, write)
+    return written
+
+def _cell_text(value):
+    # The importers work on text columns, as read from a CSV file
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def read_sheet_chunks(sheet, chunk_size=CHUNK_SIZE):
+    # Yields (DataFrame of str, fraction of the sheet read); the index
+    # continues across chunks so errors report sheet line numbers
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [_cell_text(c).strip() for c in header]
+    width = len(columns)
+    total = max((sheet.max_row or 0) - 1, 1)
+    chunk = []
+    start = 0
+    for row in rows:
+        if not any(v is not None for v in row):
+            continue
+        chunk.append([_cell_text(v) for v in row[:width]] + [''] * (width - len(row)))
+        if len(chunk) == chunk_size:
+            yield pd.DataFrame(chunk, columns=columns, index=range(start, start + len(chunk))), \
+                  min((start + len(chunk)) / total, 1.0)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk, columns=columns, index=range(start, start + len(chunk))), 1.0
+
+def _photos_as_json(df):
+    # Photos are a comma separated cell in the workbook
+    if 'photos' in df.columns:
+        df['photos'] = [fastjson.dumps([p for p in v.split(',') if p]).decode() if v else '' for v in df['photos']]
+    return df
+
+def _sheet_progress(progress, index, count):
+    # progress of the sheet at index, as a fraction of all the sheets
+    if progress is None:
+        return None
+    return lambda fraction, report: progress((index + fraction) / count, report)
+
+def import_xlsx(path, progress=None, chunk_size=CHUNK_SIZE, commit=None):
+    # Imports the known sheets present in the workbook, through the same
+    # importers as CSV files. progress(fraction, report) covers all the
+    # sheets; commit as in import_chunks. Returns [(sheet title, ImportReport)].
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        titles = [t for t in SHEETS if t in workbook.sheetnames]
+        reports = []
+        for index, title in enumerate(titles):
+            chunks = ((_photos_as_json(df), fraction)
+                      for df, fraction in read_sheet_chunks(workbook[title], chunk_size))
+            sheet_progress = _sheet_progress(progress, index, len(titles))
+            reports.append((title, import_chunks(chunks, SHEETS[title], sheet_progress, commit)))
+        return reports
+    finally:
+        workbook.close()
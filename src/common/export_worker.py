@@ -0,0 +1,79 @@
+import threading
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+from .exporters import ExportCancelled
+
+class ExportWorker(QObject):
+    progress = Signal(float)
+    finished = Signal(int)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, export, args, kwargs):
+        super().__init__()
+        self._export = export
+        self._args = args
+        self._kwargs = kwargs
+        self.cancel_event = threading.Event()
+
+    @Slot()
+    def run(self):
+        try:
+            count = self._export(*self._args, progress=self.progress.emit, cancelled=self.cancel_event.is_set,
+                                 **self._kwargs)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(count)
+
+class ExportTask(QObject):
+    # Runs export(*args, progress=..., cancelled=..., **kwargs) from
+    # exporters on its own thread. Lives on the GUI thread, so its signals
+    # can drive widgets directly. Pass a copy of the store (records=...)
+    # taken on the GUI thread.
+    progress = Signal(int)  # percent
+    finished = Signal(int)  # records written
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, export, *args, parent=None, **kwargs):
+        super().__init__(parent)
+        self._thread = QThread()
+        self._worker = ExportWorker(export, args, kwargs)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.progress.connect(self._on_progress)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.failed.connect(self._on_failed)
+        self._worker.cancelled.connect(self._on_cancelled)
+
+    def start(self):
+        self._thread.start()
+
+    @Slot()
+    def cancel(self):
+        self._worker.cancel_event.set()
+
+    def _stop(self):
+        self._thread.quit()
+        self._thread.wait()
+
+    @Slot(float)
+    def _on_progress(self, fraction):
+        self.progress.emit(int(fraction * 100))
+
+    @Slot(int)
+    def _on_finished(self, count):
+        self._stop()
+        self.finished.emit(count)
+
+    @Slot(str)
+    def _on_failed(self, message):
+        self._stop()
+        self.failed.emit(message)
+
+    @Slot()
+    def _on_cancelled(self):
+        self._stop()
+        self.cancelled.emit()
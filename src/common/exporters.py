@@ -0,0 +1,194 @@
+import csv
+import gzip
+import os
+from .models import categories, suppliers, products, movements, raw_value, iso_string, RawRecords
+from .serialization import TO_DICT
+from . import fastjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Rows are produced and written EXPORT_BATCH_SIZE at a time, so memory does
+# not grow with the size of the collection
+EXPORT_BATCH_SIZE = 5000
+
+class ExportError(Exception):
+    pass
+
+class ExportCancelled(ExportError):
+    pass
+
+# Columns and their Parquet types. Products are exported one row per
+# variant (size, color, quantity, sku), with the product columns repeated.
+COLUMNS = {
+    'categories': [('id', 'int64'), ('name', 'string'), ('parent_id', 'int64')],
+    'suppliers': [('id', 'int64'), ('name', 'string'), ('contact', 'string'), ('email', 'string'),
+                  ('phone', 'string')],
+    'products': [('id', 'int64'), ('reference', 'string'), ('name', 'string'), ('category_id', 'int64'),
+                 ('supplier_id', 'int64'), ('price', 'float64'), ('barcode', 'string'),
+                 ('description', 'string'), ('photos', 'string'), ('created_at', 'timestamp'),
+                 ('updated_at', 'timestamp'), ('size', 'string'), ('color', 'string'),
+                 ('quantity', 'int64'), ('sku', 'string')],
+    'movements': [('id', 'int64'), ('product_id', 'int64'), ('type', 'string'), ('quantity', 'int64'),
+                  ('reason', 'string'), ('user', 'string'), ('date', 'timestamp')],
+}
+
+NO_VARIANT = ('', '', None, '')
+
+def _category_rows(c):
+    return [(c.id, c.name, c.parent_id)]
+
+def _supplier_rows(s):
+    return [(s.id, s.name, s.contact, s.email, s.phone)]
+
+def _product_rows(p):
+    # Reads the raw variants and dates, so exporting does not build them
+    base = (p.id, p.reference, p.name, p.category_id, p.supplier_id, p.price, p.barcode, p.description,
+            fastjson.dumps(list(p.photos)).decode() if p.photos else '',
+            iso_string(raw_value(p, 'created_at')), iso_string(raw_value(p, 'updated_at')))
+    variants = raw_value(p, 'variants')
+    if not variants:
+        return [base + NO_VARIANT]
+    if type(variants) is RawRecords:
+        return [base + (v['size'], v['color'], v.get('quantity', 0), v.get('sku', '')) for v in variants]
+    return [base + (v.size, v.color, v.quantity, v.sku) for v in variants]
+
+def _movement_rows(m):
+    return [(m.id, m.product_id, m.type, m.quantity, m.reason, m.user, iso_string(raw_value(m, 'date')))]
+
+ROWS = {
+    'categories': _category_rows,
+    'suppliers': _supplier_rows,
+    'products': _product_rows,
+    'movements': _movement_rows,
+}
+
+STORES = {
+    'categories': categories,
+    'suppliers': suppliers,
+    'products': products,
+    'movements': movements,
+}
+
+def record_batches(data_type, records=None, batch_size=EXPORT_BATCH_SIZE, cancelled=None):
+    # (records, fraction done), batch_size records at a time. records
+    # defaults to the whole store; cancelled() is checked between batches.
+    store = STORES[data_type] if records is None else records
+    total = len(store)
+    for start in range(0, total, batch_size):
+        if cancelled is not None and cancelled():
+            raise ExportCancelled("Export annulé")
+        end = min(start + batch_size, total)
+        yield store[start:end], end / total
+
+def batches(data_type, records=None, batch_size=EXPORT_BATCH_SIZE, cancelled=None):
+    # (rows in COLUMNS order, fraction done)
+    rows_of = ROWS[data_type]
+    for chunk, fraction in record_batches(data_type, records, batch_size, cancelled):
+        yield [row for record in chunk for row in rows_of(record)], fraction
+
+def write_atomically(path, write):
+    # write(part_path) produces the file next to the target; it is renamed
+    # at the end, so a failed or cancelled export never leaves a truncated
+    # file behind
+    part_path = path + '.part'
+    try:
+        write(part_path)
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+def _write_csv(path, columns, row_batches, progress):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(name for name, _ in columns)
+        for batch, fraction in row_batches:
+            writer.writerows(batch)
+            progress(len(batch), fraction)
+
+def _arrow_type(kind):
+    return pa.timestamp('us') if kind == 'timestamp' else pa.type_for_alias(kind)
+
+def _write_parquet(path, columns, row_batches, progress):
+    if pa is None:
+        raise ExportError("pyarrow n'est pas installé: export Parquet impossible")
+    schema = pa.schema([(name, _arrow_type(kind)) for name, kind in columns])
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch, fraction in row_batches:
+            arrays = []
+            for (name, kind), values in zip(columns, zip(*batch)):
+                if kind == 'timestamp':
+                    # ISO strings are parsed by Arrow, not one datetime at a time
+                    arrays.append(pa.array(values, pa.string()).cast(pa.timestamp('us')))
+                else:
+                    arrays.append(pa.array(values, _arrow_type(kind)))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            progress(len(batch), fraction)
+
+WRITERS = {
+    'csv': _write_csv,
+    'parquet': _write_parquet,
+}
+
+def export_format(path):
+    return 'parquet' if os.path.splitext(path)[1].lower() in ('.parquet', '.pq') else 'csv'
+
+def export_rows(path, data_type, format=None, progress=None, cancelled=None, records=None,
+                batch_size=EXPORT_BATCH_SIZE):
+    # Streams a collection to CSV or Parquet (chosen from the extension by
+    # default). progress(fraction) is called after each batch. Returns the
+    # number of rows written.
+    if data_type not in ROWS:
+        raise ExportError(f"Type de données inconnu: {data_type}")
+    format = format or export_format(path)
+    if format not in WRITERS:
+        raise ExportError(f"Format d'export inconnu: {format}")
+    written = 0
+
+    def on_batch(count, fraction):
+        nonlocal written
+        written += count
+        if progress is not None:
+            progress(fraction)
+
+    write_atomically(path, lambda part_path: WRITERS[format](
+        part_path, COLUMNS[data_type], batches(data_type, records, batch_size, cancelled), on_batch))
+    return written
+
+def export_json(path, data_type='products', lines=None, compress=None, progress=None, cancelled=None,
+                records=None, batch_size=EXPORT_BATCH_SIZE):
+    # Records are encoded and written one batch at a time: a JSON array with
+    # one record per line, or JSON Lines for .jsonl / .ndjson, gzipped for
+    # .gz (both can be forced). Returns the number of records written.
+    lower = path.lower()
+    if compress is None:
+        compress = lower.endswith('.gz')
+    if lines is None:
+        lines = os.path.splitext(lower[:-3] if lower.endswith('.gz') else lower)[1] in ('.jsonl', '.ndjson')
+    to_dict = TO_DICT[data_type]
+    dumps = fastjson.dumps
+    written = 0
+
+    def write(part_path):
+        nonlocal written
+        with (gzip.open(part_path, 'wb') if compress else open(part_path, 'wb')) as f:
+            if not lines:
+                f.write(b'[')
+            for chunk, fraction in record_batches(data_type, records, batch_size, cancelled):
+                encoded = [dumps(to_dict(r)) for r in chunk]
+                if lines:
+                    f.write(b'\n'.join(encoded) + b'\n')
+                else:
+                    f.write((b',\n' if written else b'\n') + b',\n'.join(encoded))
+                written += len(encoded)
+                if progress is not None:
+                    progress(fraction)
+            if not lines:
+                f.write(b'\n]\n')
+
+    write_atomically(path, write)
+    return written
@@ -0,0 +1,43 @@
+import json
+
+# Fastest available JSON codec: orjson, then msgspec, then the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+    loads = msgspec.json.Decoder().decode
+else:
+    BACKEND = 'json'
+    loads = json.loads
+
+def dumps(obj):
+    # Compact UTF-8 bytes
+    if orjson is not None:
+        return orjson.dumps(obj)
+    if msgspec is not None:
+        return msgspec.json.encode(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def dumps_pretty(obj):
+    # Indented UTF-8 bytes for the data files, the same with every backend
+    # (orjson only indents by 2)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    if msgspec is not None:
+        return msgspec.json.format(msgspec.json.encode(obj), indent=2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def load_file(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
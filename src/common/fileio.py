@@ -0,0 +1,22 @@
+import json
+import os
+import tempfile
+
+def atomic_write(path, data):
+    # Write to a temp file in the same directory, then rename over the target
+    mode = 'wb' if isinstance(data, (bytes, bytearray, memoryview)) else 'w'
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def atomic_write_json(path, data, **kwargs):
+    atomic_write(path, json.dumps(data, **kwargs))
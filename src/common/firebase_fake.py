@@ -0,0 +1,114 @@
+import copy
+import json
+import threading
+
+# In-process stand-in for firebase_admin.db, for tests and benchmarks without
+# network access. Covers the Reference calls the sync engine uses.
+
+class FakeNetworkError(Exception):
+    pass
+
+def _split(path):
+    return [p for p in path.strip('/').split('/') if p]
+
+class FakeRealtimeDatabase:
+    def __init__(self):
+        self.root = {}
+        self.lock = threading.Lock()
+        self.offline = False
+        self.fail_next = 0
+        # Traffic counters
+        self.calls = 0
+        self.bytes_sent = 0
+
+    def reference(self, path='/'):
+        return FakeReference(self, _split(path))
+
+    def _check_network(self, payload):
+        if self.offline:
+            raise FakeNetworkError("offline")
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise FakeNetworkError("simulated failure")
+        self.calls += 1
+        self.bytes_sent += len(json.dumps(payload))
+
+    def _get(self, keys):
+        node = self.root
+        for k in keys:
+            if not isinstance(node, dict) or k not in node:
+                return None
+            node = node[k]
+        return node
+
+    def _set(self, keys, value):
+        if not keys:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        if value is None or value == {}:
+            self._delete(keys)
+            return
+        node = self.root
+        for k in keys[:-1]:
+            child = node.get(k)
+            if not isinstance(child, dict):
+                child = node[k] = {}
+            node = child
+        node[keys[-1]] = value
+
+    def _delete(self, keys):
+        if not keys:
+            self.root = {}
+            return
+        node = self.root
+        parents = []
+        for k in keys[:-1]:
+            if not isinstance(node, dict) or k not in node:
+                return
+            parents.append((node, k))
+            node = node[k]
+        if isinstance(node, dict):
+            node.pop(keys[-1], None)
+        # Like the real database, empty parents disappear
+        for parent, k in reversed(parents):
+            if parent[k] == {}:
+                del parent[k]
+
+class FakeReference:
+    def __init__(self, database, keys):
+        self._db = database
+        self._keys = keys
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self._keys)
+
+    @property
+    def key(self):
+        return self._keys[-1] if self._keys else None
+
+    def child(self, path):
+        return FakeReference(self._db, self._keys + _split(path))
+
+    def get(self):
+        with self._db.lock:
+            return copy.deepcopy(self._db._get(self._keys))
+
+    def set(self, value):
+        with self._db.lock:
+            self._db._check_network(value)
+            self._db._set(self._keys, copy.deepcopy(value))
+
+    def update(self, value):
+        # Multi-path update: every key is a path relative to this reference
+        if not isinstance(value, dict) or not value:
+            raise ValueError("update() expects a non-empty dict")
+        with self._db.lock:
+            self._db._check_network(value)
+            for path, v in value.items():
+                self._db._set(self._keys + _split(path), copy.deepcopy(v))
+
+    def delete(self):
+        with self._db.lock:
+            self._db._check_network(None)
+            self._db._delete(self._keys)
@@ -0,0 +1,155 @@
+import itertools
+import json
+import os
+import threading
+import time
+from .fileio import atomic_write
+
+# Paths per multi-path update() call
+BATCH_SIZE = 500
+# Retry delays after failed pushes: 2s, 4s, 8s ... capped at 5 minutes
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+class FirebaseSync:
+    # Outbound queue of {path: value} updates for the Realtime Database.
+    # A value of None deletes the path. Later updates of a path replace
+    # earlier ones, and the queue survives restarts in outbox_path: a JSON
+    # lines file where each enqueue appends one line, rewritten only when
+    # the queue is drained or seeded.
+    def __init__(self, root_ref, outbox_path, batch_size=BATCH_SIZE, clock=time.monotonic, legacy_outbox_path=None):
+        self.root_ref = root_ref
+        self.outbox_path = outbox_path
+        self.batch_size = batch_size
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._push_lock = threading.Lock()
+        self.queue = {}
+        self.seeded = False
+        self.failures = 0
+        self.next_attempt_at = 0.0
+        self.last_error = None
+        # Counters
+        self.pushed_paths = 0
+        self.pushed_batches = 0
+        self._load_outbox(legacy_outbox_path)
+
+    def _load_outbox(self, legacy_path=None):
+        if legacy_path is not None and os.path.exists(legacy_path) and not os.path.exists(self.outbox_path):
+            # Single JSON document written by earlier versions
+            try:
+                with open(legacy_path, 'r') as f:
+                    data = json.load(f)
+            except ValueError as e:
+                print(f"Ignoring unreadable sync outbox: {e}")
+            else:
+                self.queue = data.get('updates', {})
+                self.seeded = data.get('seeded', False)
+                self._save_outbox()
+            os.remove(legacy_path)
+            return
+        if not os.path.exists(self.outbox_path):
+            return
+        lines = 0
+        with open(self.outbox_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # torn last append
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    print(f"Ignoring unreadable sync outbox line: {e}")
+                    continue
+                lines += 1
+                if 'seeded' in entry:
+                    self.seeded = entry['seeded']
+                self.queue.update(entry.get('updates', {}))
+        if lines > 2:
+            # Fold the appends of the last session into one line
+            self._save_outbox()
+
+    def _save_outbox(self):
+        lines = [json.dumps({'seeded': self.seeded})]
+        if self.queue:
+            lines.append(json.dumps({'updates': self.queue}))
+        atomic_write(self.outbox_path, '\n'.join(lines) + '\n')
+
+    def pending_count(self):
+        return len(self.queue)
+
+    def enqueue(self, updates):
+        if not updates:
+            return
+        line = json.dumps({'updates': updates}) + '\n'
+        with self._lock:
+            self.queue.update(updates)
+            with open(self.outbox_path, 'a') as f:
+                f.write(line)
+
+    def _failed(self, error):
+        self.failures += 1
+        self.last_error = str(error)
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+        self.next_attempt_at = self.clock() + delay
+        print(f"Firebase push failed ({error}), retry in {delay:.0f}s")
+
+    def _succeeded(self):
+        self.failures = 0
+        self.next_attempt_at = 0.0
+        self.last_error = None
+
+    def seed(self, build_collections, force=False):
+        # One full upload keyed by record id, replacing whatever the remote
+        # held before (the legacy list layout included). Deltas queued before
+        # the seed are covered by it. build_collections() is only called
+        # when an attempt is actually made, not while backing off.
+        with self._push_lock:
+            if not force and self.clock() < self.next_attempt_at:
+                return False
+            try:
+                self.root_ref.update(build_collections())
+            except Exception as e:
+                self._failed(e)
+                return False
+            self._succeeded()
+            with self._lock:
+                self.queue = {}
+                self.seeded = True
+                self._save_outbox()
+            return True
+
+    def push(self, force=False):
+        # Sends queued updates in batches; returns the number of paths pushed.
+        # After a failure, nothing is sent until the backoff delay has passed.
+        if not self._push_lock.acquire(blocking=False):
+            return 0
+        try:
+            if not force and self.clock() < self.next_attempt_at:
+                return 0
+            pushed = 0
+            while True:
+                with self._lock:
+                    batch = dict(itertools.islice(self.queue.items(), self.batch_size))
+                if not batch:
+                    break
+                try:
+                    self.root_ref.update(batch)
+                except Exception as e:
+                    self._failed(e)
+                    break
+                with self._lock:
+                    for path, value in batch.items():
+                        # Keep paths that were updated again while in flight
+                        if path in self.queue and self.queue[path] is value:
+                            del self.queue[path]
+                self._succeeded()
+                pushed += len(batch)
+                self.pushed_paths += len(batch)
+                self.pushed_batches += 1
+            if pushed:
+                # Re-sending a few paths after a crash is harmless
+                with self._lock:
+                    self._save_outbox()
+            return pushed
+        finally:
+            self._push_lock.release()
@@ -0,0 +1,690 @@
+import gc
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+import numpy as np
+import pandas as pd
+from .models import categories, suppliers, products, movements, Category, Supplier, Product, Variant, Movement, NO_PHOTOS, intern_value
+from .indexes import product_by_reference, product_by_id
+from . import fastjson, storage
+
+# Rows are read, validated and applied CHUNK_SIZE at a time
+CHUNK_SIZE = 5000
+# Row errors kept in a report (the count is always exact)
+MAX_REPORTED_ERRORS = 1000
+# Between the levels of a category path: 'Vêtements > Hauts'
+CATEGORY_SEPARATOR = '>'
+
+@dataclass
+class RowError:
+    row: int  # line number in the file, header = 1
+    message: str
+
+@dataclass
+class ImportReport:
+    data_type: str
+    rows: int = 0
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    error_count: int = 0
+    errors: List[RowError] = field(default_factory=list)
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(row, message))
+
+    def summary(self, max_errors=10):
+        lines = [f"{self.rows} lignes lues: {self.added} ajoutées, {self.updated} mises à jour, "
+                 f"{self.error_count} en erreur"]
+        if self.unchanged:
+            lines[0] += f", {self.unchanged} déjà présentes"
+        lines += [f"Ligne {e.row}: {e.message}" for e in self.errors[:max_errors]]
+        if self.error_count > max_errors:
+            lines.append(f"... et {self.error_count - max_errors} autres erreurs")
+        return "\n".join(lines)
+
+class _Chunk:
+    # Column conversion for one chunk of string columns. Invalid rows are
+    # reported once and excluded from valid_rows().
+    def __init__(self, df, report):
+        self.df = df
+        self.report = report
+        self.bad = pd.Series(False, index=df.index)
+        self._row_failures = {}  # position -> first message, see fail_row()
+        self._errors = []  # (line, message), reported in line order by done()
+
+    def has(self, column):
+        return column in self.df.columns
+
+    def fail(self, mask, message):
+        # message may be a callable taking the row label
+        self._apply_row_failures()
+        new = mask & ~self.bad
+        for row in new[new].index:
+            self._errors.append((int(row) + 2, message(row) if callable(message) else message))
+        self.bad |= mask
+
+    def fail_row(self, position, message):
+        # Collected, then applied with a single mask by valid_rows() / done()
+        self._row_failures.setdefault(position, message)
+
+    def _apply_row_failures(self):
+        if not self._row_failures:
+            return
+        failures, self._row_failures = self._row_failures, {}
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[list(failures)] = True
+        labels = self.df.index
+        messages = {labels[position]: message for position, message in failures.items()}
+        self.fail(pd.Series(mask, index=labels), messages.__getitem__)
+
+    def done(self):
+        self._apply_row_failures()
+        for line, message in sorted(self._errors, key=lambda e: e[0]):
+            self.report.error(line, message)
+        self._errors = []
+
+    def text(self, column, required=False, default=''):
+        # List of stripped strings (plain str methods beat the .str accessor here)
+        if not self.has(column):
+            if required:
+                self.fail(pd.Series(True, index=self.df.index), f"Colonne {column} manquante")
+            return [default] * len(self.df)
+        values = [v.strip() for v in self.df[column].tolist()]
+        if required:
+            self.fail(pd.Series([not v for v in values], index=self.df.index), f"{column} vide")
+        return values
+
+    def number(self, column, integer=False, required=False, default=None):
+        # Python values (int/float, default when empty), vectorized parsing
+        if not self.has(column):
+            if required:
+                self.fail(pd.Series(True, index=self.df.index), f"Colonne {column} manquante")
+            return [default] * len(self.df)
+        raw = self.df[column]
+        values = pd.to_numeric(raw, errors='coerce')
+        empty = raw.isin(('', ' '))
+        retry = values.isna() & ~empty
+        if retry.any():
+            # Decimal commas and surrounding spaces, on the failed cells only
+            fixed = raw[retry].map(lambda v: v.strip().replace(',', '.'))
+            values[retry] = pd.to_numeric(fixed, errors='coerce')
+            empty |= retry & (fixed == '').reindex(raw.index, fill_value=False)
+        invalid = values.isna() & ~empty
+        if integer:
+            invalid |= values.notna() & (values % 1 != 0)
+        self.fail(invalid, lambda row: f"{column} invalide: {raw[row]!r}")
+        if required:
+            self.fail(empty, f"{column} vide")
+        convert = int if integer else float
+        return [default if v != v else convert(v) for v in values.tolist()]
+
+    def json_list(self, column):
+        # Lists, or None where the cell is empty (left unchanged on update)
+        if not self.has(column):
+            return [None] * len(self.df)
+
+        def parse(text):
+            if not text:
+                return None
+            try:
+                value = fastjson.loads(text)
+            except ValueError:
+                return None
+            return value if isinstance(value, list) else None
+
+        raw = self.df[column]
+        values = raw.map(parse)
+        self.fail(values.isna() & (raw != ''), f"{column}: JSON invalide")
+        return values.tolist()
+
+    def valid_rows(self):
+        # Positions (not labels) of the rows without errors
+        self._apply_row_failures()
+        return [i for i, bad in enumerate(self.bad.tolist()) if not bad]
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    # Yields (DataFrame of str, fraction of the file read)
+    size = os.path.getsize(path) or 1
+    with open(path, 'rb') as f:
+        reader = pd.read_csv(f, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                             encoding='utf-8-sig', skipinitialspace=True)
+        for df in reader:
+            df.columns = [str(c).strip() for c in df.columns]
+            yield df, min(f.tell() / size, 1.0)
+
+def _variants(items):
+    return [Variant(intern_value(v['size']), intern_value(v['color']), int(v.get('quantity', 0)), v.get('sku', ''))
+            for v in items]
+
+def _name_key(name):
+    return ' '.join(name.split()).casefold()
+
+def _path_key(path):
+    # 'Vêtements > Hauts' -> ('vêtements', 'hauts')
+    return tuple(_name_key(part) for part in path.split(CATEGORY_SEPARATOR) if part.strip())
+
+def category_paths():
+    # Path key -> category id, for every category whose parent chain is complete
+    by_id = {c.id: c for c in categories}
+    paths = {}
+
+    def path_of(category, seen):
+        if category.id in seen:
+            return None
+        parent = by_id.get(category.parent_id) if category.parent_id is not None else None
+        if category.parent_id is not None and parent is None:
+            return None
+        prefix = path_of(parent, seen | {category.id}) if parent is not None else ()
+        return None if prefix is None else prefix + (_name_key(category.name),)
+
+    for category in categories:
+        path = path_of(category, frozenset())
+        if path is not None:
+            paths.setdefault(path, category.id)
+    return paths
+
+def supplier_names():
+    # Name key -> supplier id
+    names = {}
+    for supplier in suppliers:
+        names.setdefault(_name_key(supplier.name), supplier.id)
+    return names
+
+class _Importer:
+    # Applies the chunks of one file to a store; finish() runs once after the
+    # last chunk
+    data_type = None
+
+    def __init__(self, report, **options):
+        self.report = report
+        self.options = options
+        self.now = datetime.now()
+
+    def apply(self, df):
+        chunk = _Chunk(df, self.report)
+        self.apply_chunk(chunk)
+        chunk.done()
+
+    def apply_chunk(self, chunk):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def _assign_ids(self, created, wanted, is_free):
+        # created[i] keeps wanted[i] (its id in the file) when it is free,
+        # the others get a block of fresh ids
+        taken = set()
+        missing = []
+        for record, record_id in zip(created, wanted):
+            if record_id is not None and record_id not in taken and is_free(record_id):
+                record.id = record_id
+                taken.add(record_id)
+            else:
+                missing.append(record)
+        if taken:
+            storage.get_sequences().ensure_above(self.data_type, max(taken))
+        for record, new_id in zip(missing, storage.reserve_ids(self.data_type, len(missing))):
+            record.id = new_id
+
+class ProductImporter(_Importer):
+    # Upsert by reference; only the columns present in the file are updated.
+    # Categories and suppliers can be given by id or by path / name.
+    data_type = 'products'
+
+    def __init__(self, report, **options):
+        super().__init__(report, **options)
+        self._categories = None
+        self._suppliers = None
+        # reference -> [product, variants before the file, variant rows read]
+        self._variant_rows = {}
+        self._added_ids = set()
+        self._updated_ids = set()
+        self._matched_ids = set()  # existing products listed by the file
+
+    def _resolve(self, chunk, column, lookup, key_of, columns, target):
+        names = chunk.text(column)
+        ids = []
+        for i, name in enumerate(names):
+            if not name:
+                ids.append(None)
+                continue
+            found = lookup.get(key_of(name))
+            if found is None:
+                chunk.fail_row(i, f"{column} inconnu: {name!r}")
+            ids.append(found)
+        columns[target] = ids
+
+    def apply_chunk(self, chunk):
+        report = self.report
+        reference = chunk.text('reference', required=True)
+        columns = {}
+        if chunk.has('name'):
+            columns['name'] = chunk.text('name', required=True)
+        for name in ('category_id', 'supplier_id'):
+            if chunk.has(name):
+                columns[name] = chunk.number(name, integer=True)
+        if chunk.has('category'):
+            if self._categories is None:
+                self._categories = category_paths()
+            self._resolve(chunk, 'category', self._categories, _path_key, columns, 'category_id')
+        if chunk.has('supplier'):
+            if self._suppliers is None:
+                self._suppliers = supplier_names()
+            self._resolve(chunk, 'supplier', self._suppliers, _name_key, columns, 'supplier_id')
+        if chunk.has('price'):
+            columns['price'] = chunk.number('price', default=0.0)
+        for name in ('barcode', 'description'):
+            if chunk.has(name):
+                columns[name] = chunk.text(name)
+        variants = chunk.json_list('variants')
+        # Or one row per variant, as exported: size, color, quantity, sku
+        variant_rows = not chunk.has('variants') and (chunk.has('size') or chunk.has('sku'))
+        if variant_rows:
+            sizes = chunk.text('size')
+            colors = chunk.text('color')
+            skus = chunk.text('sku')
+            quantities = chunk.number('quantity', integer=True, default=0)
+        photos = chunk.json_list('photos')
+        ids = chunk.number('id', integer=True)
+
+        rows = chunk.valid_rows()
+        built_variants = {}
+        for i in rows:
+            if variants[i] is None:
+                continue
+            try:
+                built_variants[i] = _variants(variants[i])
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                chunk.fail_row(i, f"variants invalides: {e}")
+        rows = chunk.valid_rows()
+
+        now = self.now
+        updated = {}
+        new = {}  # reference -> (product created in this chunk, id in the file)
+        for i in rows:
+            ref = reference[i]
+            created = new.get(ref)
+            product = created[0] if created else product_by_reference(ref)
+            if product is None:
+                if 'name' not in columns:
+                    chunk.fail_row(i, "name requis pour un nouveau produit")
+                    continue
+                product = Product(id=None, reference=ref, name='', category_id=None, supplier_id=None, price=0.0,
+                                  photos=NO_PHOTOS, created_at=now, updated_at=now)
+                new[ref] = created = (product, ids[i])
+            elif not created:
+                self._matched_ids.add(product.id)
+            # Only what differs is written, an identical row leaves the product untouched
+            changed = False
+            for name, values in columns.items():
+                if getattr(product, name) != values[i]:
+                    setattr(product, name, values[i])
+                    changed = True
+            if i in built_variants:
+                if product.variants != built_variants[i]:
+                    product.variants = built_variants[i]
+                    changed = True
+            elif variant_rows:
+                # The rows of a product may span several chunks
+                state = self._variant_rows.get(ref)
+                if state is None:
+                    state = self._variant_rows[ref] = [product, product.variants, 0]
+                _, before, read = state
+                if sizes[i] or colors[i] or skus[i]:
+                    variant = Variant(intern_value(sizes[i]), intern_value(colors[i]), quantities[i], skus[i])
+                    if product.variants is not before:
+                        product.variants.append(variant)
+                    elif read >= len(before) or before[read] != variant:
+                        product.variants = before[:read] + [variant]
+                    state[2] = read + 1
+                changed = changed or product.variants is not before
+            if photos[i] is not None and tuple(product.photos) != tuple(photos[i]):
+                product.photos = photos[i] or NO_PHOTOS
+                changed = True
+            if changed and not created:
+                product.updated_at = now
+                updated[product.id] = product
+
+        created = [p for p, _ in new.values()]
+        self._assign_ids(created, [i for _, i in new.values()], lambda pid: product_by_id(pid) is None)
+        # One store notification per chunk
+        if updated:
+            products.touch(*updated.values())
+        products.extend(created)
+        report.added += len(created)
+        self._added_ids.update(p.id for p in created)
+        self._count_updated(updated)
+
+    def _count_updated(self, updated):
+        # A product whose rows span two chunks is counted once
+        self.report.updated += len(updated.keys() - self._updated_ids - self._added_ids)
+        self._updated_ids.update(updated)
+
+    def finish(self):
+        # Products listed with fewer variant rows than they had
+        shortened = {}
+        for product, before, read in self._variant_rows.values():
+            if product.variants is before and read < len(before):
+                product.variants = before[:read]
+                product.updated_at = self.now
+                shortened[product.id] = product
+        if shortened:
+            products.touch(*shortened.values())
+            self._count_updated(shortened)
+        self.report.unchanged += len(self._matched_ids - self._updated_ids - self._added_ids)
+
+class CategoryImporter(_Importer):
+    # Rows give either a full path ('Vêtements > Hauts') or a name with an
+    # optional parent path / parent_id. Missing parents along a path are
+    # created; existing categories are left as they are.
+    data_type = 'categories'
+
+    def __init__(self, report, **options):
+        super().__init__(report, **options)
+        self.paths = category_paths()
+        self.by_id = {c.id: c for c in categories}
+        self.id_paths = {cid: path for path, cid in self.paths.items()}
+        self.file_ids = {}  # id in the file -> id given by this import
+
+    def _create(self, path, name, parent_id, file_id):
+        category = Category(id=None, name=name, parent_id=parent_id)
+        self._assign_ids([category], [file_id], lambda cid: cid not in self.by_id)
+        self.by_id[category.id] = category
+        self.paths[path] = category.id
+        self.id_paths[category.id] = path
+        self.created.append(category)
+        return category.id
+
+    def _ensure_path(self, names, file_id=None):
+        # Id of the category at the end of names, creating what is missing
+        parent_id = None
+        for depth, name in enumerate(names):
+            path = tuple(_name_key(n) for n in names[:depth + 1])
+            category_id = self.paths.get(path)
+            if category_id is None:
+                last = depth == len(names) - 1
+                category_id = self._create(path, name, parent_id, file_id if last else None)
+            elif depth == len(names) - 1:
+                self.report.unchanged += 1
+            parent_id = category_id
+        return parent_id
+
+    def apply_chunk(self, chunk):
+        report = self.report
+        if chunk.has('path'):
+            paths = chunk.text('path', required=True)
+            names = parents = parent_ids = None
+        else:
+            paths = None
+            names = chunk.text('name', required=True)
+            parents = chunk.text('parent')
+            parent_ids = chunk.number('parent_id', integer=True)
+        ids = chunk.number('id', integer=True)
+
+        self.created = []
+        for i in chunk.valid_rows():
+            if paths is not None:
+                parts = [' '.join(p.split()) for p in paths[i].split(CATEGORY_SEPARATOR) if p.strip()]
+            else:
+                parent_path = ()
+                if parents[i]:
+                    parent_path = _path_key(parents[i])
+                    if parent_path not in self.paths:
+                        chunk.fail_row(i, f"parent inconnu: {parents[i]!r}")
+                        continue
+                elif parent_ids[i] is not None:
+                    parent_id = self.file_ids.get(parent_ids[i], parent_ids[i])
+                    if parent_id not in self.id_paths:
+                        chunk.fail_row(i, f"parent_id inconnu: {parent_ids[i]}")
+                        continue
+                    parent_path = self.id_paths[parent_id]
+                # Existing ancestors are matched by key, their names are not used
+                parts = list(parent_path) + [' '.join(names[i].split())]
+            if not parts:
+                chunk.fail_row(i, "path vide")
+                continue
+            category_id = self._ensure_path(parts, ids[i])
+            if ids[i] is not None:
+                self.file_ids[ids[i]] = category_id
+        categories.extend(self.created)
+        report.added += len(self.created)
+
+class SupplierImporter(_Importer):
+    # Upsert by name (case and spacing insensitive)
+    data_type = 'suppliers'
+
+    def __init__(self, report, **options):
+        super().__init__(report, **options)
+        self.names = supplier_names()
+        self.by_id = {s.id: s for s in suppliers}
+
+    def apply_chunk(self, chunk):
+        report = self.report
+        names = chunk.text('name', required=True)
+        columns = {name: chunk.text(name) for name in ('contact', 'email', 'phone') if chunk.has(name)}
+        ids = chunk.number('id', integer=True)
+
+        created = []
+        wanted = []
+        updated = {}
+        new = {}  # name key -> supplier created in this chunk
+        for i in chunk.valid_rows():
+            key = _name_key(names[i])
+            supplier = new.get(key)
+            if supplier is None:
+                supplier_id = self.names.get(key)
+                if supplier_id is None:
+                    supplier = new[key] = Supplier(id=None, name=' '.join(names[i].split()))
+                    created.append(supplier)
+                    wanted.append(ids[i])
+                else:
+                    supplier = updated[supplier_id] = self.by_id[supplier_id]
+            for name, values in columns.items():
+                setattr(supplier, name, values[i])
+
+        self._assign_ids(created, wanted, lambda sid: sid not in self.by_id)
+        for supplier in created:
+            self.by_id[supplier.id] = supplier
+            self.names[_name_key(supplier.name)] = supplier.id
+        if updated:
+            suppliers.touch(*updated.values())
+        suppliers.extend(created)
+        report.added += len(created)
+        report.updated += len(updated)
+
+# Signed effect of a movement on the stock, as in the stock adjustment dialog
+MOVEMENT_SIGNS = {'in': 1, 'out': -1, 'adjustment': 0}
+
+class MovementImporter(_Importer):
+    # Movements are only ever added. The product is given by reference
+    # (product_reference or reference) or by product_id; an optional sku
+    # selects the variant, otherwise the first variant is used like the stock
+    # adjustment dialog does. With update_stock=True the net quantity per
+    # variant is summed over the whole file and applied once at the end.
+    data_type = 'movements'
+
+    def __init__(self, report, update_stock=False, **options):
+        super().__init__(report, **options)
+        self.update_stock = update_stock
+        self.deltas = {}  # (product id, sku) -> net quantity
+        self.lines = {}  # (product id, sku) -> first line in the file, for finish() errors
+        self.existing = None  # id -> movement, built on the first chunk
+
+    def _product_ids(self, chunk):
+        for column in ('product_reference', 'reference'):
+            if chunk.has(column):
+                refs = chunk.text(column, required=True)
+                ids = []
+                for i, ref in enumerate(refs):
+                    product = product_by_reference(ref) if ref else None
+                    if ref and product is None:
+                        chunk.fail_row(i, f"produit inconnu: {ref!r}")
+                    ids.append(product.id if product is not None else None)
+                return ids
+        ids = chunk.number('product_id', integer=True, required=True)
+        for i, pid in enumerate(ids):
+            if pid is not None and product_by_id(pid) is None:
+                chunk.fail_row(i, f"produit inconnu: {pid}")
+        return ids
+
+    def _dates(self, chunk):
+        if not chunk.has('date'):
+            return [self.now] * len(chunk.df)
+        dates = []
+        for i, text in enumerate(chunk.text('date')):
+            if not text:
+                dates.append(self.now)
+                continue
+            try:
+                dates.append(datetime.fromisoformat(text))
+            except ValueError:
+                chunk.fail_row(i, f"date invalide: {text!r}")
+                dates.append(None)
+        return dates
+
+    def apply_chunk(self, chunk):
+        report = self.report
+        df = chunk.df
+        product_ids = self._product_ids(chunk)
+        types = chunk.text('type', required=True)
+        chunk.fail(pd.Series([t not in MOVEMENT_SIGNS for t in types], index=df.index),
+                   lambda row: f"type invalide: {df.at[row, 'type']!r}")
+        quantities = chunk.number('quantity', integer=True, required=True)
+        chunk.fail(pd.Series([q is not None and q < 0 for q in quantities], index=df.index), "quantity négative")
+        skus = chunk.text('sku')
+        reasons = chunk.text('reason')
+        users = chunk.text('user')
+        dates = self._dates(chunk)
+        ids = chunk.number('id', integer=True)
+
+        rows = chunk.valid_rows()
+        if self.update_stock:
+            # The variant must exist for the quantities to be applied
+            for i in rows:
+                product = product_by_id(product_ids[i])
+                if skus[i]:
+                    if not any(v.sku == skus[i] for v in product.variants):
+                        chunk.fail_row(i, f"sku inconnu pour {product.reference}: {skus[i]!r}")
+                elif not product.variants:
+                    chunk.fail_row(i, f"{product.reference} n'a pas de variante")
+            rows = chunk.valid_rows()
+
+        if self.existing is None:
+            self.existing = {m.id: m for m in movements}
+        # A movement already present (same id, product, type and quantity) is
+        # skipped, so importing an export back does not duplicate the history
+        fresh = []
+        for i in rows:
+            known = self.existing.get(ids[i]) if ids[i] is not None else None
+            if known is not None and (known.product_id, known.type, known.quantity) == \
+                    (product_ids[i], types[i], quantities[i]):
+                report.unchanged += 1
+            else:
+                fresh.append(i)
+        rows = fresh
+
+        created = [Movement(id=None, product_id=intern_value(product_ids[i]), type=intern_value(types[i]),
+                            quantity=quantities[i], reason=intern_value(reasons[i]), user=intern_value(users[i]),
+                            date=dates[i])
+                   for i in rows]
+        self._assign_ids(created, [ids[i] for i in rows], lambda mid: mid not in self.existing)
+        self.existing.update((m.id, m) for m in created)
+
+        if self.update_stock and rows:
+            # Net quantity per variant for the chunk, added to the running totals
+            frame = pd.DataFrame({
+                'product_id': [product_ids[i] for i in rows],
+                'sku': [skus[i] for i in rows],
+                'signed': [MOVEMENT_SIGNS[types[i]] * quantities[i] for i in rows],
+            })
+            for (product_id, sku), net in frame.groupby(['product_id', 'sku'], sort=False)['signed'].sum().items():
+                key = (int(product_id), sku)
+                self.deltas[key] = self.deltas.get(key, 0) + int(net)
+            labels = df.index
+            for i in rows:
+                self.lines.setdefault((product_ids[i], skus[i]), int(labels[i]) + 2)
+
+        movements.extend(created)
+        report.added += len(created)
+
+    def finish(self):
+        touched = {}
+        for key, net in self.deltas.items():
+            if not net:
+                continue
+            # The product may have been deleted or edited since its rows were read
+            product_id, sku = key
+            product = product_by_id(product_id)
+            if product is None:
+                self.report.error(self.lines[key], f"stock non mis à jour, produit introuvable: {product_id}")
+                continue
+            if sku:
+                variant = next((v for v in product.variants if v.sku == sku), None)
+                if variant is None:
+                    self.report.error(self.lines[key],
+                                      f"stock non mis à jour, sku inconnu pour {product.reference}: {sku!r}")
+                    continue
+            elif product.variants:
+                variant = product.variants[0]
+            else:
+                self.report.error(self.lines[key], f"stock non mis à jour, {product.reference} n'a pas de variante")
+                continue
+            variant.quantity += net
+            touched[product_id] = product
+        if touched:
+            for product in touched.values():
+                product.updated_at = self.now
+            products.touch(*touched.values())
+            self.report.updated += len(touched)
+
+IMPORTERS = {
+    'products': ProductImporter,
+    'categories': CategoryImporter,
+    'suppliers': SupplierImporter,
+    'movements': MovementImporter,
+}
+
+@contextmanager
+def _gc_paused():
+    # Bulk imports only create acyclic records: skip the collector passes
+    # that would otherwise rescan the whole heap many times over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def import_chunks(chunks, data_type, progress=None, commit=None, **options):
+    # chunks yields (DataFrame of str, fraction read). progress(fraction,
+    # report) is called after each chunk. With SQLite each chunk is
+    # committed in its own transaction; the JSON files are rewritten once at
+    # the end. commit() saves the changes made so far: storage.save_data by
+    # default, the UI passes persistence.flush so the writes (and the cloud
+    # sync) run on the persistence worker. options go to the importer
+    # (update_stock for movements).
+    if commit is None:
+        commit = storage.save_data
+    report = ImportReport(data_type)
+    importer = IMPORTERS[data_type](report, **options)
+    with _gc_paused():
+        for df, fraction in chunks:
+            report.rows += len(df)
+            importer.apply(df)
+            if storage.STORAGE_BACKEND == 'sqlite':
+                commit()
+            if progress is not None:
+                progress(fraction, report)
+        importer.finish()
+        commit()
+    return report
+
+def import_csv(path, data_type, progress=None, chunk_size=CHUNK_SIZE, commit=None, **options):
+    return import_chunks(read_chunks(path, chunk_size), data_type, progress, commit, **options)
@@ -0,0 +1,113 @@
+from .models import categories, suppliers, products, raw_value, RawRecords
+
+# Lookup tables over the global stores, kept up to date through the store
+# listeners. An index is built on first use, so loading stays lazy.
+
+class Index:
+    # key -> {record id: record}; keys_of(record) lists the keys of a record,
+    # None and '' are not indexed
+    def __init__(self, store, keys_of):
+        self.store = store
+        self.keys_of = keys_of
+        self._buckets = None
+        self._keys = {}  # record id -> keys it is indexed under
+        store.subscribe(self._on_change)
+
+    def _add(self, record):
+        keys = [k for k in self.keys_of(record) if k is not None and k != '']
+        self._keys[record.id] = keys
+        for key in keys:
+            self._buckets.setdefault(key, {})[record.id] = record
+
+    def _remove(self, record):
+        for key in self._keys.pop(record.id, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(record.id, None)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _on_change(self, store, added, removed, updated):
+        if self._buckets is None:
+            return
+        for record in removed:
+            self._remove(record)
+        for record in updated:
+            self._remove(record)
+            self._add(record)
+        for record in added:
+            self._add(record)
+
+    def _ensure(self):
+        if self._buckets is None:
+            self._buckets = {}
+            self._keys = {}
+            for record in self.store:
+                self._add(record)
+        return self._buckets
+
+    def get(self, key, default=None):
+        bucket = self._ensure().get(key)
+        return next(iter(bucket.values())) if bucket else default
+
+    def get_all(self, key):
+        return list(self._ensure().get(key, {}).values())
+
+    def __contains__(self, key):
+        return key in self._ensure()
+
+def _variant_skus(product):
+    # Reads loader dicts as is, so indexing does not build the variants
+    variants = raw_value(product, 'variants')
+    if type(variants) is RawRecords:
+        return [v.get('sku') for v in variants]
+    return [v.sku for v in variants]
+
+INDEXES = {
+    'products.id': Index(products, lambda p: (p.id,)),
+    'products.reference': Index(products, lambda p: (p.reference,)),
+    'products.barcode': Index(products, lambda p: (p.barcode,)),
+    'products.sku': Index(products, _variant_skus),
+    'products.category_id': Index(products, lambda p: (p.category_id,)),
+    'products.supplier_id': Index(products, lambda p: (p.supplier_id,)),
+    'categories.id': Index(categories, lambda c: (c.id,)),
+    'suppliers.id': Index(suppliers, lambda s: (s.id,)),
+}
+
+def product_by_id(product_id):
+    return INDEXES['products.id'].get(product_id)
+
+def product_by_reference(reference):
+    return INDEXES['products.reference'].get(reference)
+
+def product_by_barcode(barcode):
+    return INDEXES['products.barcode'].get(barcode)
+
+def variant_by_sku(sku):
+    # (product, variant) or (None, None)
+    product = INDEXES['products.sku'].get(sku)
+    if product is not None:
+        for variant in product.variants:
+            if variant.sku == sku:
+                return product, variant
+    return None, None
+
+def products_in_category(category_id):
+    return INDEXES['products.category_id'].get_all(category_id)
+
+def products_of_supplier(supplier_id):
+    return INDEXES['products.supplier_id'].get_all(supplier_id)
+
+def category_by_id(category_id):
+    return INDEXES['categories.id'].get(category_id)
+
+def supplier_by_id(supplier_id):
+    return INDEXES['suppliers.id'].get(supplier_id)
+
+def category_name(category_id, default=""):
+    category = category_by_id(category_id)
+    return category.name if category is not None else default
+
+def supplier_name(supplier_id, default=""):
+    supplier = supplier_by_id(supplier_id)
+    return supplier.name if supplier is not None else default
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+from .fileio import atomic_write_json
+from . import fastjson
+
+# Compact once the journal grows past this many bytes
+JOURNAL_MAX_BYTES = int(os.environ.get('STOCK_JOURNAL_MAX_BYTES', 8 * 1024 * 1024))
+
+SNAPSHOT_VERSION = 1
+
+def read_snapshot(snapshot_path):
+    # Returns (checkpoint_seq, movement dicts); legacy files are a bare list
+    if not os.path.exists(snapshot_path):
+        return 0, []
+    data = fastjson.load_file(snapshot_path)
+    if isinstance(data, list):
+        return 0, data
+    return data.get('checkpoint_seq', 0), data.get('movements', [])
+
+def write_snapshot(snapshot_path, checkpoint_seq, movement_dicts):
+    atomic_write_json(snapshot_path, {
+        'version': SNAPSHOT_VERSION,
+        'checkpoint_seq': checkpoint_seq,
+        'movements': movement_dicts
+    })
+
+class MovementJournal:
+    def __init__(self, path, snapshot_path):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.checkpoint_seq = 0
+        self.last_seq = 0
+        # Ids of the movements journaled after the checkpoint: appending one
+        # again (changes requeued after a failed flush) is a no-op
+        self._ids = set()
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def load(self):
+        # Snapshot content followed by the journal entries written after its checkpoint
+        self.checkpoint_seq, data = read_snapshot(self.snapshot_path)
+        self.last_seq = self.checkpoint_seq
+        self._ids = set()
+        for seq, movement in self._entries():
+            if seq > self.checkpoint_seq:
+                data.append(movement)
+                self._ids.add(movement['id'])
+                self.last_seq = max(self.last_seq, seq)
+        return data
+
+    def replay_after(self, seq):
+        # Journal entries newer than seq, for callers holding a newer
+        # snapshot than movements.json
+        self.checkpoint_seq = seq
+        self.last_seq = seq
+        self._ids = set()
+        data = []
+        for entry_seq, movement in self._entries():
+            if entry_seq > seq:
+                data.append(movement)
+                self._ids.add(movement['id'])
+                self.last_seq = max(self.last_seq, entry_seq)
+        return data
+
+    def _entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            valid_end = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn last write after a crash: drop it so later appends stay readable
+                    f.truncate(valid_end)
+                    break
+                valid_end += len(line)
+                if line.strip():
+                    entry = fastjson.loads(line)
+                    yield entry['seq'], entry['movement']
+
+    def append(self, movement_dicts):
+        movement_dicts = [m for m in movement_dicts if m['id'] not in self._ids]
+        if not movement_dicts:
+            return 0
+        seq = self.last_seq
+        lines = []
+        for movement in movement_dicts:
+            seq += 1
+            lines.append(json.dumps({'seq': seq, 'movement': movement}))
+        data = '\n'.join(lines) + '\n'
+        size = self.size()
+        try:
+            with open(self.path, 'a') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            # Drop whatever part of the batch reached the file, so the retry
+            # does not journal it twice
+            if os.path.exists(self.path):
+                with open(self.path, 'rb+') as f:
+                    f.truncate(size)
+            raise
+        self.last_seq = seq
+        self._ids.update(m['id'] for m in movement_dicts)
+        return len(data)
+
+    def compact(self, movement_dicts=None, flushed_ids=()):
+        # Fold the journal into the snapshot; movement_dicts may be passed when
+        # the caller already holds the full history in memory. flushed_ids:
+        # movements of the flush doing the compaction, which are now in the
+        # snapshot and must not be appended again on a retry.
+        if movement_dicts is None:
+            movement_dicts = self.load()
+        write_snapshot(self.snapshot_path, self.last_seq, movement_dicts)
+        self.checkpoint_seq = self.last_seq
+        self._ids = set(flushed_ids)
+        # The snapshot is written: entries up to the checkpoint are skipped on
+        # load, so failing to empty the journal must not fail the flush (its
+        # movements would be requeued and journaled again)
+        try:
+            with open(self.path, 'w') as f:
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Journal non vidé après compaction: {e}")
+
+    def needs_compaction(self, max_bytes=None):
+        return self.size() > (JOURNAL_MAX_BYTES if max_bytes is None else max_bytes)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compacte le journal des mouvements dans movements.json")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(__file__), '..', 'data'))
+    parser.add_argument('--max-bytes', type=int, default=JOURNAL_MAX_BYTES)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args(argv)
+
+    journal = MovementJournal(os.path.join(args.data_dir, 'movements.journal.jsonl'),
+                              os.path.join(args.data_dir, 'movements.json'))
+    size = journal.size()
+    if not args.force and not journal.needs_compaction(args.max_bytes):
+        print(f"Journal {size} octets <= {args.max_bytes}, rien à compacter")
+        return
+    journal.compact()
+    print(f"Journal compacté ({size} octets, checkpoint {journal.checkpoint_seq})")
+
+if __name__ == '__main__':
+    main()
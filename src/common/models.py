@@ -1,14 +1,17 @@
+import sys
+from operator import attrgetter
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import List, Optional
 from datetime import datetime
+from .events import change_bus
 
-@dataclass
+@dataclass(slots=True)
 class Category:
     id: int
     name: str
     parent_id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class Supplier:
     id: int
     name: str
@@ -16,14 +19,14 @@ class Supplier:
     email: str = ""
     phone: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class Variant:
     size: str
     color: str
     quantity: int
     sku: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     id: int
     reference: str
@@ -38,7 +41,7 @@ class Product:
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
 
-@dataclass
+@dataclass(slots=True)
 class Movement:
     id: int
     product_id: int
@@ -48,8 +51,269 @@ class Movement:
     user: str = ""
     date: datetime = field(default_factory=datetime.now)
 
+class RawRecords(list):
+    # Dicts straight from the loader, turned into records on first access
+    pass
+
+# Shared by every loaded product without photos (photos lists are replaced, never mutated)
+NO_PHOTOS = ()
+
+class LazyField:
+    # Wraps the slot of a field holding a raw loaded value (ISO string,
+    # RawRecords...) until the attribute is first read
+    def __init__(self, cls, name, raw_type, convert):
+        self.slot = cls.__dict__[name]
+        self.raw_type = raw_type
+        self.convert = convert
+        # raw(obj): the stored value, without conversion
+        self.raw = self.slot.__get__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj)
+        if type(value) is self.raw_type:
+            value = self.convert(value)
+            self.slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+def _lazy(cls, name, raw_type, convert):
+    setattr(cls, name, LazyField(cls, name, raw_type, convert))
+
+def raw_value(obj, name):
+    # Stored value without triggering the conversion
+    descriptor = type(obj).__dict__[name]
+    return descriptor.raw(obj) if isinstance(descriptor, LazyField) else descriptor.__get__(obj)
+
+_DICT_BUILDERS = {}
+
+def _dict_builder(cls):
+    # Plain slots are read in one attrgetter call, lazy ones through raw()
+    names = cls.__slots__
+    lazy = [(name, cls.__dict__[name].raw) for name in names if isinstance(cls.__dict__[name], LazyField)]
+    lazy_names = {name for name, _ in lazy}
+    plain = [name for name in names if name not in lazy_names]
+    get_plain = attrgetter(*plain)
+
+    def build(record):
+        d = dict(zip(plain, get_plain(record)))
+        for name, raw in lazy:
+            d[name] = raw(record)
+        return d
+    return build
+
+def record_to_dict(record):
+    cls = type(record)
+    build = _DICT_BUILDERS.get(cls)
+    if build is None:
+        build = _DICT_BUILDERS[cls] = _dict_builder(cls)
+    return build(record)
+
+def iso_string(value):
+    # Serialize a datetime field that may still hold its raw ISO string
+    return value if type(value) is str else value.isoformat()
+
+_interned_ints = {}
+
+def intern_value(value):
+    # One shared object per distinct string / id
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is int:
+        return _interned_ints.setdefault(value, value)
+    return value
+
+# Fields repeated across many records, interned by the loaders
+INTERNED_FIELDS = {
+    Variant: ('size', 'color'),
+    Product: ('category_id', 'supplier_id'),
+    Movement: ('product_id', 'type', 'reason', 'user'),
+}
+
+def records_from_dicts(cls, items):
+    interned = INTERNED_FIELDS.get(cls, ())
+    records = []
+    append = records.append
+    for item in items:
+        for name in interned:
+            if name in item:
+                item[name] = intern_value(item[name])
+        append(cls(**item))
+    return records
+
+def _build_variants(raw):
+    return records_from_dicts(Variant, raw)
+
+_lazy(Product, 'variants', RawRecords, _build_variants)
+_lazy(Product, 'created_at', str, datetime.fromisoformat)
+_lazy(Product, 'updated_at', str, datetime.fromisoformat)
+_lazy(Movement, 'date', str, datetime.fromisoformat)
+
+@dataclass
+class ChangeSet:
+    added: List = field(default_factory=list)
+    updated: List = field(default_factory=list)
+    removed_ids: List[int] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed_ids)
+
+class Store(list):
+    # List of records that remembers which ones changed since the last flush.
+    # Appends and removals are tracked automatically; in-place edits of a
+    # record must be reported with touch().
+    def __init__(self, name, records=()):
+        super().__init__(records)
+        self.name = name
+        self._pending = {}  # id -> record added or updated since the last flush
+        self._added_ids = set()
+        self._removed_ids = set()
+        # Bumped on every change / on changes other than appends, so derived
+        # views can tell when they only need to pick up the new tail
+        self.revision = 0
+        self.layout_revision = 0
+        # Called as listener(store, added, removed, updated) after each change,
+        # before the typed events are published on events.change_bus. Meant
+        # for indexes that views read while handling those events.
+        self._listeners = []
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _changed(self, added=(), removed=(), updated=(), layout=True, reloaded=False):
+        self.revision += 1
+        if layout:
+            self.layout_revision += 1
+        for listener in self._listeners:
+            listener(self, added, removed, updated)
+        change_bus.store_changed(self, added, removed, updated, reloaded)
+
+    def _mark_added(self, record):
+        rid = record.id
+        self._pending[rid] = record
+        if rid in self._removed_ids:
+            self._removed_ids.discard(rid)
+        else:
+            self._added_ids.add(rid)
+
+    def _mark_removed(self, record):
+        rid = record.id
+        self._pending.pop(rid, None)
+        if rid in self._added_ids:
+            self._added_ids.discard(rid)
+        else:
+            self._removed_ids.add(rid)
+
+    def append(self, record):
+        super().append(record)
+        self._mark_added(record)
+        self._changed(added=(record,), layout=False)
+
+    def insert(self, index, record):
+        super().insert(index, record)
+        self._mark_added(record)
+        self._changed(added=(record,))
+
+    def extend(self, records):
+        records = list(records)
+        super().extend(records)
+        for r in records:
+            self._mark_added(r)
+        self._changed(added=records, layout=False)
+
+    def __iadd__(self, records):
+        self.extend(records)
+        return self
+
+    def remove(self, record):
+        super().remove(record)
+        self._mark_removed(record)
+        self._changed(removed=(record,))
+
+    def pop(self, index=-1):
+        record = super().pop(index)
+        self._mark_removed(record)
+        self._changed(removed=(record,))
+        return record
+
+    def clear(self):
+        old = list(self)
+        for r in old:
+            self._mark_removed(r)
+        super().clear()
+        self._changed(removed=old)
+
+    def __setitem__(self, index, value):
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        super().__setitem__(index, value)
+        value = list(value) if isinstance(index, slice) else [value]
+        for r in old:
+            self._mark_removed(r)
+        for r in value:
+            self._mark_added(r)
+        self._changed(added=value, removed=old)
+
+    def __delitem__(self, index):
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        for r in old:
+            self._mark_removed(r)
+        self._changed(removed=old)
+
+    def touch(self, *records):
+        for r in records:
+            if r.id not in self._pending:
+                self._pending[r.id] = r
+        self._changed(updated=records)
+
+    def reset(self, records):
+        # Replace the content with freshly loaded records (nothing to flush)
+        old = list(self)
+        super().clear()
+        super().extend(records)
+        self.mark_clean()
+        self._changed(added=list(self), removed=old, reloaded=True)
+
+    def mark_clean(self):
+        self._pending.clear()
+        self._added_ids.clear()
+        self._removed_ids.clear()
+
+    def is_dirty(self):
+        return bool(self._pending or self._removed_ids)
+
+    def requeue(self, changes):
+        # Put back changes taken by a flush that failed. Nothing changed in
+        # memory, so no change event is published; records removed since
+        # stay removed.
+        for r in changes.added:
+            if r.id not in self._pending and r.id not in self._removed_ids:
+                self._pending[r.id] = r
+                self._added_ids.add(r.id)
+        for r in changes.updated:
+            if r.id not in self._pending and r.id not in self._removed_ids:
+                self._pending[r.id] = r
+        for rid in changes.removed_ids:
+            if rid not in self._pending:
+                self._removed_ids.add(rid)
+
+    def take_changes(self):
+        changes = ChangeSet(
+            added=[r for rid, r in self._pending.items() if rid in self._added_ids],
+            updated=[r for rid, r in self._pending.items() if rid not in self._added_ids],
+            removed_ids=list(self._removed_ids)
+        )
+        self.mark_clean()
+        return changes
+
 # Global data stores
-categories: List[Category] = []
-suppliers: List[Supplier] = []
-products: List[Product] = []
-movements: List[Movement] = []
\ No newline at end of file
+categories: Store = Store('categories')
+suppliers: Store = Store('suppliers')
+products: Store = Store('products')
+movements: Store = Store('movements')
\ No newline at end of file
@@ -0,0 +1,282 @@
+import io
+import json
+import os
+import warnings
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from .models import Movement, movements, raw_value, iso_string
+from .fileio import atomic_write, atomic_write_json
+
+# Column-oriented copy of the movements store for analytics: one NumPy array
+# per field, with type/reason/user stored as codes into string pools and
+# dates as int64 microseconds since the epoch (naive dates are taken as is).
+# The Store stays the source of truth; sync() follows it.
+
+COLUMNS = {
+    'id': np.int64,
+    'product_id': np.int64,
+    'type': np.int16,
+    'quantity': np.int64,
+    'date': np.int64,
+    'reason': np.int32,
+    'user': np.int32,
+}
+
+MANIFEST = 'columns.json'
+EPOCH = datetime(1970, 1, 1)
+US_PER_DAY = 86_400_000_000
+
+TYPE_IN = 0
+
+class StringPool:
+    # Interned strings; codes are positions in values
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, values):
+        code = self.code
+        return np.fromiter((code(v) for v in values), dtype=np.int32, count=len(values))
+
+    def find(self, value):
+        # -1 matches no row
+        return self.codes.get(value, -1)
+
+def _epoch_us(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+def to_epoch_us(values):
+    # Datetimes or raw ISO strings -> int64 array; numpy parses the strings in C
+    strings = [iso_string(v) for v in values]
+    try:
+        with warnings.catch_warnings():
+            # Offsets are applied (UTC), numpy only warns that it drops them
+            warnings.simplefilter('ignore', UserWarning)
+            return np.array(strings, dtype='datetime64[us]').astype(np.int64)
+    except ValueError:
+        # Timezone offsets and other formats numpy does not take
+        return np.fromiter((_epoch_us(datetime.fromisoformat(s)) for s in strings), dtype=np.int64, count=len(strings))
+
+def as_datetime64(epoch_us):
+    return np.asarray(epoch_us).astype('datetime64[us]')
+
+def _bound(value):
+    return _epoch_us(value) if isinstance(value, datetime) else int(value)
+
+class MovementColumns:
+    def __init__(self):
+        self.count = 0
+        self._data = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.types = StringPool(['in', 'out'])
+        self.reasons = StringPool()
+        self.users = StringPool()
+        self.meta = {}
+        # Store.layout_revision the arrays mirror
+        self.layout_revision = None
+        # False while the arrays match what save() / load() last saw on disk
+        self.modified = True
+
+    def column(self, name):
+        return self._data[name][:self.count]
+
+    @property
+    def ids(self):
+        return self.column('id')
+
+    @property
+    def product_ids(self):
+        return self.column('product_id')
+
+    @property
+    def type_codes(self):
+        return self.column('type')
+
+    @property
+    def quantities(self):
+        return self.column('quantity')
+
+    @property
+    def dates(self):
+        return self.column('date')
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.__init__()
+
+    def _reserve(self, n):
+        needed = self.count + n
+        for name, array in self._data.items():
+            # Memory-mapped arrays are read-only: copy them on first append
+            if len(array) < needed or not array.flags.writeable:
+                grown = np.empty(max(needed, 2 * len(array), 1024), dtype=array.dtype)
+                grown[:self.count] = array[:self.count]
+                self._data[name] = grown
+
+    def extend(self, records):
+        records = list(records)
+        n = len(records)
+        if not n:
+            return
+        self._reserve(n)
+        rows = slice(self.count, self.count + n)
+        data = self._data
+        data['id'][rows] = np.fromiter((m.id for m in records), dtype=np.int64, count=n)
+        data['product_id'][rows] = np.fromiter((m.product_id for m in records), dtype=np.int64, count=n)
+        data['quantity'][rows] = np.fromiter((m.quantity for m in records), dtype=np.int64, count=n)
+        data['type'][rows] = self.types.encode([m.type for m in records])
+        data['reason'][rows] = self.reasons.encode([m.reason for m in records])
+        data['user'][rows] = self.users.encode([m.user for m in records])
+        data['date'][rows] = to_epoch_us([raw_value(m, 'date') for m in records])
+        self.count += n
+        self.modified = True
+
+    def sync(self, store):
+        # Appends are picked up incrementally; any other change rebuilds
+        if self.layout_revision == store.layout_revision and len(store) >= self.count:
+            self.extend(store[self.count:])
+        else:
+            self.clear()
+            self.extend(store)
+        self.layout_revision = store.layout_revision
+        return self
+
+    # Queries
+
+    def mask(self, product_id=None, type=None, start=None, end=None):
+        # product_id may be a single id or a collection of ids;
+        # start/end are datetimes or epoch microseconds, end excluded
+        selected = np.ones(self.count, dtype=bool)
+        if product_id is not None:
+            if isinstance(product_id, (int, np.integer)):
+                selected &= self.product_ids == product_id
+            else:
+                selected &= np.isin(self.product_ids, np.fromiter(product_id, dtype=np.int64))
+        if type is not None:
+            selected &= self.type_codes == self.types.find(type)
+        if start is not None:
+            selected &= self.dates >= _bound(start)
+        if end is not None:
+            selected &= self.dates < _bound(end)
+        return selected
+
+    def select(self, order_by_date=False, descending=False, limit=None, **filters):
+        # Row indices matching the filters
+        indices = np.flatnonzero(self.mask(**filters))
+        if order_by_date:
+            indices = indices[np.argsort(self.dates[indices], kind='stable')]
+            if descending:
+                indices = indices[::-1]
+        if limit is not None:
+            indices = indices[:limit]
+        return indices
+
+    def signed_quantities(self):
+        # +quantity for 'in', -quantity for every other type (as the stock timeline always counted them)
+        quantities = self.quantities
+        return np.where(self.type_codes == TYPE_IN, quantities, -quantities)
+
+    def stock_evolution(self, **filters):
+        # (dates, running stock) in date order
+        indices = self.select(order_by_date=True, **filters)
+        return self.dates[indices], np.cumsum(self.signed_quantities()[indices])
+
+    def _group_sum(self, keys, values):
+        groups, inverse = np.unique(keys, return_inverse=True)
+        return groups, np.bincount(inverse, weights=values, minlength=len(groups)).astype(np.int64)
+
+    def net_by_product(self, **filters):
+        # (product ids, net quantity moved)
+        selected = self.mask(**filters)
+        return self._group_sum(self.product_ids[selected], self.signed_quantities()[selected])
+
+    def net_by_day(self, **filters):
+        # (days as epoch microseconds at midnight, net quantity moved)
+        selected = self.mask(**filters)
+        days, totals = self._group_sum(self.dates[selected] // US_PER_DAY, self.signed_quantities()[selected])
+        return days * US_PER_DAY, totals
+
+    def records(self, indices):
+        # Movement objects for the given rows, e.g. for display
+        types, reasons, users = self.types.values, self.reasons.values, self.users.values
+        data = self._data
+        return [Movement(id=i, product_id=p, type=types[t], quantity=q, reason=reasons[r], user=users[u], date=d)
+                for i, p, t, q, r, u, d in zip(
+                    data['id'][indices].tolist(), data['product_id'][indices].tolist(),
+                    data['type'][indices].tolist(), data['quantity'][indices].tolist(),
+                    data['reason'][indices].tolist(), data['user'][indices].tolist(),
+                    as_datetime64(data['date'][indices]).tolist())]
+
+    # Persistence: one .npy file per column plus a JSON manifest
+
+    def save(self, directory, meta=None):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self._data.items():
+            if isinstance(array, np.memmap):
+                # The file is about to be replaced: unmap it first (Windows
+                # refuses to replace a mapped file)
+                self._data[name] = np.array(array[:self.count])
+        for name in COLUMNS:
+            buffer = io.BytesIO()
+            np.save(buffer, self.column(name))
+            atomic_write(os.path.join(directory, f"{name}.npy"), buffer.getvalue())
+        # Written last: load() checks the column lengths against it
+        atomic_write_json(os.path.join(directory, MANIFEST), {
+            'count': self.count,
+            'types': self.types.values,
+            'reasons': self.reasons.values,
+            'users': self.users.values,
+            'meta': meta or {},
+        })
+        self.modified = False
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        # Columns are memory-mapped: nothing is read until used
+        with open(os.path.join(directory, MANIFEST), 'r') as f:
+            manifest = json.load(f)
+        columns = cls()
+        for name, dtype in COLUMNS.items():
+            array = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            if array.dtype != dtype or len(array) != manifest['count']:
+                raise ValueError(f"Colonne {name} incohérente")
+            columns._data[name] = array
+        columns.count = manifest['count']
+        columns.types = StringPool(manifest['types'])
+        columns.reasons = StringPool(manifest['reasons'])
+        columns.users = StringPool(manifest['users'])
+        columns.meta = manifest.get('meta', {})
+        columns.modified = False
+        return columns
+
+    def matches(self, store):
+        # Movements are append-only: a saved copy whose last row is still in
+        # place is a prefix of the store
+        if self.count > len(store):
+            return False
+        return self.count == 0 or int(self.ids[self.count - 1]) == store[self.count - 1].id
+
+_columns = MovementColumns()
+
+def movement_columns():
+    # Columns in sync with models.movements
+    return _columns.sync(movements)
+
+def adopt(columns):
+    # Use saved columns if they are a prefix of the loaded store
+    global _columns
+    if not columns.matches(movements):
+        return False
+    columns.layout_revision = movements.layout_revision
+    _columns = columns
+    return True
@@ -0,0 +1,96 @@
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot
+from .storage import collect_changes, write_changes, requeue_changes, sync_pending, save_snapshot, save_movement_columns
+
+# Edits closer together than this are written in a single flush
+COALESCE_DELAY_MS = 300
+
+class SaveWorker(QObject):
+    finished = Signal(object, object)  # PendingSave, SaveStats
+    failed = Signal(object, str)
+
+    @Slot(object)
+    def write(self, pending):
+        try:
+            stats = write_changes(pending)
+        except Exception as e:
+            self.failed.emit(pending, str(e))
+        else:
+            self.finished.emit(pending, stats)
+
+class PersistenceService(QObject):
+    # Collects dirty records on the GUI thread and writes them on a
+    # background thread, so no dialog blocks on disk or network I/O
+    write_requested = Signal(object)
+    save_finished = Signal(object)  # SaveStats
+    save_failed = Signal(str)
+
+    def __init__(self, delay_ms=COALESCE_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self._in_flight = []
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+
+        self._thread = QThread()
+        self._worker = SaveWorker()
+        self._worker.moveToThread(self._thread)
+        self.write_requested.connect(self._worker.write)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.failed.connect(self._on_failed)
+        self._thread.start()
+
+    @Slot()
+    def request_save(self):
+        # Restarting the timer coalesces bursts of edits
+        self._timer.start()
+
+    @Slot()
+    def flush(self):
+        self._timer.stop()
+        pending = collect_changes()
+        if pending or sync_pending():
+            self._in_flight.append(pending)
+            self.write_requested.emit(pending)
+
+    def _on_finished(self, pending, stats):
+        self._forget(pending)
+        self.save_finished.emit(stats)
+
+    def _on_failed(self, pending, message):
+        self._forget(pending)
+        requeue_changes(pending)
+        self.save_failed.emit(message)
+
+    def _forget(self, pending):
+        self._in_flight = [p for p in self._in_flight if p is not pending]
+
+    def shutdown(self):
+        # Stop the worker, then write whatever is left synchronously
+        self._timer.stop()
+        self._thread.quit()
+        self._thread.wait()
+        for pending in self._in_flight:
+            if not pending.written:
+                write_changes(pending)
+        self._in_flight = []
+        write_changes(collect_changes())
+        # Next start loads from the binary snapshot
+        save_snapshot()
+        save_movement_columns()
+
+_service = None
+
+def get_persistence():
+    global _service
+    if _service is None:
+        _service = PersistenceService()
+    return _service
+
+def request_save():
+    get_persistence().request_save()
+
+def flush():
+    # Hand the pending changes to the worker now, e.g. per imported chunk
+    get_persistence().flush()
@@ -0,0 +1,218 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from functools import lru_cache
+from .models import products, raw_value, RawRecords
+
+# Inverted index over the product store: normalized token -> {product id:
+# weight}. Tokens are matched by prefix, through a sorted token list. Built
+# on first search, then kept up to date through the store listener.
+
+# Weight of a match in each field; a product's score is the sum, over the
+# query terms, of its best match (exact tokens count double)
+FIELD_WEIGHTS = {
+    'reference': 8,
+    'sku': 6,
+    'barcode': 6,
+    'name': 4,
+    'color': 2,
+    'description': 1,
+}
+# Above this many records in one change, the sorted token list is rebuilt
+# on the next search instead of being updated token by token
+BULK_CHANGE = 100
+
+_TOKEN = re.compile(r'\w+')
+# Accents left as separate marks by the NFKD decomposition
+_COMBINING = re.compile('[\u0300-\u036f]')
+
+def normalize(text):
+    # Lower case without accents: 'Écharpe Été' -> 'echarpe ete'
+    if text.isascii():
+        return text.lower()
+    return _COMBINING.sub('', unicodedata.normalize('NFKD', text)).casefold()
+
+@lru_cache(maxsize=65536)
+def terms(text):
+    # Names, colors and descriptions repeat a lot across products
+    return tuple(_TOKEN.findall(normalize(text))) if text else ()
+
+def narrows(old_query, new_query):
+    # True when every product matching new_query also matches old_query:
+    # each old term is the prefix of a new term
+    new_terms = terms(new_query)
+    return all(any(n.startswith(o) for n in new_terms) for o in terms(old_query))
+
+def _field_values(product):
+    variants = raw_value(product, 'variants')
+    if type(variants) is RawRecords:
+        skus = [v.get('sku', '') for v in variants]
+        colors = [v.get('color', '') for v in variants]
+    else:
+        skus = [v.sku for v in variants]
+        colors = [v.color for v in variants]
+    yield 'reference', product.reference
+    yield 'name', product.name
+    yield 'barcode', product.barcode
+    yield 'description', product.description
+    for sku in skus:
+        yield 'sku', sku
+    for color in colors:
+        yield 'color', color
+
+def product_tokens(product):
+    # token -> best weight for one product
+    tokens = {}
+    for field, value in _field_values(product):
+        weight = FIELD_WEIGHTS[field]
+        for token in terms(value):
+            if tokens.get(token, 0) < weight:
+                tokens[token] = weight
+    return tokens
+
+def _entries(bucket):
+    return (bucket,) if type(bucket) is tuple else bucket.items()
+
+class SearchIndex:
+    def __init__(self, store):
+        self.store = store
+        self._postings = None  # token -> {product id: weight} or (product id, weight)
+        self._tokens = {}  # product id -> its tokens
+        self._records = {}  # product id -> product
+        self._sorted = None  # sorted tokens, rebuilt lazily
+        store.subscribe(self._on_change)
+
+    # A token found in a single product (references, SKUs, barcodes...)
+    # maps to a (product id, weight) tuple rather than a dict
+
+    def _add(self, record, new_tokens):
+        tokens = product_tokens(record)
+        product_id = record.id
+        self._tokens[product_id] = tuple(tokens)
+        self._records[product_id] = record
+        postings = self._postings
+        for token, weight in tokens.items():
+            bucket = postings.get(token)
+            if bucket is None:
+                postings[token] = (product_id, weight)
+                new_tokens.append(token)
+            elif type(bucket) is tuple:
+                if bucket[0] == product_id:
+                    postings[token] = (product_id, weight)
+                else:
+                    postings[token] = {bucket[0]: bucket[1], product_id: weight}
+            else:
+                bucket[product_id] = weight
+
+    def _remove(self, record, gone_tokens):
+        product_id = record.id
+        self._records.pop(product_id, None)
+        postings = self._postings
+        for token in self._tokens.pop(product_id, ()):
+            bucket = postings.get(token)
+            if bucket is None:
+                continue
+            if type(bucket) is tuple:
+                if bucket[0] == product_id:
+                    del postings[token]
+                    gone_tokens.append(token)
+            else:
+                bucket.pop(product_id, None)
+                if not bucket:
+                    del postings[token]
+                    gone_tokens.append(token)
+
+    def _on_change(self, store, added, removed, updated):
+        if self._postings is None:
+            return
+        new_tokens = []
+        gone_tokens = []
+        for record in removed:
+            self._remove(record, gone_tokens)
+        for record in updated:
+            self._remove(record, gone_tokens)
+            self._add(record, new_tokens)
+        for record in added:
+            self._add(record, new_tokens)
+        if self._sorted is None:
+            return
+        if len(added) + len(removed) + len(updated) > BULK_CHANGE:
+            self._sorted = None
+            return
+        # Tokens that moved between products may be both gone and new
+        for token in gone_tokens:
+            if token not in self._postings:
+                i = bisect_left(self._sorted, token)
+                if i < len(self._sorted) and self._sorted[i] == token:
+                    del self._sorted[i]
+        for token in new_tokens:
+            i = bisect_left(self._sorted, token)
+            if i == len(self._sorted) or self._sorted[i] != token:
+                insort(self._sorted, token)
+
+    def _ensure(self):
+        if self._postings is None:
+            self._postings = {}
+            self._tokens = {}
+            self._records = {}
+            new_tokens = []
+            for record in self.store:
+                self._add(record, new_tokens)
+            self._sorted = None
+        if self._sorted is None:
+            self._sorted = sorted(self._postings)
+        return self._postings
+
+    def _term_scores(self, term):
+        # product id -> best weight of a token starting with term
+        postings = self._ensure()
+        scores = {}
+        exact = postings.get(term)
+        if exact:
+            for product_id, weight in _entries(exact):
+                scores[product_id] = weight * 2
+        tokens = self._sorted
+        i = bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            if tokens[i] != term:
+                for product_id, weight in _entries(postings[tokens[i]]):
+                    if scores.get(product_id, 0) < weight:
+                        scores[product_id] = weight
+            i += 1
+        return scores
+
+    def scores(self, query):
+        # product id -> score, for the products matching every term
+        query_terms = sorted(set(terms(query)), key=len, reverse=True)
+        if not query_terms:
+            return {}
+        result = None
+        for term in query_terms:
+            term_scores = self._term_scores(term)
+            if result is None:
+                result = term_scores
+            else:
+                result = {pid: score + term_scores[pid] for pid, score in result.items() if pid in term_scores}
+            if not result:
+                break
+        return result
+
+    def search(self, query, limit=None):
+        # Matching products, best first (ties by reference)
+        scores = self.scores(query)
+        records = self._records
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], records[pid].reference))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [records[pid] for pid in ranked]
+
+    def matches(self, product_id, query):
+        # Single product test, for rows changed after a search
+        self._ensure()
+        tokens = self._tokens.get(product_id, ())
+        return all(any(token.startswith(term) for token in tokens) for term in terms(query))
+
+product_index = SearchIndex(products)
+
+def search_products(query, limit=None):
+    return product_index.search(query, limit)
@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+from .fileio import atomic_write_json
+
+# Ids are handed out from blocks: the file only records the end of the
+# current block, so a crash may skip ids but never hands one out twice
+BLOCK_SIZE = 100
+
+class IdSequences:
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = {}   # data type -> next id to hand out
+        self._limit = {}  # data type -> first id past the saved block
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._limit = {k: int(v) for k, v in json.load(f).items()}
+        except ValueError as e:
+            print(f"Ignoring unreadable id sequences: {e}")
+            return
+        # Whatever was left of the previous blocks is skipped
+        self._next = dict(self._limit)
+
+    def _allocate(self, data_type, count):
+        start = self._next.get(data_type, 1)
+        end = start + count
+        if end > self._limit.get(data_type, 0):
+            self._limit[data_type] = end + self.block_size
+            atomic_write_json(self.path, self._limit)
+        self._next[data_type] = end
+        return start
+
+    def ensure_above(self, data_type, max_id):
+        # Called with the highest id loaded, in case the file is missing or older
+        with self._lock:
+            if self._next.get(data_type, 1) <= max_id:
+                self._next[data_type] = max_id + 1
+
+    def next_id(self, data_type):
+        with self._lock:
+            return self._allocate(data_type, 1)
+
+    def reserve(self, data_type, count):
+        # Contiguous block of ids for bulk imports
+        with self._lock:
+            start = self._allocate(data_type, count)
+        return range(start, start + count)
@@ -0,0 +1,48 @@
+from .models import Category, Supplier, Product, Movement, RawRecords, NO_PHOTOS, iso_string, record_to_dict, records_from_dicts
+
+# Record <-> plain dict conversion shared by the JSON files, the journal,
+# the Firebase sync and the exports
+
+def category_to_dict(cat):
+    return record_to_dict(cat)
+
+def supplier_to_dict(sup):
+    return record_to_dict(sup)
+
+def movement_to_dict(mov):
+    d = record_to_dict(mov)
+    d['date'] = iso_string(d['date'])
+    return d
+
+def product_to_dict(prod):
+    d = record_to_dict(prod)
+    d['created_at'] = iso_string(d['created_at'])
+    d['updated_at'] = iso_string(d['updated_at'])
+    variants = d['variants']
+    d['variants'] = list(variants) if type(variants) is RawRecords else [record_to_dict(v) for v in variants]
+    d['photos'] = list(d['photos'])
+    return d
+
+TO_DICT = {
+    'categories': category_to_dict,
+    'suppliers': supplier_to_dict,
+    'products': product_to_dict,
+    'movements': movement_to_dict,
+}
+
+def products_from_dicts(items):
+    # Dates and variants stay raw until first read (see models.LazyField)
+    for item in items:
+        item['variants'] = RawRecords(item['variants'])
+        if not item.get('photos'):
+            item['photos'] = NO_PHOTOS
+        if item.get('updated_at') == item.get('created_at'):
+            item['updated_at'] = item.get('created_at')
+    return records_from_dicts(Product, items)
+
+FROM_DICTS = {
+    'categories': lambda items: records_from_dicts(Category, items),
+    'suppliers': lambda items: records_from_dicts(Supplier, items),
+    'products': products_from_dicts,
+    'movements': lambda items: records_from_dicts(Movement, items),
+}
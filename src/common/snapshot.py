@@ -0,0 +1,196 @@
+import gc
+import gzip
+import json
+import struct
+from array import array
+from .models import (Category, Supplier, Product, Movement, Variant, RawRecords, NO_PHOTOS, INTERNED_FIELDS,
+                     intern_value, raw_value, record_to_dict, iso_string)
+from .fileio import atomic_write
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Binary snapshot of the four stores, stored column by column:
+#   header  = MAGIC, format version (u16), compression (u8)
+#   payload = manifest length (u32), JSON manifest, column blobs
+# Integers and floats are raw array() buffers, strings are NUL-joined UTF-8
+# and anything else (None, lists) is one JSON document per column.
+
+MAGIC = b'GSNP'
+VERSION = 1
+HEADER = struct.Struct('<4sHB')
+
+COMPRESSION_NONE = 0
+COMPRESSION_GZIP = 1
+COMPRESSION_ZSTD = 2
+
+DEFAULT_COMPRESSION = 'zstd' if zstandard is not None else 'gzip'
+
+COLUMNS = {
+    'categories': [('id', 'q'), ('name', 's'), ('parent_id', 'q')],
+    'suppliers': [('id', 'q'), ('name', 's'), ('contact', 's'), ('email', 's'), ('phone', 's')],
+    'products': [('id', 'q'), ('reference', 's'), ('name', 's'), ('category_id', 'q'), ('supplier_id', 'q'),
+                 ('price', 'd'), ('photos', 'j'), ('barcode', 's'), ('description', 's'),
+                 ('created_at', 's'), ('updated_at', 's')],
+    'variants': [('size', 's'), ('color', 's'), ('quantity', 'q'), ('sku', 's')],
+    'movements': [('id', 'q'), ('product_id', 'q'), ('type', 's'), ('quantity', 'q'), ('reason', 's'),
+                  ('user', 's'), ('date', 's')],
+}
+
+DATETIME_FIELDS = {'created_at', 'updated_at', 'date'}
+
+class SnapshotError(Exception):
+    pass
+
+def _encode_column(values, kind):
+    # Falls back to the generic 'j' kind when the values do not fit
+    if kind in ('q', 'd'):
+        try:
+            return kind, array(kind, values).tobytes()
+        except (TypeError, OverflowError):
+            kind = 'j'
+    elif kind == 's':
+        if all(type(v) is str and '\x00' not in v for v in values):
+            return 's', '\x00'.join(values).encode('utf-8')
+        kind = 'j'
+    return 'j', json.dumps(values).encode('utf-8')
+
+def _decode_column(blob, kind, count):
+    if count == 0:
+        return []
+    if kind in ('q', 'd'):
+        values = array(kind)
+        values.frombytes(blob)
+        return values.tolist()
+    if kind == 's':
+        return blob.decode('utf-8').split('\x00')
+    return json.loads(blob)
+
+def _field_value(record, name):
+    if name in DATETIME_FIELDS:
+        return iso_string(raw_value(record, name))
+    return getattr(record, name)
+
+def _variant_dicts(product):
+    variants = raw_value(product, 'variants')
+    if type(variants) is RawRecords:
+        return variants
+    return [record_to_dict(v) for v in variants]
+
+def encode(collections, meta=None, compression=DEFAULT_COMPRESSION):
+    # collections: {'categories': [...], 'suppliers': [...], 'products': [...], 'movements': [...]}
+    manifest = {'meta': meta or {}, 'tables': {}}
+    blobs = []
+    offset = 0
+
+    def add_table(table, rows_count, columns):
+        nonlocal offset
+        entry = {'count': rows_count, 'columns': []}
+        for name, kind, values in columns:
+            kind, blob = _encode_column(values, kind)
+            entry['columns'].append([name, kind, offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        manifest['tables'][table] = entry
+
+    for table in ('categories', 'suppliers', 'movements'):
+        records = collections.get(table, [])
+        add_table(table, len(records),
+                  [(name, kind, [_field_value(r, name) for r in records]) for name, kind in COLUMNS[table]])
+
+    # Variants are flattened into their own table; the products table keeps
+    # the number of variants of each product in its 'variants' column
+    records = collections.get('products', [])
+    variant_lists = [_variant_dicts(p) for p in records]
+    product_columns = [(name, kind, [_field_value(r, name) for r in records]) for name, kind in COLUMNS['products']]
+    product_columns.append(('variants', 'q', [len(variants) for variants in variant_lists]))
+    add_table('products', len(records), product_columns)
+    flat = [v for variants in variant_lists for v in variants]
+    add_table('variants', len(flat), [(name, kind, [v[name] for v in flat]) for name, kind in COLUMNS['variants']])
+
+    manifest_bytes = json.dumps(manifest).encode('utf-8')
+    payload = struct.pack('<I', len(manifest_bytes)) + manifest_bytes + b''.join(blobs)
+
+    if compression == 'zstd':
+        if zstandard is None:
+            raise SnapshotError("zstandard n'est pas installé")
+        code, payload = COMPRESSION_ZSTD, zstandard.ZstdCompressor(level=3).compress(payload)
+    elif compression == 'gzip':
+        code, payload = COMPRESSION_GZIP, gzip.compress(payload, compresslevel=1)
+    else:
+        code = COMPRESSION_NONE
+    return HEADER.pack(MAGIC, VERSION, code) + payload
+
+def _build(cls, names, columns):
+    by_name = dict(zip(names, columns))
+    for name in INTERNED_FIELDS.get(cls, ()):
+        if name in by_name:
+            by_name[name] = list(map(intern_value, by_name[name]))
+    if by_name.keys() >= set(cls.__slots__):
+        # Positional constructor calls, one column per field in field order
+        return list(map(cls, *(by_name[name] for name in cls.__slots__)))
+    names = list(by_name)
+    return [cls(**dict(zip(names, row))) for row in zip(*by_name.values())]
+
+def decode(data):
+    # Only acyclic records are created: skip the collector passes they trigger
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _decode(data)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _decode(data):
+    magic, version, code = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Pas un snapshot de stock")
+    if version > VERSION:
+        raise SnapshotError(f"Version de snapshot {version} non supportée")
+    payload = memoryview(data)[HEADER.size:]
+    if code == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise SnapshotError("zstandard n'est pas installé")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif code == COMPRESSION_GZIP:
+        payload = gzip.decompress(payload)
+    payload = memoryview(payload)
+
+    (manifest_len,) = struct.unpack_from('<I', payload)
+    manifest = json.loads(bytes(payload[4:4 + manifest_len]))
+    base = 4 + manifest_len
+
+    def read_table(table):
+        entry = manifest['tables'][table]
+        names, columns = [], []
+        for name, kind, offset, length in entry['columns']:
+            names.append(name)
+            columns.append(_decode_column(bytes(payload[base + offset:base + offset + length]), kind, entry['count']))
+        return names, columns
+
+    collections = {}
+    for table, cls in (('categories', Category), ('suppliers', Supplier), ('products', Product), ('movements', Movement)):
+        collections[table] = _build(cls, *read_table(table))
+
+    variants = _build(Variant, *read_table('variants'))
+    start = 0
+    for product in collections['products']:
+        # The 'variants' column holds the count until it is replaced here
+        n = raw_value(product, 'variants')
+        product.variants = variants[start:start + n]
+        if not product.photos:
+            product.photos = NO_PHOTOS
+        start += n
+    return collections, manifest['meta']
+
+def write_snapshot(path, collections, meta=None, compression=DEFAULT_COMPRESSION):
+    data = encode(collections, meta, compression)
+    atomic_write(path, data)
+    return len(data)
+
+def read_snapshot(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
@@ -1,12 +1,85 @@
-import json
 import os
-import pandas as pd
-from .models import categories, suppliers, products, movements, Category, Supplier, Product, Movement, Variant
-from datetime import datetime
+import threading
+import time
+from .models import categories, suppliers, products, movements, ChangeSet
+from .serialization import TO_DICT, FROM_DICTS, movement_to_dict
+from . import database
+from .journal import MovementJournal
+from .fileio import atomic_write
+from .firebase_sync import FirebaseSync
+from .sequences import IdSequences
+from . import snapshot
+from . import movement_store
+from . import fastjson
+from . import exporters
+from dataclasses import dataclass, field
+from typing import Dict, List
 import firebase_admin
 from firebase_admin import credentials, db
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DB_FILE = os.path.join(DATA_DIR, 'stock.db')
+MOVEMENTS_FILE = os.path.join(DATA_DIR, 'movements.json')
+JOURNAL_FILE = os.path.join(DATA_DIR, 'movements.journal.jsonl')
+SYNC_OUTBOX_FILE = os.path.join(DATA_DIR, 'sync_outbox.jsonl')
+LEGACY_SYNC_OUTBOX_FILE = os.path.join(DATA_DIR, 'sync_outbox.json')
+SNAPSHOT_FILE = os.path.join(DATA_DIR, 'stock.snapshot')
+MOVEMENT_COLUMNS_DIR = os.path.join(DATA_DIR, 'movements.columns')
+SEQUENCES_FILE = os.path.join(DATA_DIR, 'sequences.json')
+
+# Binary snapshot written next to the JSON files ('off' to disable)
+SNAPSHOT_MODE = os.environ.get('STOCK_SNAPSHOT', 'on')
+
+JSON_FILES = {
+    'categories': 'categories.json',
+    'suppliers': 'suppliers.json',
+    'products': 'products.json',
+}
+
+# 'json' keeps the legacy data/*.json files, 'sqlite' uses DB_FILE
+STORAGE_BACKEND = os.environ.get('STOCK_STORAGE_BACKEND', 'json')
+
+_db_conn = None
+
+# Serializes disk access between the GUI thread and the persistence worker
+_io_lock = threading.RLock()
+
+_journal = MovementJournal(JOURNAL_FILE, MOVEMENTS_FILE)
+
+_sequences = None
+
+STORES = {
+    'categories': categories,
+    'suppliers': suppliers,
+    'products': products,
+    'movements': movements,
+}
+
+@dataclass
+class SaveStats:
+    # Per data type: number of records and bytes actually written
+    records: Dict[str, int] = field(default_factory=dict)
+    bytes: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, data_type, records, nbytes):
+        self.records[data_type] = self.records.get(data_type, 0) + records
+        self.bytes[data_type] = self.bytes.get(data_type, 0) + nbytes
+
+    def merge(self, other):
+        for data_type in other.records:
+            self.add(data_type, other.records[data_type], other.bytes.get(data_type, 0))
+
+    @property
+    def total_records(self):
+        return sum(self.records.values())
+
+    @property
+    def total_bytes(self):
+        return sum(self.bytes.values())
+
+last_save_stats = SaveStats()
+total_save_stats = SaveStats()
+last_load_timings = {}
 
 # Firebase initialization (basic setup - replace with actual credentials)
 try:
@@ -19,149 +92,271 @@ except Exception as e:
     print(f"Firebase not configured: {e}")
     firebase_enabled = False
 
+# Delta sync: changed records are queued and pushed as multi-path updates
+_sync = (FirebaseSync(db.reference('/'), SYNC_OUTBOX_FILE, legacy_outbox_path=LEGACY_SYNC_OUTBOX_FILE)
+         if firebase_enabled else None)
+
 def ensure_data_dir():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
+def get_sequences():
+    global _sequences
+    if _sequences is None:
+        ensure_data_dir()
+        _sequences = IdSequences(SEQUENCES_FILE)
+    return _sequences
+
+def next_id(data_type):
+    return get_sequences().next_id(data_type)
+
+def reserve_ids(data_type, count):
+    return get_sequences().reserve(data_type, count)
+
+def get_db():
+    global _db_conn
+    if _db_conn is None:
+        ensure_data_dir()
+        _db_conn = database.connect(DB_FILE, check_same_thread=False)
+    return _db_conn
+
+def read_json_files(timings=None):
+    # Returns the four collections (None when a file is missing) and fills
+    # timings with the seconds spent per collection
+    if timings is None:
+        timings = {}
+    collections = []
+    for data_type, filename in JSON_FILES.items():
+        start = time.perf_counter()
+        path = os.path.join(DATA_DIR, filename)
+        collections.append(FROM_DICTS[data_type](fastjson.load_file(path)) if os.path.exists(path) else None)
+        timings[data_type] = time.perf_counter() - start
+
+    # Load movements: compacted snapshot + journal replay
+    start = time.perf_counter()
+    movs = None
+    if os.path.exists(MOVEMENTS_FILE) or os.path.exists(JOURNAL_FILE):
+        movs = FROM_DICTS['movements'](_journal.load())
+    collections.append(movs)
+    timings['movements'] = time.perf_counter() - start
+    return collections
+
+def _snapshot_is_current():
+    # Usable only when newer than every JSON file; the journal is replayed on top
+    if SNAPSHOT_MODE == 'off' or not os.path.exists(SNAPSHOT_FILE):
+        return False
+    snapshot_mtime = os.path.getmtime(SNAPSHOT_FILE)
+    json_paths = [os.path.join(DATA_DIR, filename) for filename in JSON_FILES.values()] + [MOVEMENTS_FILE]
+    return all(os.path.getmtime(path) <= snapshot_mtime for path in json_paths if os.path.exists(path))
+
+def read_snapshot_file(timings=None):
+    if timings is None:
+        timings = {}
+    start = time.perf_counter()
+    collections, meta = snapshot.read_snapshot(SNAPSHOT_FILE)
+    timings['snapshot'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    movs = collections['movements']
+    movs.extend(FROM_DICTS['movements'](_journal.replay_after(meta.get('journal_seq', 0))))
+    timings['journal'] = time.perf_counter() - start
+    return [collections['categories'], collections['suppliers'], collections['products'], movs]
+
+def save_snapshot():
+    # Call from the GUI thread once pending changes are flushed, e.g. at exit
+    if STORAGE_BACKEND == 'sqlite' or SNAPSHOT_MODE == 'off':
+        return 0
+    ensure_data_dir()
+    with _io_lock:
+        collections = {data_type: list(store) for data_type, store in STORES.items()}
+        return snapshot.write_snapshot(SNAPSHOT_FILE, collections, {'journal_seq': _journal.last_seq})
+
+def load_movement_columns():
+    # Saved analytics columns, memory-mapped; rows added since are appended on first use
+    if not os.path.exists(os.path.join(MOVEMENT_COLUMNS_DIR, movement_store.MANIFEST)):
+        return False
+    try:
+        return movement_store.adopt(movement_store.MovementColumns.load(MOVEMENT_COLUMNS_DIR))
+    except (OSError, ValueError) as e:
+        print(f"Movement columns ignored: {e}")
+        return False
+
+def save_movement_columns():
+    # Returns False when the saved columns are already up to date
+    with _io_lock:
+        columns = movement_store.movement_columns()
+        if not columns.modified:
+            return False
+        ensure_data_dir()
+        columns.save(MOVEMENT_COLUMNS_DIR)
+        return True
+
+def _replace_store(store, records):
+    if records is not None:
+        store.reset(records)
+
 def load_data():
+    # Returns per-collection load times in seconds (also kept in last_load_timings)
+    global last_load_timings
     ensure_data_dir()
-    # Load categories
-    cat_file = os.path.join(DATA_DIR, 'categories.json')
-    if os.path.exists(cat_file):
-        with open(cat_file, 'r') as f:
-            data = json.load(f)
-            categories.clear()
-            for item in data:
-                categories.append(Category(**item))
-
-    # Load suppliers
-    sup_file = os.path.join(DATA_DIR, 'suppliers.json')
-    if os.path.exists(sup_file):
-        with open(sup_file, 'r') as f:
-            data = json.load(f)
-            suppliers.clear()
-            for item in data:
-                suppliers.append(Supplier(**item))
-
-    # Load products
-    prod_file = os.path.join(DATA_DIR, 'products.json')
-    if os.path.exists(prod_file):
-        with open(prod_file, 'r') as f:
-            data = json.load(f)
-            products.clear()
-            for item in data:
-                item['created_at'] = datetime.fromisoformat(item['created_at'])
-                item['updated_at'] = datetime.fromisoformat(item['updated_at'])
-                item['variants'] = [Variant(**v) for v in item['variants']]
-                products.append(Product(**item))
-
-    # Load movements
-    mov_file = os.path.join(DATA_DIR, 'movements.json')
-    if os.path.exists(mov_file):
-        with open(mov_file, 'r') as f:
-            data = json.load(f)
-            movements.clear()
-            for item in data:
-                item['date'] = datetime.fromisoformat(item['date'])
-                movements.append(Movement(**item))
-
-def upload_to_firebase():
-   if not firebase_enabled:
-       return
-   try:
-       data = {
-           'categories': [cat.__dict__ for cat in categories],
-           'suppliers': [sup.__dict__ for sup in suppliers],
-           'products': [prod.__dict__ for prod in products],
-           'movements': [mov.__dict__ for mov in movements]
-       }
-       ref = db.reference('/')
-       ref.set(data)
-       print("Data uploaded to Firebase successfully")
-   except Exception as e:
-       print(f"Failed to upload to Firebase: {e}")
+    timings = {}
+    with _io_lock:
+        if STORAGE_BACKEND == 'sqlite':
+            conn = get_db()
+            if not database.get_meta(conn, 'migrated_from_json'):
+                database.migrate_from_json(conn, [c or [] for c in read_json_files()])
+            start = time.perf_counter()
+            collections = database.load_all(conn)
+            timings['sqlite'] = time.perf_counter() - start
+        elif _snapshot_is_current():
+            try:
+                collections = read_snapshot_file(timings)
+            except Exception as e:
+                print(f"Snapshot ignored: {e}")
+                collections = read_json_files(timings)
+        else:
+            collections = read_json_files(timings)
+    for store, records in zip((categories, suppliers, products, movements), collections):
+        _replace_store(store, records)
+    sequences = get_sequences()
+    for data_type, store in STORES.items():
+        sequences.ensure_above(data_type, max((r.id for r in store), default=0))
+    start = time.perf_counter()
+    load_movement_columns()
+    timings['movement_columns'] = time.perf_counter() - start
+    last_load_timings = timings
+    return timings
+
+def _sync_updates(pending):
+    updates = {}
+    for data_type, change_set in pending.changes.items():
+        to_dict = TO_DICT[data_type]
+        for r in change_set.added + change_set.updated:
+            updates[f"{data_type}/{r.id}"] = to_dict(r)
+        for rid in change_set.removed_ids:
+            updates[f"{data_type}/{rid}"] = None
+    return updates
+
+def _seed_collections():
+    return {data_type: {str(r.id): TO_DICT[data_type](r) for r in list(store)}
+            for data_type, store in STORES.items()}
+
+def upload_to_firebase(pending=None):
+    if _sync is None:
+        return
+    try:
+        if not _sync.seeded:
+            # First sync since the switch to deltas: send everything once.
+            # The payload is only built when the backoff allows an attempt.
+            _sync.seed(_seed_collections)
+        else:
+            if pending is not None:
+                _sync.enqueue(_sync_updates(pending))
+            _sync.push()
+    except Exception as e:
+        print(f"Failed to upload to Firebase: {e}")
+
+def sync_pending():
+    return _sync is not None and (not _sync.seeded or _sync.pending_count() > 0)
+
+@dataclass
+class PendingSave:
+    # Changes taken from the stores, plus frozen copies of the collections
+    # that have to be rewritten as a whole
+    changes: Dict[str, ChangeSet] = field(default_factory=dict)
+    snapshots: Dict[str, List] = field(default_factory=dict)
+    compact_movements: bool = False
+    written: bool = False
+
+    def __bool__(self):
+        return bool(self.changes) or self.compact_movements
+
+def collect_changes():
+    # Must run on the thread that mutates the stores (the GUI thread)
+    pending = PendingSave()
+    for data_type, store in STORES.items():
+        if store.is_dirty():
+            pending.changes[data_type] = store.take_changes()
+    if STORAGE_BACKEND != 'sqlite':
+        for data_type in JSON_FILES:
+            if data_type in pending.changes:
+                pending.snapshots[data_type] = list(STORES[data_type])
+        mov_changes = pending.changes.get('movements')
+        if (mov_changes is not None and (mov_changes.updated or mov_changes.removed_ids)) or _journal.needs_compaction():
+            # Only appends can go to the journal
+            pending.compact_movements = True
+            pending.snapshots['movements'] = list(movements)
+    return pending
+
+def requeue_changes(pending):
+    for data_type, change_set in pending.changes.items():
+        STORES[data_type].requeue(change_set)
+
+def _write_json_collection(data_type, records, stats):
+    path = os.path.join(DATA_DIR, JSON_FILES[data_type])
+    to_dict = TO_DICT[data_type]
+    atomic_write(path, fastjson.dumps_pretty([to_dict(r) for r in records]))
+    stats.add(data_type, len(records), os.path.getsize(path))
+
+def _save_json(pending, stats):
+    for data_type in JSON_FILES:
+        if data_type in pending.snapshots:
+            _write_json_collection(data_type, pending.snapshots[data_type], stats)
+
+    if pending.compact_movements:
+        records = pending.snapshots['movements']
+        flushed = pending.changes.get('movements')
+        _journal.compact([movement_to_dict(m) for m in records],
+                         [m.id for m in flushed.added] if flushed is not None else ())
+        stats.add('movements', len(records), os.path.getsize(MOVEMENTS_FILE))
+    elif 'movements' in pending.changes:
+        added = pending.changes['movements'].added
+        nbytes = _journal.append([movement_to_dict(m) for m in added])
+        stats.add('movements', len(added), nbytes)
+
+def _save_sqlite(pending, stats):
+    for data_type, (records, nbytes) in database.apply_changes(get_db(), pending.changes).items():
+        stats.add(data_type, records, nbytes)
+
+def write_changes(pending):
+    # Disk (and cloud) part of a save; safe to call from a worker thread
+    global last_save_stats
+    stats = SaveStats()
+    if pending:
+        ensure_data_dir()
+        with _io_lock:
+            if STORAGE_BACKEND == 'sqlite':
+                _save_sqlite(pending, stats)
+            else:
+                _save_json(pending, stats)
+        pending.written = True
+        total_save_stats.merge(stats)
+    # Also retries updates queued while offline
+    upload_to_firebase(pending)
+    last_save_stats = stats
+    return stats
+
+def compact_movements():
+    pending = collect_changes()
+    if STORAGE_BACKEND != 'sqlite':
+        pending.compact_movements = True
+        pending.snapshots['movements'] = list(movements)
+    return save_pending(pending)
+
+def save_pending(pending):
+    try:
+        return write_changes(pending)
+    except Exception:
+        # Keep the changes pending so the next save retries them
+        requeue_changes(pending)
+        raise
 
 def save_data():
-    ensure_data_dir()
-    # Save categories
-    cat_file = os.path.join(DATA_DIR, 'categories.json')
-    with open(cat_file, 'w') as f:
-        json.dump([cat.__dict__ for cat in categories], f, indent=4)
-
-    # Save suppliers
-    sup_file = os.path.join(DATA_DIR, 'suppliers.json')
-    with open(sup_file, 'w') as f:
-        json.dump([sup.__dict__ for sup in suppliers], f, indent=4)
-
-    # Save products
-    prod_file = os.path.join(DATA_DIR, 'products.json')
-    with open(prod_file, 'w') as f:
-        data = []
-        for prod in products:
-            d = prod.__dict__.copy()
-            d['created_at'] = d['created_at'].isoformat()
-            d['updated_at'] = d['updated_at'].isoformat()
-            d['variants'] = [v.__dict__ for v in d['variants']]
-            data.append(d)
-        json.dump(data, f, indent=4)
-
-    upload_to_firebase()
-
-    # Save movements
-    mov_file = os.path.join(DATA_DIR, 'movements.json')
-    with open(mov_file, 'w') as f:
-        data = []
-        for mov in movements:
-            d = mov.__dict__.copy()
-            d['date'] = d['date'].isoformat()
-            data.append(d)
-        json.dump(data, f, indent=4)
+    # Synchronous save; the UI goes through persistence.request_save() instead.
+    # Only collections modified since the last flush are written.
+    return save_pending(collect_changes())
 
 def export_csv(filename, data_type):
+    # Streamed in batches (see exporters); products give one row per variant
     ensure_data_dir()
-    if data_type == 'products':
-        df = pd.DataFrame([{
-            'id': p.id,
-            'reference': p.reference,
-            'name': p.name,
-            'category_id': p.category_id,
-            'supplier_id': p.supplier_id,
-            'price': p.price,
-            'variants': json.dumps([v.__dict__ for v in p.variants]),
-            'photos': json.dumps(p.photos),
-            'barcode': p.barcode,
-            'description': p.description
-        } for p in products])
-    elif data_type == 'categories':
-        df = pd.DataFrame([c.__dict__ for c in categories])
-    elif data_type == 'suppliers':
-        df = pd.DataFrame([s.__dict__ for s in suppliers])
-    elif data_type == 'movements':
-        df = pd.DataFrame([m.__dict__ for m in movements])
-    else:
-        return
-    df.to_csv(os.path.join(DATA_DIR, filename), index=False)
-
-def import_csv(filename, data_type):
-    file_path = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(file_path):
-        return
-    df = pd.read_csv(file_path)
-    if data_type == 'products':
-        for _, row in df.iterrows():
-            variants = json.loads(row['variants']) if pd.notna(row['variants']) else []
-            photos = json.loads(row['photos']) if pd.notna(row['photos']) else []
-            prod = Product(
-                id=int(row['id']),
-                reference=row['reference'],
-                name=row['name'],
-                category_id=int(row['category_id']),
-                supplier_id=int(row['supplier_id']),
-                price=float(row['price']),
-                variants=[Variant(**v) for v in variants],
-                photos=photos,
-                barcode=row['barcode'] if pd.notna(row['barcode']) else '',
-                description=row['description'] if pd.notna(row['description']) else ''
-            )
-            products.append(prod)
-    # Add for others if needed
\ No newline at end of file
+    return exporters.export_rows(os.path.join(DATA_DIR, filename), data_type, 'csv')
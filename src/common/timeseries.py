@@ -0,0 +1,90 @@
+import numpy as np
+from .movement_store import US_PER_DAY, as_datetime64
+
+# Running stock over time, reduced to a fixed point budget. The overview is
+# resampled to the finest of day / week / month buckets that fits; a zoomed
+# window is shown point by point, thinned with LTTB when it holds more.
+
+POINT_BUDGET = 2000
+RESOLUTIONS = ('day', 'week', 'month')
+RESOLUTION_LABELS = {
+    'raw': "par mouvement",
+    'lttb': "échantillonné",
+    'day': "par jour",
+    'week': "par semaine",
+    'month': "par mois",
+}
+
+def running_stock(dates, signed_quantities):
+    # (dates in order, stock after each movement)
+    order = np.argsort(dates, kind='stable')
+    return dates[order], np.cumsum(signed_quantities[order])
+
+def bucket_starts(dates, resolution):
+    # Start of the day / week (Monday) / month of each date, in epoch microseconds
+    if resolution == 'day':
+        return dates // US_PER_DAY * US_PER_DAY
+    if resolution == 'week':
+        # 1970-01-01 was a Thursday
+        days = dates // US_PER_DAY
+        return (days - (days + 3) % 7) * US_PER_DAY
+    if resolution == 'month':
+        return as_datetime64(dates).astype('datetime64[M]').astype('datetime64[us]').astype(np.int64)
+    raise ValueError(f"Résolution inconnue: {resolution}")
+
+def resample(dates, totals, resolution):
+    # Stock at the end of each bucket, for sorted dates and running totals:
+    # the last running total of every run of equal bucket starts
+    starts = bucket_starts(dates, resolution)
+    if not len(starts):
+        return starts, totals
+    last = np.flatnonzero(np.diff(starts))
+    last = np.append(last, len(starts) - 1)
+    return starts[last], totals[last]
+
+def lttb(x, y, budget):
+    # Largest-Triangle-Three-Buckets: indices of budget points keeping the
+    # visual shape of the series (first and last points always kept)
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    selected = np.empty(budget, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(budget - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        # Twice the area of the triangle (point a, candidate, next bucket average)
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def stock_series(dates, totals, window=None, budget=POINT_BUDGET):
+    # (dates, stock, resolution) for the evolution chart, from the output of
+    # running_stock(). window: (start, end) in epoch microseconds for a
+    # zoomed view, None for the overview.
+    if window is not None:
+        start, end = window
+        # One point on each side, so lines run to the window edges
+        lo = max(np.searchsorted(dates, start, 'left') - 1, 0)
+        hi = min(np.searchsorted(dates, end, 'right') + 1, len(dates))
+        dates, totals = dates[lo:hi], totals[lo:hi]
+    if len(dates) <= budget:
+        return dates, totals, 'raw'
+    if window is None:
+        for resolution in RESOLUTIONS:
+            bucket_dates, bucket_totals = resample(dates, totals, resolution)
+            if len(bucket_dates) <= budget:
+                return bucket_dates, bucket_totals, resolution
+        dates, totals = bucket_dates, bucket_totals
+    kept = lttb(dates, totals, budget)
+    return dates[kept], totals[kept], 'lttb'
@@ -1,8 +1,8 @@
 import sys
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox
 from PySide6.QtCore import Qt, QTimer
 from .modules.stock.stock_widget import StockWidget
-from .common.storage import save_data
+from .common.persistence import get_persistence
 
 class Sidebar(QWidget):
     def __init__(self, main_window, parent=None):
@@ -49,11 +49,29 @@ class MainWindow(QMainWindow):
         self.content_layout.addWidget(QLabel("Sélectionnez un module dans la sidebar"))
         main_layout.addWidget(self.content_area)
 
+        # Saves run on a background thread and report back here
+        self.persistence = get_persistence()
+        self.persistence.save_finished.connect(self.on_save_finished)
+        self.persistence.save_failed.connect(self.on_save_failed)
+
         # Automatic backup timer (every 5 minutes)
         self.backup_timer = QTimer(self)
-        self.backup_timer.timeout.connect(save_data)
+        self.backup_timer.timeout.connect(self.persistence.flush)
         self.backup_timer.start(5 * 60 * 1000)  # 5 minutes in milliseconds
 
+    def on_save_finished(self, stats):
+        self.statusBar().showMessage(f"Sauvegardé: {stats.total_records} enregistrement(s)", 3000)
+
+    def on_save_failed(self, message):
+        self.statusBar().showMessage(f"Échec de la sauvegarde: {message}")
+
+    def closeEvent(self, event):
+        try:
+            self.persistence.shutdown()
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Erreur lors de la sauvegarde: {str(e)}")
+        super().closeEvent(event)
+
     def switch_module(self, module):
         # Clear current content
         for i in reversed(range(self.content_layout.count())):
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import plotly
+from PySide6.QtCore import QObject, QUrl, Signal, Slot
+from PySide6.QtWebChannel import QWebChannel
+from PySide6.QtWebEngineWidgets import QWebEngineView
+from ...common import fastjson
+
+# plotly.js as shipped with the plotly package: charts work offline and the
+# library is parsed once per page
+PLOTLY_DIR = os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+PLOTLY_JS = 'plotly.min.js'
+CHART_HEIGHT = 450
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<script src="%(script)s"></script>
+<script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+<style>
+body { margin: 0; background: #F8F9FA; }
+#charts { display: grid; grid-template-columns: 1fr 1fr; gap: 30px; }
+.chart { height: %(height)dpx; }
+.wide { grid-column: span 2; }
+</style></head>
+<body><div id="charts">%(divs)s</div>
+<script>
+var bridge = null;
+new QWebChannel(qt.webChannelTransport, function (channel) { bridge = channel.objects.bridge; });
+var watched = {};
+function onRelayout(id, event) {
+    if (!bridge) return;
+    var range = event['xaxis.range'] || [event['xaxis.range[0]'], event['xaxis.range[1]']];
+    if (event['xaxis.autorange']) bridge.relayout(id, '', '');
+    else if (range[0] !== undefined) bridge.relayout(id, String(range[0]), String(range[1]));
+}
+function showChart(id, figure) {
+    Plotly.react(id, figure.data, figure.layout, {responsive: true, displaylogo: false});
+    if (!watched[id]) {
+        watched[id] = true;
+        document.getElementById(id).on('plotly_relayout', function (event) { onRelayout(id, event); });
+    }
+}
+</script></body></html>"""
+
+def epoch_us(text):
+    # plotly date axis value ("2024-03-01 12:30:00.5") -> epoch microseconds
+    return int(np.datetime64(text.replace(' ', 'T'), 'us').astype(np.int64))
+
+class ChartBridge(QObject):
+    # Exposed to the page as "bridge": x-axis zooms come back through it
+    def __init__(self, view):
+        super().__init__(view)
+        self._view = view
+
+    @Slot(str, str, str)
+    def relayout(self, chart, start, end):
+        if not start:
+            self._view.zoomed.emit(chart, None)
+            return
+        try:
+            window = (epoch_us(start), epoch_us(end))
+        except ValueError:
+            print(f"Plage de zoom illisible: {start} - {end}")
+            return
+        self._view.zoomed.emit(chart, window)
+
+class ChartView(QWebEngineView):
+    # One page holding every chart. Figures are plain dicts pushed with
+    # Plotly.react, which updates a chart in place instead of reloading it.
+    # (chart id, (start, end) in epoch microseconds or None when reset)
+    zoomed = Signal(str, object)
+
+    def __init__(self, charts, wide=(), parent=None):
+        super().__init__(parent)
+        self._ready = False
+        self._channel = QWebChannel(self)
+        self._channel.registerObject('bridge', ChartBridge(self))
+        self.page().setWebChannel(self._channel)
+        self._queued = {}  # chart id -> figure JSON, until the page is loaded
+        self.loadFinished.connect(self._on_load_finished)
+        if not os.path.exists(os.path.join(PLOTLY_DIR, PLOTLY_JS)):
+            print(f"plotly.js introuvable dans {PLOTLY_DIR}")
+        divs = ''.join(f'<div id="{chart}" class="chart{" wide" if chart in wide else ""}"></div>'
+                       for chart in charts)
+        self.setMinimumHeight(CHART_HEIGHT)
+        self.setHtml(PAGE % {'script': PLOTLY_JS, 'height': CHART_HEIGHT, 'divs': divs},
+                     QUrl.fromLocalFile(PLOTLY_DIR + os.sep))
+
+    def set_figure(self, chart, data, layout):
+        # data / layout must hold JSON types only (lists, not NumPy arrays)
+        self.set_figure_json(chart, fastjson.dumps({'data': data, 'layout': layout}).decode())
+
+    def set_figure_json(self, chart, figure):
+        # figure: {"data": [...], "layout": {...}} already serialized
+        if self._ready:
+            self.page().runJavaScript(f"showChart('{chart}', {figure});")
+        else:
+            self._queued[chart] = figure
+
+    def _on_load_finished(self, ok):
+        if not ok:
+            print("Chargement de la page des graphiques impossible")
+            return
+        self._ready = True
+        queued, self._queued = self._queued, {}
+        for chart, figure in queued.items():
+            self.page().runJavaScript(f"showChart('{chart}', {figure});")
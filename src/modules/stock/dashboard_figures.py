@@ -0,0 +1,164 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from plotly.colors import diverging, make_colorscale
+from ...common.movement_store import as_datetime64
+from ...common.timeseries import running_stock, stock_series, RESOLUTION_LABELS
+from ...common import fastjson
+
+# Dashboard figures as plain plotly.js dicts, built from a DashboardInputs
+# snapshot. Nothing here reads the stores, so figures can be built on a
+# worker thread.
+
+PIE_COLORS = ['#007BFF', '#6C757D', '#28A745', '#FFC107', '#DC3545']
+BAR_MARKER = {'color': '#007BFF', 'line': {'color': '#FFFFFF', 'width': 1}}
+LINE_MARKER = {'size': 8, 'color': '#007BFF', 'line': {'width': 2, 'color': '#FFFFFF'}}
+LINE_STYLE = {'width': 3, 'color': '#007BFF'}
+# plotly.js does not know this scale by name
+HEATMAP_COLORSCALE = make_colorscale(diverging.RdYlGn_r)
+TIMELINE_MOVEMENTS = 20
+
+NO_DATA_LAYOUT = {
+    'paper_bgcolor': '#F8F9FA',
+    'xaxis': {'visible': False},
+    'yaxis': {'visible': False},
+    'annotations': [{'text': 'No data', 'showarrow': False, 'font': {'size': 14}}],
+}
+
+@dataclass
+class DashboardInputs:
+    # Taken on the GUI thread; names are already resolved
+    category_stock: Dict[str, int] = field(default_factory=dict)
+    supplier_stock: Dict[str, int] = field(default_factory=dict)
+    color_stock: Dict[str, int] = field(default_factory=dict)
+    sizes: List[str] = field(default_factory=list)
+    colors: List[str] = field(default_factory=list)
+    size_color: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=np.int64))
+    top_products: List[Tuple[str, int]] = field(default_factory=list)
+    # Copies of the movement columns: dates (epoch microseconds), signed
+    # quantities, and the movements store revision they were taken at
+    movement_dates: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    movement_quantities: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    movement_revision: int = -1
+    # Zoomed range of the evolution chart (epoch microseconds), None for all
+    evolution_window: Optional[Tuple[int, int]] = None
+
+# (movements revision, sorted dates, running stock) of the last evolution
+# chart: zooming in again does not sort the movements again
+_running = (None, None, None)
+
+def chart_layout(title, xaxis_title=None, yaxis_title=None):
+    layout = {
+        'title': {'text': title, 'font': {'size': 16, 'family': 'Inter', 'color': '#212529'}},
+        'paper_bgcolor': '#F8F9FA',
+        'plot_bgcolor': '#FFFFFF',
+        'showlegend': True,
+    }
+    if xaxis_title:
+        layout['xaxis'] = {'title': {'text': xaxis_title}}
+    if yaxis_title:
+        layout['yaxis'] = {'title': {'text': yaxis_title}}
+    return layout
+
+def iso_dates(epoch_us):
+    return np.datetime_as_string(as_datetime64(epoch_us), unit='s').tolist()
+
+def category_figure(inputs):
+    # Pie chart: stock by category
+    cat_stock = inputs.category_stock
+    if not cat_stock:
+        return [], NO_DATA_LAYOUT
+    colors = PIE_COLORS[:len(cat_stock)]
+    data = [{'type': 'pie', 'labels': list(cat_stock.keys()), 'values': list(cat_stock.values()), 'marker': {'colors': colors}, 'textinfo': 'label+percent', 'insidetextorientation': 'radial'}]
+    return data, chart_layout("Stock par catégorie")
+
+def color_figure(inputs):
+    # Bar chart: stock by color (top 10)
+    top_colors = sorted(inputs.color_stock.items(), key=lambda x: x[1], reverse=True)[:10]
+    if not top_colors:
+        return [], NO_DATA_LAYOUT
+    colors, qtys = zip(*top_colors)
+    data = [{'type': 'bar', 'x': list(colors), 'y': list(qtys), 'marker': BAR_MARKER, 'name': 'Quantité par couleur', 'text': list(qtys), 'textposition': 'outside'}]
+    return data, chart_layout("Stock par couleur (top 10)", "Couleur", "Quantité")
+
+def _running_stock(inputs):
+    global _running
+    revision, dates, totals = _running
+    if revision != inputs.movement_revision:
+        dates, totals = running_stock(inputs.movement_dates, inputs.movement_quantities)
+        _running = (inputs.movement_revision, dates, totals)
+    return dates, totals
+
+def evolution_figure(inputs):
+    # Line chart: stock evolution, cumulative over all movements, resampled
+    # or thinned to a fixed number of points
+    if not len(inputs.movement_dates):
+        return [], NO_DATA_LAYOUT
+    window = inputs.evolution_window
+    dates, totals, resolution = stock_series(*_running_stock(inputs), window)
+    markers = LINE_MARKER if resolution == 'raw' else dict(LINE_MARKER, size=4)
+    data = [{'type': 'scatter', 'x': iso_dates(dates), 'y': totals.tolist(), 'mode': 'lines+markers', 'marker': markers, 'line': LINE_STYLE, 'name': 'Stock total'}]
+    layout = chart_layout(f"Évolution stock ({RESOLUTION_LABELS[resolution]})", "Date", "Quantité totale")
+    layout['xaxis']['type'] = 'date'
+    if window is not None:
+        layout['xaxis']['range'] = iso_dates(np.array(window, dtype=np.int64))
+    return data, layout
+
+def heatmap_figure(inputs):
+    # Heatmap: size vs color
+    if not inputs.sizes:
+        return [], NO_DATA_LAYOUT
+    data = [{'type': 'heatmap', 'z': inputs.size_color.tolist(), 'x': inputs.colors, 'y': inputs.sizes, 'colorscale': HEATMAP_COLORSCALE, 'name': 'Quantité'}]
+    return data, chart_layout("Heatmap taille/couleur", "Couleur", "Taille")
+
+def supplier_figure(inputs):
+    # Doughnut chart: stock by supplier
+    sup_stock = inputs.supplier_stock
+    if not sup_stock:
+        return [], NO_DATA_LAYOUT
+    colors = PIE_COLORS[:len(sup_stock)]
+    data = [{'type': 'pie', 'labels': list(sup_stock.keys()), 'values': list(sup_stock.values()), 'marker': {'colors': colors}, 'textinfo': 'label+percent', 'hole': 0.7}]
+    layout = chart_layout("Stock par fournisseur (doughnut)")
+    layout['annotations'] = [{'text': 'Fournisseurs', 'x': 0.5, 'y': 0.5, 'font': {'size': 12}, 'showarrow': False}]
+    return data, layout
+
+def top_products_figure(inputs):
+    # Horizontal bar chart: top stocked products
+    if not inputs.top_products:
+        return [], NO_DATA_LAYOUT
+    names, qtys = zip(*inputs.top_products)
+    data = [{'type': 'bar', 'y': list(names), 'x': list(qtys), 'orientation': 'h', 'marker': BAR_MARKER, 'name': 'Quantité par produit', 'text': list(qtys), 'textposition': 'outside'}]
+    return data, chart_layout("Top produits stockés", "Quantité", "Produit")
+
+def timeline_figure(inputs):
+    # Timeline: most recent movements, oldest first
+    if not len(inputs.movement_dates):
+        return [], NO_DATA_LAYOUT
+    dates = inputs.movement_dates
+    recent = np.arange(len(dates))
+    if len(dates) > TIMELINE_MOVEMENTS:
+        # Only the latest movements are sorted
+        recent = np.argpartition(dates, len(dates) - TIMELINE_MOVEMENTS)[-TIMELINE_MOVEMENTS:]
+    recent = recent[np.argsort(dates[recent], kind='stable')]
+    data = [{'type': 'scatter', 'x': iso_dates(inputs.movement_dates[recent]), 'y': inputs.movement_quantities[recent].tolist(), 'mode': 'lines+markers', 'marker': LINE_MARKER, 'line': LINE_STYLE, 'name': 'Mouvements'}]
+    return data, chart_layout("Timeline mouvements récents", "Date", "Quantité")
+
+FIGURES = {
+    'category': category_figure,
+    'color': color_figure,
+    'evolution': evolution_figure,
+    'heatmap': heatmap_figure,
+    'supplier': supplier_figure,
+    'top_products': top_products_figure,
+    'timeline': timeline_figure,
+}
+
+def build_figures(inputs, charts, cancelled=None):
+    # {chart: figure JSON}; None when cancelled() turned true in between
+    figures = {}
+    for chart in charts:
+        if cancelled is not None and cancelled():
+            return None
+        data, layout = FIGURES[chart](inputs)
+        figures[chart] = fastjson.dumps({'data': data, 'layout': layout}).decode()
+    return figures
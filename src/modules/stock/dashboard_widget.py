@@ -1,12 +1,87 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QGridLayout, QVBoxLayout as QVLayout
-from PySide6.QtWebEngineWidgets import QWebEngineView
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import pandas as pd
+import threading
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel
+from PySide6.QtCore import QTimer, QObject, QRunnable, QThreadPool, Signal, Slot
 from collections import defaultdict
-from ...common.models import products, categories, suppliers, movements
-
+from ...common.aggregation import stock_aggregates, compute_aggregates
+from ...common.models import categories, suppliers, movements
+from ...common.movement_store import movement_columns
+from ...common.events import change_bus, ADDED
+from .chart_view import ChartView
+from .dashboard_figures import DashboardInputs, build_figures
+
+PRODUCT_CHARTS = {'cards', 'category', 'color', 'heatmap', 'supplier', 'top_products'}
+# stock_aggregates metric -> chart showing it
+METRIC_CHARTS = {
+    'value': 'cards',
+    'low_stock': 'cards',
+    'category': 'category',
+    'supplier': 'supplier',
+    'color': 'color',
+    'size_color': 'heatmap',
+    'top_products': 'top_products',
+}
+CONSISTENCY_CHECK_MS = 5 * 60 * 1000
+# A failed refresh is retried after RETRY_MS, doubled on each new failure,
+# at most MAX_RETRIES times in a row
+RETRY_MS = 2000
+MAX_RETRIES = 3
+MOVEMENT_CHARTS = {'evolution', 'timeline'}
+# Page order: two columns, the timeline spans both
+CHARTS = ['category', 'color', 'evolution', 'heatmap', 'supplier', 'top_products', 'timeline']
+
+def product_inputs(inputs, charts, result, category_names, supplier_names):
+    # Product fields of inputs from an AggregatesResult; the names by id
+    # are copies taken on the GUI thread
+    summary = result.summary
+    if 'category' in charts:
+        inputs.category_stock = defaultdict(int)
+        for category_id, quantity in summary.by_category.items():
+            inputs.category_stock[category_names.get(category_id, "Autre")] += quantity
+    if 'supplier' in charts:
+        inputs.supplier_stock = defaultdict(int)
+        for supplier_id, quantity in summary.by_supplier.items():
+            inputs.supplier_stock[supplier_names.get(supplier_id, "Autre")] += quantity
+    if 'color' in charts:
+        inputs.color_stock = summary.by_color
+    if 'heatmap' in charts:
+        inputs.sizes, inputs.colors, inputs.size_color = summary.sizes, summary.colors, summary.size_color
+    if 'top_products' in charts:
+        inputs.top_products = [(result.product_names[product_id], quantity)
+                               for product_id, quantity in summary.top_products]
+
+class DashboardJobSignals(QObject):
+    finished = Signal(int, object, object)  # generation, AggregatesResult, {chart: figure JSON}
+    failed = Signal(int, object, str)  # generation, AggregatesSnapshot, error
+
+class DashboardJob(QRunnable):
+    # Computes the aggregates of a snapshot (building or checking them when
+    # it holds the products) and the figures of a DashboardInputs on the
+    # thread pool. A cancelled job still hands its aggregates back.
+    def __init__(self, generation, inputs, charts, aggregates=None, names=None):
+        super().__init__()
+        self.generation = generation
+        self.inputs = inputs
+        self.charts = charts
+        self.aggregates = aggregates
+        self.names = names  # (category names, supplier names) by id
+        self.signals = DashboardJobSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = None
+            if self.aggregates is not None:
+                result = compute_aggregates(self.aggregates)
+                product_inputs(self.inputs, self.charts, result, *self.names)
+            figures = build_figures(self.inputs, self.charts - {'cards'}, self.cancel_event.is_set)
+        except Exception as e:
+            print(f"Erreur de calcul du dashboard: {e}")
+            self.signals.failed.emit(self.generation, self.aggregates, str(e))
+            return
+        self.signals.finished.emit(self.generation, result, figures)
 
 class DashboardWidget(QWidget):
     def __init__(self):
@@ -56,159 +131,169 @@ class DashboardWidget(QWidget):
         """)
         cards_layout.addWidget(self.low_stock_label)
 
-        # Charts
-        charts_layout = QGridLayout()
-        charts_layout.setSpacing(30)  # Add space between charts
-        layout.addLayout(charts_layout)
-
-        self.pie_view = QWebEngineView()
-        charts_layout.addWidget(self.pie_view, 0, 0)
-
-        self.bar_view = QWebEngineView()
-        charts_layout.addWidget(self.bar_view, 0, 1)
-
-        self.line_view = QWebEngineView()
-        charts_layout.addWidget(self.line_view, 1, 0)
-
-        self.heatmap_view = QWebEngineView()
-        charts_layout.addWidget(self.heatmap_view, 1, 1)
-
-        self.doughnut_view = QWebEngineView()
-        charts_layout.addWidget(self.doughnut_view, 2, 0)
-
-        self.hbar_view = QWebEngineView()
-        charts_layout.addWidget(self.hbar_view, 2, 1)
-
-        self.timeline_view = QWebEngineView()
-        charts_layout.addWidget(self.timeline_view, 3, 0, 1, 2)
+        self.error_label = QLabel()
+        self.error_label.setStyleSheet("color: #DC3545; font-weight: 600;")
+        self.error_label.hide()
+        layout.addWidget(self.error_label)
+
+        # Charts, all on one page: plotly.js is loaded once and charts are
+        # updated in place
+        self.charts = ChartView(CHARTS, wide=('timeline',))
+        self.charts.zoomed.connect(self._on_zoom)
+        layout.addWidget(self.charts)
+        # Zoomed range of the evolution chart, redrawn at a finer resolution
+        self._evolution_window = None
+
+        # Charts to redraw. Refreshes are coalesced until the event loop is
+        # idle and wait while the dashboard is hidden (another tab shown).
+        self._pending = set()
+        self._pending_timer = QTimer(self)
+        self._pending_timer.setSingleShot(True)
+        self._pending_timer.timeout.connect(self._apply_pending)
+        # Figures are built on the thread pool; a newer refresh cancels the
+        # running one and takes over its charts
+        self._generation = 0
+        self._job = None
+        # The next job checks the aggregates against a full recompute
+        self._check_due = False
+        # Failed refreshes in a row, see _on_failed()
+        self._failures = 0
+        self._retry_timer = QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self.update_dashboard)
+        change_bus.subscribe(self._on_change, 'products', 'categories', 'suppliers', 'movements')
+        # Catches records edited without a change event
+        self._check_timer = QTimer(self)
+        self._check_timer.setInterval(CONSISTENCY_CHECK_MS)
+        self._check_timer.timeout.connect(self.check_aggregates)
+        self._check_timer.start()
 
         self.update_dashboard()
 
-    def update_dashboard(self):
-        # Calculate summaries
-        total_value = sum(p.price * sum(v.quantity for v in p.variants) for p in products)
-        self.total_value_label.setText(f"Valeur totale: {total_value:.2f} €")
-
-        self.product_count_label.setText(f"Nombre produits: {len(products)}")
-
-        low_stock = sum(1 for p in products if sum(v.quantity for v in p.variants) < 10)  # Assume threshold 10
-        self.low_stock_label.setText(f"Stock faible: {low_stock}")
-
-        # Pie chart: stock by category
-        cat_stock = defaultdict(int)
-        for p in products:
-            cat_name = next((c.name for c in categories if c.id == p.category_id), "Autre")
-            qty = sum(v.quantity for v in p.variants)
-            cat_stock[cat_name] += qty
-
-        if cat_stock:
-            colors = ['#007BFF', '#6C757D', '#28A745', '#FFC107', '#DC3545'][:len(cat_stock)]
-            fig = go.Figure(data=[go.Pie(labels=list(cat_stock.keys()), values=list(cat_stock.values()), marker_colors=colors, textinfo='label+percent', insidetextorientation='radial')])
-            fig.update_layout(title="Stock par catégorie", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', showlegend=True)
-            self.pie_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
-        else:
-            self.pie_view.setHtml("<p>No data</p>")
-
-        # Bar chart: stock by color (top 10)
-        color_stock = defaultdict(int)
-        for p in products:
-            for v in p.variants:
-                color_stock[v.color] += v.quantity
-
-        top_colors = sorted(color_stock.items(), key=lambda x: x[1], reverse=True)[:10]
-        colors, qtys = zip(*top_colors) if top_colors else ([], [])
-
-        if colors:
-            fig = go.Figure(data=[go.Bar(x=list(colors), y=list(qtys), marker_color='#007BFF', marker_line_color='#FFFFFF', marker_line_width=1, name='Quantité par couleur')])
-            fig.update_layout(title="Stock par couleur (top 10)", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', xaxis_title="Couleur", yaxis_title="Quantité", showlegend=True)
-            fig.update_traces(text=list(qtys), textposition='outside')
-            self.bar_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
-        else:
-            self.bar_view.setHtml("<p>No data</p>")
-
-        # Line chart: stock evolution (simplified, assume daily totals from movements)
-        # For simplicity, plot cumulative
-        dates = []
-        totals = []
-        current_total = 0
-        for m in sorted(movements, key=lambda x: x.date):
-            if m.type == 'in':
-                current_total += m.quantity
-            elif m.type == 'out':
-                current_total -= m.quantity
-            dates.append(str(m.date))
-            totals.append(current_total)
-
-        if dates:
-            fig = go.Figure(data=[go.Scatter(x=dates, y=totals, mode='lines+markers', marker=dict(size=8, color='#007BFF', line=dict(width=2, color='#FFFFFF')), line=dict(width=3, color='#007BFF'), name='Stock total')])
-            fig.update_layout(title="Évolution stock", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', xaxis_title="Date", yaxis_title="Quantité totale", showlegend=True)
-            self.line_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
-        else:
-            self.line_view.setHtml("<p>No data</p>")
-
-        # Heatmap: size vs color
-        sizes = set()
-        colors_set = set()
-        for p in products:
-            for v in p.variants:
-                sizes.add(v.size)
-                colors_set.add(v.color)
-
-        sizes = sorted(list(sizes))
-        colors_list = sorted(list(colors_set))
-        heatmap_data = [[0 for _ in colors_list] for _ in sizes]
-
-        for p in products:
-            for v in p.variants:
-                if v.size in sizes and v.color in colors_list:
-                    i = sizes.index(v.size)
-                    j = colors_list.index(v.color)
-                    heatmap_data[i][j] += v.quantity
-
-        if heatmap_data:
-            fig = go.Figure(data=go.Heatmap(z=heatmap_data, x=colors_list, y=sizes, colorscale='RdYlGn_r', name='Quantité'))
-            fig.update_layout(title="Heatmap taille/couleur", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', xaxis_title="Couleur", yaxis_title="Taille", showlegend=True)
-            self.heatmap_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
-        else:
-            self.heatmap_view.setHtml("<p>No data</p>")
-
-        # Doughnut chart: stock by supplier
-        sup_stock = defaultdict(int)
-        for p in products:
-            sup_name = next((s.name for s in suppliers if s.id == p.supplier_id), "Autre")
-            qty = sum(v.quantity for v in p.variants)
-            sup_stock[sup_name] += qty
-
-        if sup_stock:
-            colors = ['#007BFF', '#6C757D', '#28A745', '#FFC107', '#DC3545'][:len(sup_stock)]
-            fig = go.Figure(data=[go.Pie(labels=list(sup_stock.keys()), values=list(sup_stock.values()), marker_colors=colors, textinfo='label+percent', hole=0.7)])
-            fig.update_layout(title="Stock par fournisseur (doughnut)", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', annotations=[dict(text='Fournisseurs', x=0.5, y=0.5, font_size=12, showarrow=False)], showlegend=True)
-            self.doughnut_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
+    def _queue(self, charts):
+        if charts:
+            self._pending.update(charts)
+            if self.isVisible():
+                self._pending_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # One refresh for everything changed while hidden
+        if self._pending:
+            self._pending_timer.start()
+
+    def _on_change(self, event):
+        if event.entity == 'movements':
+            self._queue(MOVEMENT_CHARTS)
+        elif event.entity in ('categories', 'suppliers'):
+            # Names shown in the pie charts; new ones have no stock yet
+            if event.kind != ADDED:
+                self._queue({'category' if event.entity == 'categories' else 'supplier'})
         else:
-            self.doughnut_view.setHtml("<p>No data</p>")
-
-        # Horizontal bar chart: top stocked products
-        prod_stock = [(p.name, sum(v.quantity for v in p.variants)) for p in products]
-        prod_stock.sort(key=lambda x: x[1], reverse=True)
-        top_prods = prod_stock[:10]
-        names, qtys = zip(*top_prods) if top_prods else ([], [])
-
-        if names:
-            fig = go.Figure(data=[go.Bar(y=list(names), x=list(qtys), orientation='h', marker_color='#007BFF', marker_line_color='#FFFFFF', marker_line_width=1, name='Quantité par produit')])
-            fig.update_layout(title="Top produits stockés", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', xaxis_title="Quantité", yaxis_title="Produit", showlegend=True)
-            fig.update_traces(text=list(qtys), textposition='outside')
-            self.hbar_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
-        else:
-            self.hbar_view.setHtml("<p>No data</p>")
-
-        # Timeline: recent movements
-        recent_movements = sorted(movements, key=lambda x: x.date, reverse=True)[:20]
-        dates = [str(m.date) for m in reversed(recent_movements)]
-        qtys = [m.quantity if m.type == 'in' else -m.quantity for m in reversed(recent_movements)]
+            # stock_aggregates has already applied the event: only the
+            # charts of the metrics it changed are redrawn, e.g. a price
+            # change only updates the cards
+            self._queue({METRIC_CHARTS[m] for m in stock_aggregates.take_changes()})
+
+    def _on_zoom(self, chart, window):
+        if chart == 'evolution' and window != self._evolution_window:
+            self._evolution_window = window
+            self._queue({'evolution'})
+
+    def check_aggregates(self):
+        # Done by the next job, against a copy of the product list
+        if self.isVisible():
+            self._check_due = True
+            self._queue({'cards'})
+
+    def _inputs(self, charts):
+        # Snapshot of what the charts need, taken on the GUI thread: the
+        # job never reads the stores. Returns the charts it covers.
+        inputs = DashboardInputs()
+        aggregates = names = None
+        if charts & PRODUCT_CHARTS:
+            aggregates = stock_aggregates.snapshot(check=self._check_due)
+            if aggregates is None:
+                # Drawn when the build in flight is adopted
+                charts = charts - PRODUCT_CHARTS
+            else:
+                if aggregates.records is not None:
+                    self._check_due = False
+                names = ({c.id: c.name for c in categories}, {s.id: s.name for s in suppliers})
+        if charts & MOVEMENT_CHARTS:
+            columns = movement_columns()
+            inputs.movement_dates = columns.dates.copy()
+            inputs.movement_quantities = columns.signed_quantities()
+            inputs.movement_revision = movements.revision
+            inputs.evolution_window = self._evolution_window
+        return charts, inputs, aggregates, names
+
+    def _apply_pending(self):
+        if not self.isVisible():
+            return
+        charts, self._pending = self._pending, set()
+        if self._job is not None:
+            self._job.cancel()
+            charts |= self._job.charts
+            self._job = None
+        charts, inputs, aggregates, names = self._inputs(charts)
+        if not charts:
+            return
+        self._generation += 1
+        job = DashboardJob(self._generation, inputs, charts, aggregates, names)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.failed.connect(self._on_failed)
+        self._job = job
+        QThreadPool.globalInstance().start(job)
+
+    @Slot(int, object, object)
+    def _on_finished(self, generation, result, figures):
+        # figures is None when the job was cancelled
+        shown = generation == self._generation and figures is not None
+        charts = set()
+        if shown:
+            charts = self._job.charts
+            self._job = None
+        if result is not None:
+            if stock_aggregates.adopt(result):
+                # New totals: redraw what this job did not draw from them
+                self._queue(PRODUCT_CHARTS - charts)
+            self._queue({METRIC_CHARTS[m] for m in stock_aggregates.take_changes()})
+        if not shown:
+            return  # superseded while running
+        self._failures = 0
+        self._retry_timer.stop()
+        self.error_label.hide()
+        if 'cards' in charts:
+            self.update_cards(result.summary)
+        for chart in CHARTS:
+            if chart in figures:
+                self.charts.set_figure_json(chart, figures[chart])
+
+    @Slot(int, object, str)
+    def _on_failed(self, generation, aggregates, error):
+        if aggregates is not None and aggregates.records is not None:
+            # Drop the build / check that will never be adopted
+            stock_aggregates.invalidate()
+        if generation != self._generation:
+            return  # its charts were taken over by the newer job
+        self._job = None
+        self._failures += 1
+        message = f"Erreur de calcul du dashboard: {error}"
+        if self._failures <= MAX_RETRIES:
+            delay = RETRY_MS * 2 ** (self._failures - 1)
+            self._retry_timer.start(delay)
+            message += f" (nouvel essai dans {delay // 1000} s)"
+        self.error_label.setText(message)
+        self.error_label.show()
 
-        if dates:
-            fig = go.Figure(data=[go.Scatter(x=dates, y=qtys, mode='lines+markers', marker=dict(size=8, color='#007BFF', line=dict(width=2, color='#FFFFFF')), line=dict(width=3, color='#007BFF'), name='Mouvements')])
-            fig.update_layout(title="Timeline mouvements récents", title_font=dict(size=16, family='Inter', color='#212529'), paper_bgcolor='#F8F9FA', plot_bgcolor='#FFFFFF', xaxis_title="Date", yaxis_title="Quantité", showlegend=True)
-            self.timeline_view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False))
-        else:
-            self.timeline_view.setHtml("<p>No data</p>")
\ No newline at end of file
+    def update_dashboard(self):
+        # Full recompute of the aggregates and of every chart, on the next
+        # refresh while visible
+        stock_aggregates.invalidate()
+        self._queue(PRODUCT_CHARTS | MOVEMENT_CHARTS)
+
+    def update_cards(self, summary):
+        self.total_value_label.setText(f"Valeur totale: {summary.total_value:.2f} €")
+        self.product_count_label.setText(f"Nombre produits: {summary.product_count}")
+        self.low_stock_label.setText(f"Stock faible: {summary.low_stock_count}")
@@ -1,7 +1,8 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton, QFileDialog, QMessageBox
 from PySide6.QtCore import Qt
 from ....common.models import products, categories, suppliers, Product, Variant
-from ....common.storage import save_data
+from ....common.persistence import request_save
+from ....common.storage import next_id
 from datetime import datetime
 import uuid
 
@@ -148,9 +149,10 @@ class AddProductDialog(QDialog):
                 self.product.photos = [self.photo_path] if self.photo_path else []
                 self.product.description = desc
                 self.product.updated_at = datetime.now()
+                products.touch(self.product)
             else:
                 # Add new
-                prod_id = max((p.id for p in products), default=0) + 1
+                prod_id = next_id('products')
                 variant = Variant(size=size, color=color, quantity=qty, sku=f"{ref}-{size}-{color}")
                 prod = Product(
                     id=prod_id,
@@ -164,7 +166,7 @@ class AddProductDialog(QDialog):
                     description=desc
                 )
                 products.append(prod)
-            save_data()
+            request_save()
             self.accept()
         except ValueError:
             QMessageBox.warning(self, "Erreur", "Prix et quantité doivent être numériques")
\ No newline at end of file
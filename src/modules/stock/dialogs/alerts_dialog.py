@@ -1,5 +1,6 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QPushButton
-from ....common.models import products, categories, suppliers
+from ....common.models import products
+from ....common.indexes import category_name
 from .settings_dialog import SETTINGS_FILE
 import json
 import os
@@ -39,7 +40,7 @@ class AlertsDialog(QDialog):
                 self.table.setItem(i, 0, QTableWidgetItem(p.reference))
                 self.table.setItem(i, 1, QTableWidgetItem(p.name))
                 self.table.setItem(i, 2, QTableWidgetItem(str(qty)))
-                cat_name = next((c.name for c in categories if c.id == p.category_id), "")
+                cat_name = category_name(p.category_id)
                 self.table.setItem(i, 3, QTableWidgetItem(cat_name))
             layout.addWidget(self.table)
 
@@ -1,6 +1,9 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QPushButton, QLineEdit, QMessageBox
 from ....common.models import categories, Category
-from ....common.storage import save_data
+from ....common.indexes import category_by_id
+from ....common.persistence import request_save
+from ....common.storage import next_id
+from ....common.events import change_bus, ADDED, UPDATED, REMOVED
 
 class CategoriesDialog(QDialog):
     def __init__(self, parent=None):
@@ -36,22 +39,50 @@ class CategoriesDialog(QDialog):
         layout.addLayout(btn_layout)
 
         self.refresh_table()
+        # Edits made here and elsewhere are applied row by row
+        change_bus.subscribe(self._on_change, 'categories')
+        self.finished.connect(lambda: change_bus.unsubscribe(self._on_change))
 
     def refresh_table(self):
         self.table.setRowCount(0)
         for cat in categories:
-            row = self.table.rowCount()
+            self._set_row(self.table.rowCount(), cat)
+
+    def _set_row(self, row, cat):
+        if row == self.table.rowCount():
             self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(cat.id)))
-            self.table.setItem(row, 1, QTableWidgetItem(cat.name))
+        self.table.setItem(row, 0, QTableWidgetItem(str(cat.id)))
+        self.table.setItem(row, 1, QTableWidgetItem(cat.name))
+
+    def _row_of(self, cat_id):
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, 0).text() == str(cat_id):
+                return row
+        return -1
+
+    def _on_change(self, event):
+        if event.kind == ADDED:
+            for cat in event.records:
+                self._set_row(self.table.rowCount(), cat)
+        elif event.kind == UPDATED:
+            for cat in event.records:
+                row = self._row_of(cat.id)
+                if row >= 0:
+                    self._set_row(row, cat)
+        elif event.kind == REMOVED:
+            for cat in event.records:
+                row = self._row_of(cat.id)
+                if row >= 0:
+                    self.table.removeRow(row)
+        else:
+            self.refresh_table()
 
     def add_category(self):
         name, ok = QInputDialog.getText(self, "Ajouter Catégorie", "Nom:")
         if ok and name.strip():
-            cat_id = max((c.id for c in categories), default=0) + 1
+            cat_id = next_id('categories')
             categories.append(Category(id=cat_id, name=name.strip()))
-            save_data()
-            self.refresh_table()
+            request_save()
 
     def edit_category(self):
         selected = self.table.selectedItems()
@@ -60,13 +91,13 @@ class CategoriesDialog(QDialog):
             return
         row = selected[0].row()
         cat_id = int(self.table.item(row, 0).text())
-        cat = next((c for c in categories if c.id == cat_id), None)
+        cat = category_by_id(cat_id)
         if cat:
             name, ok = QInputDialog.getText(self, "Modifier Catégorie", "Nom:", text=cat.name)
             if ok and name.strip():
                 cat.name = name.strip()
-                save_data()
-                self.refresh_table()
+                categories.touch(cat)
+                request_save()
 
     def delete_category(self):
         selected = self.table.selectedItems()
@@ -75,12 +106,11 @@ class CategoriesDialog(QDialog):
             return
         row = selected[0].row()
         cat_id = int(self.table.item(row, 0).text())
-        cat = next((c for c in categories if c.id == cat_id), None)
+        cat = category_by_id(cat_id)
         if cat:
             reply = QMessageBox.question(self, "Confirmer", f"Supprimer {cat.name}?", QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
                 categories.remove(cat)
-                save_data()
-                self.refresh_table()
+                request_save()
 
 from PySide6.QtWidgets import QInputDialog
\ No newline at end of file
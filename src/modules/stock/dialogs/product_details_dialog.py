@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QPushButton
-from PySide6.QtCore import Qt
-from ....common.models import products, categories, suppliers, movements
+from ....common.indexes import category_name, supplier_name
+from ....common.movement_store import movement_columns
 
 class ProductDetailsDialog(QDialog):
     def __init__(self, product, parent=None):
@@ -14,9 +14,9 @@ class ProductDetailsDialog(QDialog):
         info_layout = QVBoxLayout()
         info_layout.addWidget(QLabel(f"Référence: {product.reference}"))
         info_layout.addWidget(QLabel(f"Nom: {product.name}"))
-        cat_name = next((c.name for c in categories if c.id == product.category_id), "")
+        cat_name = category_name(product.category_id)
         info_layout.addWidget(QLabel(f"Catégorie: {cat_name}"))
-        sup_name = next((s.name for s in suppliers if s.id == product.supplier_id), "")
+        sup_name = supplier_name(product.supplier_id)
         info_layout.addWidget(QLabel(f"Fournisseur: {sup_name}"))
         info_layout.addWidget(QLabel(f"Prix: {product.price:.2f} €"))
         info_layout.addWidget(QLabel(f"Description: {product.description}"))
@@ -41,9 +41,10 @@ class ProductDetailsDialog(QDialog):
         self.hist_table = QTableWidget()
         self.hist_table.setColumnCount(4)
         self.hist_table.setHorizontalHeaderLabels(["Date", "Type", "Quantité", "Raison"])
-        prod_movements = [m for m in movements if m.product_id == product.id]
+        movement_data = movement_columns()
+        prod_movements = movement_data.records(movement_data.select(product_id=product.id, order_by_date=True, descending=True))
         self.hist_table.setRowCount(len(prod_movements))
-        for i, m in enumerate(sorted(prod_movements, key=lambda x: x.date, reverse=True)):
+        for i, m in enumerate(prod_movements):
             self.hist_table.setItem(i, 0, QTableWidgetItem(m.date.strftime("%Y-%m-%d %H:%M")))
             self.hist_table.setItem(i, 1, QTableWidgetItem("Entrée" if m.type == "in" else "Sortie"))
             self.hist_table.setItem(i, 2, QTableWidgetItem(str(m.quantity)))
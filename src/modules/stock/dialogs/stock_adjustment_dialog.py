@@ -1,11 +1,14 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton, QMessageBox
 from PySide6.QtCore import Qt
 from ....common.models import products, movements, Movement
-from ....common.storage import save_data
+from ....common.indexes import product_by_id
+from ....common.persistence import request_save
+from ....common.storage import next_id
+from ..product_picker import ProductPicker
 from datetime import datetime
 
 class StockAdjustmentDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, product_id=None):
         super().__init__(parent)
         self.setWindowTitle("Ajustement Stock")
         self.setModal(True)
@@ -14,10 +17,10 @@ class StockAdjustmentDialog(QDialog):
         # Product
         prod_layout = QHBoxLayout()
         prod_layout.addWidget(QLabel("Produit:"))
-        self.prod_combo = QComboBox()
-        for p in products:
-            self.prod_combo.addItem(f"{p.reference} - {p.name}", p.id)
-        prod_layout.addWidget(self.prod_combo)
+        self.product_picker = ProductPicker()
+        if product_id is not None:
+            self.product_picker.set_product_id(product_id)
+        prod_layout.addWidget(self.product_picker)
         layout.addLayout(prod_layout)
 
         # Type
@@ -55,12 +58,12 @@ class StockAdjustmentDialog(QDialog):
 
     def adjust_stock(self):
         try:
-            prod_id = self.prod_combo.currentData()
+            prod_id = self.product_picker.product_id()
             type_ = self.type_combo.currentData()
             qty = int(self.qty_input.text())
             reason = self.reason_input.text().strip()
 
-            product = next((p for p in products if p.id == prod_id), None)
+            product = product_by_id(prod_id)
             if not product:
                 QMessageBox.warning(self, "Erreur", "Produit non trouvé")
                 return
@@ -73,9 +76,10 @@ class StockAdjustmentDialog(QDialog):
                     QMessageBox.warning(self, "Erreur", "Quantité insuffisante")
                     return
                 product.variants[0].quantity -= qty
+            products.touch(product)
 
             # Add movement
-            mov_id = max((m.id for m in movements), default=0) + 1
+            mov_id = next_id('movements')
             movement = Movement(
                 id=mov_id,
                 product_id=prod_id,
@@ -85,7 +89,7 @@ class StockAdjustmentDialog(QDialog):
             )
             movements.append(movement)
 
-            save_data()
+            request_save()
             self.accept()
         except ValueError:
             QMessageBox.warning(self, "Erreur", "Quantité doit être un nombre")
\ No newline at end of file
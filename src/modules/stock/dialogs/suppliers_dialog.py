@@ -1,6 +1,9 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QPushButton, QLineEdit, QMessageBox
 from ....common.models import suppliers, Supplier
-from ....common.storage import save_data
+from ....common.indexes import supplier_by_id
+from ....common.persistence import request_save
+from ....common.storage import next_id
+from ....common.events import change_bus, ADDED, UPDATED, REMOVED
 
 class SuppliersDialog(QDialog):
     def __init__(self, parent=None):
@@ -36,17 +39,46 @@ class SuppliersDialog(QDialog):
         layout.addLayout(btn_layout)
 
         self.refresh_table()
+        # Edits made here and elsewhere are applied row by row
+        change_bus.subscribe(self._on_change, 'suppliers')
+        self.finished.connect(lambda: change_bus.unsubscribe(self._on_change))
 
     def refresh_table(self):
         self.table.setRowCount(0)
         for sup in suppliers:
-            row = self.table.rowCount()
+            self._set_row(self.table.rowCount(), sup)
+
+    def _set_row(self, row, sup):
+        if row == self.table.rowCount():
             self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(str(sup.id)))
-            self.table.setItem(row, 1, QTableWidgetItem(sup.name))
-            self.table.setItem(row, 2, QTableWidgetItem(sup.contact))
-            self.table.setItem(row, 3, QTableWidgetItem(sup.email))
-            self.table.setItem(row, 4, QTableWidgetItem(sup.phone))
+        self.table.setItem(row, 0, QTableWidgetItem(str(sup.id)))
+        self.table.setItem(row, 1, QTableWidgetItem(sup.name))
+        self.table.setItem(row, 2, QTableWidgetItem(sup.contact))
+        self.table.setItem(row, 3, QTableWidgetItem(sup.email))
+        self.table.setItem(row, 4, QTableWidgetItem(sup.phone))
+
+    def _row_of(self, sup_id):
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, 0).text() == str(sup_id):
+                return row
+        return -1
+
+    def _on_change(self, event):
+        if event.kind == ADDED:
+            for sup in event.records:
+                self._set_row(self.table.rowCount(), sup)
+        elif event.kind == UPDATED:
+            for sup in event.records:
+                row = self._row_of(sup.id)
+                if row >= 0:
+                    self._set_row(row, sup)
+        elif event.kind == REMOVED:
+            for sup in event.records:
+                row = self._row_of(sup.id)
+                if row >= 0:
+                    self.table.removeRow(row)
+        else:
+            self.refresh_table()
 
     def add_supplier(self):
         # Simple add dialog
@@ -58,10 +90,9 @@ class SuppliersDialog(QDialog):
                 if ok3:
                     phone, ok4 = QInputDialog.getText(self, "Téléphone", "Téléphone:")
                     if ok4:
-                        sup_id = max((s.id for s in suppliers), default=0) + 1
+                        sup_id = next_id('suppliers')
                         suppliers.append(Supplier(id=sup_id, name=name.strip(), contact=contact.strip(), email=email.strip(), phone=phone.strip()))
-                        save_data()
-                        self.refresh_table()
+                        request_save()
 
     def edit_supplier(self):
         selected = self.table.selectedItems()
@@ -70,7 +101,7 @@ class SuppliersDialog(QDialog):
             return
         row = selected[0].row()
         sup_id = int(self.table.item(row, 0).text())
-        sup = next((s for s in suppliers if s.id == sup_id), None)
+        sup = supplier_by_id(sup_id)
         if sup:
             name, ok = QInputDialog.getText(self, "Modifier Fournisseur", "Nom:", text=sup.name)
             if ok and name.strip():
@@ -84,8 +115,8 @@ class SuppliersDialog(QDialog):
                             sup.contact = contact.strip()
                             sup.email = email.strip()
                             sup.phone = phone.strip()
-                            save_data()
-                            self.refresh_table()
+                            suppliers.touch(sup)
+                            request_save()
 
     def delete_supplier(self):
         selected = self.table.selectedItems()
@@ -94,12 +125,11 @@ class SuppliersDialog(QDialog):
             return
         row = selected[0].row()
         sup_id = int(self.table.item(row, 0).text())
-        sup = next((s for s in suppliers if s.id == sup_id), None)
+        sup = supplier_by_id(sup_id)
         if sup:
             reply = QMessageBox.question(self, "Confirmer", f"Supprimer {sup.name}?", QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
                 suppliers.remove(sup)
-                save_data()
-                self.refresh_table()
+                request_save()
 
 from PySide6.QtWidgets import QInputDialog
\ No newline at end of file
@@ -0,0 +1,80 @@
+from PySide6.QtCore import QSortFilterProxyModel
+from ...common.search import product_index, narrows
+
+class ProductFilterModel(QSortFilterProxyModel):
+    # Filters the product table on a search text (through the full-text
+    # index) and category / supplier ids. When the new filter only narrows
+    # the previous one (longer text, a category picked after "all"...), only
+    # the products that passed the previous filter are tested again.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setDynamicSortFilter(True)
+        self._text = ''
+        self._category_id = None
+        self._supplier_id = None
+        self._accepted = set()  # ids of the products shown, kept up to date row by row
+        self._visible = None  # source row -> shown, during set_filter()
+
+    def set_filter(self, text='', category_id=None, supplier_id=None):
+        text = text.strip()
+        if (text, category_id, supplier_id) == (self._text, self._category_id, self._supplier_id):
+            return
+        narrowing = narrows(self._text, text) \
+            and self._category_id in (None, category_id) and self._supplier_id in (None, supplier_id)
+        candidates = self._accepted if narrowing and self.is_filtering() else None
+        self._text = text
+        self._category_id = category_id
+        self._supplier_id = supplier_id
+
+        # Rows are tested here in one Python pass, filterAcceptsRow() then
+        # only reads the result
+        source = self.sourceModel()
+        if not self.is_filtering():
+            self._accepted = set()
+            self._visible = None
+        else:
+            if text:
+                found = product_index.scores(text).keys()
+                candidates = found if candidates is None else candidates & found
+            self._visible = [False] * source.rowCount()
+            self._accepted = set()
+            rows = ((source.row_of(pid), pid) for pid in candidates) if candidates is not None \
+                else enumerate(p.id for p in source.products())
+            for row, product_id in rows:
+                if row >= 0 and self._matches_ids(source.product_at(row)):
+                    self._visible[row] = True
+                    self._accepted.add(product_id)
+        self.invalidateRowsFilter()
+        self._visible = None
+
+    def is_filtering(self):
+        return bool(self._text) or self._category_id is not None or self._supplier_id is not None
+
+    def _matches_ids(self, product):
+        if self._category_id is not None and product.category_id != self._category_id:
+            return False
+        return self._supplier_id is None or product.supplier_id == self._supplier_id
+
+    def matches(self, product):
+        return self._matches_ids(product) and (not self._text or product_index.matches(product.id, self._text))
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._visible is not None:
+            return self._visible[source_row]
+        if not self.is_filtering():
+            return True
+        # Rows inserted or changed in the source since the last filter
+        product = self.sourceModel().product_at(source_row)
+        if self.matches(product):
+            self._accepted.add(product.id)
+            return True
+        self._accepted.discard(product.id)
+        return False
+
+    def sort(self, column, order):
+        # Sorted by the source model in one Python sort, instead of a
+        # lessThan() call per comparison
+        self.sourceModel().sort(column, order)
+
+    def product_at(self, row):
+        return self.sourceModel().product_at(self.mapToSource(self.index(row, 0)).row())
@@ -0,0 +1,90 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QComboBox
+from PySide6.QtCore import QTimer, Signal
+import heapq
+from ...common.models import products
+from ...common.indexes import product_by_id
+from ...common.search import search_products
+from ...common.events import change_bus, UPDATED, REMOVED
+
+# Products listed in the combo for a search; the search field narrows it
+PICKER_RESULTS = 50
+PICKER_DEBOUNCE_MS = 200
+
+class ProductPicker(QWidget):
+    # Search field over a combo of the best matching products, instead of
+    # a combo holding every product
+    product_changed = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Rechercher (nom, référence, SKU, code-barres...)")
+        layout.addWidget(self.search_input)
+        self.combo = QComboBox()
+        layout.addWidget(self.combo)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(PICKER_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.update_results)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.search_input.returnPressed.connect(self.update_results)
+        self.combo.currentIndexChanged.connect(lambda: self.product_changed.emit(self.product_id()))
+        self.update_results()
+
+    # Follows product changes while shown
+    def showEvent(self, event):
+        change_bus.subscribe(self._on_change, 'products')
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        change_bus.unsubscribe(self._on_change)
+        super().hideEvent(event)
+
+    def _on_change(self, event):
+        if event.kind == UPDATED:
+            for p in event.records:
+                index = self.combo.findData(p.id)
+                if index >= 0:
+                    self.combo.setItemText(index, f"{p.reference} - {p.name}")
+        elif event.kind == REMOVED and len(event.records) < self.combo.count():
+            for p in event.records:
+                index = self.combo.findData(p.id)
+                if index >= 0:
+                    self.combo.removeItem(index)
+        else:
+            # New products may rank among the results
+            self.search_timer.start()
+
+    def update_results(self):
+        self.search_timer.stop()
+        text = self.search_input.text().strip()
+        current = self.product_id()
+        if text:
+            results = search_products(text, PICKER_RESULTS)
+        else:
+            results = heapq.nsmallest(PICKER_RESULTS, products, key=lambda p: p.reference)
+        self.combo.blockSignals(True)
+        self.combo.clear()
+        for p in results:
+            self.combo.addItem(f"{p.reference} - {p.name}", p.id)
+        index = self.combo.findData(current)
+        self.combo.setCurrentIndex(index if index >= 0 else 0 if results else -1)
+        self.combo.blockSignals(False)
+        if self.product_id() != current:
+            self.product_changed.emit(self.product_id())
+
+    def product_id(self):
+        return self.combo.currentData()
+
+    def set_product_id(self, product_id):
+        index = self.combo.findData(product_id)
+        if index < 0:
+            product = product_by_id(product_id)
+            if product is None:
+                return
+            self.combo.insertItem(0, f"{product.reference} - {product.name}", product.id)
+            index = 0
+        self.combo.setCurrentIndex(index)
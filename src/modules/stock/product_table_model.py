@@ -0,0 +1,174 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from ...common.models import products, raw_value, RawRecords
+from ...common.events import change_bus, ADDED, UPDATED, REMOVED
+from ...common.indexes import category_name, supplier_name
+
+HEADERS = ["Référence", "Nom", "Catégorie", "Fournisseur", "Prix", "Quantité Totale", "Variants", "Actions"]
+COL_REFERENCE, COL_NAME, COL_CATEGORY, COL_SUPPLIER, COL_PRICE, COL_QUANTITY, COL_VARIANTS, COL_ACTIONS = range(8)
+
+# Raw value of a cell, for sorting
+SORT_ROLE = Qt.UserRole
+# Above this many updated rows, one dataChanged covers the whole table
+BULK_UPDATE_ROWS = 100
+
+def total_quantity(product):
+    # Reads loader dicts as is, so a row does not build its variants
+    variants = raw_value(product, 'variants')
+    if type(variants) is RawRecords:
+        return sum(v.get('quantity', 0) for v in variants)
+    return sum(v.quantity for v in variants)
+
+def variants_text(product):
+    variants = raw_value(product, 'variants')
+    if type(variants) is RawRecords:
+        return ", ".join(f"{v['size']}/{v['color']}: {v.get('quantity', 0)}" for v in variants)
+    return ", ".join(f"{v.size}/{v.color}: {v.quantity}" for v in variants)
+
+def _sort_value(product, column):
+    if column == COL_REFERENCE:
+        return product.reference
+    if column == COL_NAME:
+        return product.name.lower()
+    if column == COL_CATEGORY:
+        return category_name(product.category_id).lower()
+    if column == COL_SUPPLIER:
+        return supplier_name(product.supplier_id).lower()
+    if column == COL_PRICE:
+        return product.price
+    if column == COL_QUANTITY:
+        return total_quantity(product)
+    if column == COL_VARIANTS:
+        return variants_text(product)
+    return 0
+
+class ProductTableModel(QAbstractTableModel):
+    # Rows over the product store, formatted only when the view asks for
+    # them. Change events are applied as row inserts, removals and
+    # single-row dataChanged instead of rebuilding the table.
+    def __init__(self, store=products, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._rows = list(store)
+        self._row_of = {p.id: row for row, p in enumerate(self._rows)}
+        change_bus.subscribe(self._on_change, store.name, 'categories', 'suppliers')
+
+    def close(self):
+        change_bus.unsubscribe(self._on_change)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        product = self._rows[index.row()]
+        column = index.column()
+        if role == SORT_ROLE:
+            return _sort_value(product, column)
+        if role == Qt.TextAlignmentRole and column in (COL_PRICE, COL_QUANTITY):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role != Qt.DisplayRole:
+            return None
+        if column == COL_REFERENCE:
+            return product.reference
+        if column == COL_NAME:
+            return product.name
+        if column == COL_CATEGORY:
+            return category_name(product.category_id)
+        if column == COL_SUPPLIER:
+            return supplier_name(product.supplier_id)
+        if column == COL_PRICE:
+            return f"{product.price:.2f} €"
+        if column == COL_QUANTITY:
+            return str(total_quantity(product))
+        if column == COL_VARIANTS:
+            return variants_text(product)
+        return None
+
+    def product_at(self, row):
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def products(self):
+        # In row order
+        return self._rows
+
+    def row_of(self, product_id):
+        return self._row_of.get(product_id, -1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column < 0:
+            return
+        self.layoutAboutToBeChanged.emit()
+        ids_before = [p.id for p in self._rows]
+        self._rows.sort(key=lambda p: _sort_value(p, column), reverse=order == Qt.DescendingOrder)
+        self._reindex()
+        # Keep selections and the current index on the same products
+        persistent = self.persistentIndexList()
+        moved = [self.index(self._row_of[ids_before[i.row()]], i.column()) for i in persistent]
+        self.changePersistentIndexList(persistent, moved)
+        self.layoutChanged.emit()
+
+    def _reindex(self, start=0):
+        row_of = self._row_of
+        for row in range(start, len(self._rows)):
+            row_of[self._rows[row].id] = row
+
+    def emit_product_changed(self, product):
+        row = self._row_of.get(product.id)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+
+    def _on_change(self, event):
+        # Events may arrive after the store moved on (held events, a slice
+        # assignment), so rows are checked against _row_of
+        if event.entity != self.store.name:
+            self._on_names_changed(event)
+        elif event.kind == ADDED:
+            added = [p for p in event.records if p.id not in self._row_of]
+            if added:
+                start = len(self._rows)
+                self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+                self._rows.extend(added)
+                self._reindex(start)
+                self.endInsertRows()
+        elif event.kind == UPDATED:
+            if len(event.records) > BULK_UPDATE_ROWS:
+                self.dataChanged.emit(self.index(0, 0), self.index(len(self._rows) - 1, len(HEADERS) - 1))
+            else:
+                for product in event.records:
+                    self.emit_product_changed(product)
+        elif event.kind == REMOVED:
+            removed = [p for p in event.records if p.id in self._row_of]
+            if len(removed) == 1:
+                row = self._row_of.pop(removed[0].id)
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self._reindex(row)
+                self.endRemoveRows()
+            elif removed:
+                self.reset()
+        else:
+            self.reset()
+
+    def reset(self):
+        # Rebuild from the store: bulk removals, reloads, "Rafraîchir"
+        self.beginResetModel()
+        self._rows = list(self.store)
+        self._row_of = {}
+        self._reindex()
+        self.endResetModel()
+
+    def _on_names_changed(self, event):
+        # Category / supplier names are looked up when painting; new ones
+        # are not used by any product yet
+        if self._rows and event.kind != ADDED:
+            column = COL_CATEGORY if event.entity == 'categories' else COL_SUPPLIER
+            self.dataChanged.emit(self.index(0, column), self.index(len(self._rows) - 1, column))
@@ -1,10 +1,18 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QToolBar, QLineEdit, QLabel, QComboBox, QTabWidget, QFileDialog, QMessageBox, QInputDialog
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableView, QAbstractItemView, QToolBar, QLineEdit, QComboBox, QTabWidget, QFileDialog, QMessageBox, QInputDialog, QProgressDialog, QApplication
 from PySide6.QtGui import QAction
-from PySide6.QtCore import Qt
-from ...common.models import products, categories, suppliers, Category, Supplier
-from ...common.storage import load_data, save_data, export_csv, import_csv
+from PySide6.QtCore import Qt, QTimer
+from ...common.models import products, categories, suppliers, movements, Category, Supplier
+from ...common.storage import load_data, next_id
+from ...common.importers import import_csv
+from ...common.exporters import export_rows, export_json
+from ...common.export_worker import ExportTask
+from ...common.excel import export_xlsx, import_xlsx
+from ...common.persistence import request_save, flush
+from ...common.events import change_bus, ADDED, UPDATED, REMOVED
 from .dialogs.add_product_dialog import AddProductDialog
 from .dashboard_widget import DashboardWidget
+from .product_table_model import ProductTableModel
+from .product_filter_model import ProductFilterModel
 from .dialogs.barcode_dialog import BarcodeDialog
 from .dialogs.stock_adjustment_dialog import StockAdjustmentDialog
 from .dialogs.product_details_dialog import ProductDetailsDialog
@@ -13,7 +21,9 @@ from .dialogs.categories_dialog import CategoriesDialog
 from .dialogs.suppliers_dialog import SuppliersDialog
 from .dialogs.alerts_dialog import AlertsDialog
 from ...common.utils.print_labels import print_labels
-import json
+
+# Pause in typing after which the search filter runs
+SEARCH_DEBOUNCE_MS = 250
 
 class StockWidget(QWidget):
     def __init__(self):
@@ -72,6 +82,12 @@ class StockWidget(QWidget):
         self.export_csv_action = QAction("Exporter CSV", self)
         self.toolbar.addAction(self.export_csv_action)
 
+        self.import_excel_action = QAction("Importer Excel", self)
+        self.toolbar.addAction(self.import_excel_action)
+
+        self.export_excel_action = QAction("Exporter Excel", self)
+        self.toolbar.addAction(self.export_excel_action)
+
         self.refresh_action = QAction("Rafraîchir", self)
         self.toolbar.addAction(self.refresh_action)
 
@@ -100,10 +116,21 @@ class StockWidget(QWidget):
         self.search_layout.addWidget(self.supplier_filter)
 
         # Table
-        self.table = QTableWidget()
+        self.table = QTableView()
         table_layout.addWidget(self.table)
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(["Référence", "Nom", "Catégorie", "Fournisseur", "Prix", "Quantité Totale", "Variants", "Actions"])
+        self.table_model = ProductTableModel(parent=self)
+        self.filter_model = ProductFilterModel(self)
+        self.filter_model.setSourceModel(self.table_model)
+        self.table.setModel(self.filter_model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # Unsorted (store order) until a header is clicked
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        # Rows have a fixed height, so the view never measures them
+        self.table.verticalHeader().setDefaultSectionSize(self.table.verticalHeader().minimumSectionSize() + 8)
+        self.table.verticalHeader().hide()
 
         self.tabs.addTab(self.table_tab, "Table")
 
@@ -112,8 +139,11 @@ class StockWidget(QWidget):
         self.tabs.addTab(self.dashboard_tab, "Dashboard")
 
         # Load data
+        change_bus.subscribe(self._on_filter_names_changed, 'categories', 'suppliers')
+        # load_data() resets the table model and the dashboard through
+        # change_bus; only the filter combos are filled here
         load_data()
-        self.refresh_table()
+        self._fill_filters()
 
         # Connect signals
         self.add_action.triggered.connect(self.add_product)
@@ -132,157 +162,209 @@ class StockWidget(QWidget):
         self.import_csv_action.triggered.connect(self.import_csv)
         self.export_json_action.triggered.connect(self.export_json)
         self.export_csv_action.triggered.connect(self.export_csv)
+        self.import_excel_action.triggered.connect(self.import_excel)
+        self.export_excel_action.triggered.connect(self.export_excel)
         self.refresh_action.triggered.connect(self.refresh_table)
-        self.search_input.textChanged.connect(self.filter_table)
+        # Typing restarts the timer: the filter runs once the user pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.filter_table)
+        self.search_input.textChanged.connect(self.search_timer.start)
         self.category_filter.currentIndexChanged.connect(self.filter_table)
         self.supplier_filter.currentIndexChanged.connect(self.filter_table)
 
     def refresh_table(self):
-        self.table.setRowCount(0)
-        for product in products:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(product.reference))
-            self.table.setItem(row, 1, QTableWidgetItem(product.name))
-            cat_name = next((c.name for c in categories if c.id == product.category_id), "")
-            self.table.setItem(row, 2, QTableWidgetItem(cat_name))
-            sup_name = next((s.name for s in suppliers if s.id == product.supplier_id), "")
-            self.table.setItem(row, 3, QTableWidgetItem(sup_name))
-            self.table.setItem(row, 4, QTableWidgetItem(f"{product.price:.2f} €"))
-            total_qty = sum(v.quantity for v in product.variants)
-            self.table.setItem(row, 5, QTableWidgetItem(str(total_qty)))
-            variants_str = ", ".join(f"{v.size}/{v.color}: {v.quantity}" for v in product.variants)
-            self.table.setItem(row, 6, QTableWidgetItem(variants_str))
-            # Actions buttons would be added here
-
-        # Update filters
-        self.category_filter.clear()
-        self.category_filter.addItem("Toutes catégories")
-        for cat in categories:
-            self.category_filter.addItem(cat.name)
-
-        self.supplier_filter.clear()
-        self.supplier_filter.addItem("Tous fournisseurs")
-        for sup in suppliers:
-            self.supplier_filter.addItem(sup.name)
-
-        # Update dashboard
+        # The table model, the filters and the dashboard follow the stores
+        # through change_bus; "Rafraîchir" rebuilds all of them anyway
+        self.table_model.reset()
+        self._fill_filters()
         self.dashboard_tab.update_dashboard()
 
+    def _fill_filters(self):
+        self._fill_filter(self.category_filter, "Toutes catégories", categories)
+        self._fill_filter(self.supplier_filter, "Tous fournisseurs", suppliers)
+
+    def _fill_filter(self, combo, label, records):
+        # Keeps the current selection when it still exists
+        current = combo.currentData()
+        combo.blockSignals(True)
+        combo.clear()
+        combo.addItem(label)
+        for record in records:
+            combo.addItem(record.name, record.id)
+        index = combo.findData(current) if current is not None else -1
+        combo.setCurrentIndex(max(index, 0))
+        combo.blockSignals(False)
+        if combo.currentData() != current:
+            self.filter_table()
+
+    def _on_filter_names_changed(self, event):
+        if event.entity == 'categories':
+            combo, label = self.category_filter, "Toutes catégories"
+        else:
+            combo, label = self.supplier_filter, "Tous fournisseurs"
+        if event.kind == ADDED:
+            for record in event.records:
+                if combo.findData(record.id) < 0:
+                    combo.addItem(record.name, record.id)
+        elif event.kind == UPDATED:
+            for record in event.records:
+                index = combo.findData(record.id)
+                if index >= 0:
+                    combo.setItemText(index, record.name)
+        elif event.kind == REMOVED:
+            # Removing the selected entry falls back to another one and
+            # refilters through currentIndexChanged
+            for record in event.records:
+                index = combo.findData(record.id)
+                if index >= 0:
+                    combo.removeItem(index)
+        else:
+            self._fill_filter(combo, label, event.records)
+
     def filter_table(self):
-        search_text = self.search_input.text().lower()
-        cat_filter = self.category_filter.currentText()
-        sup_filter = self.supplier_filter.currentText()
-
-        for row in range(self.table.rowCount()):
-            show = True
-            if search_text:
-                name = self.table.item(row, 1).text().lower()
-                ref = self.table.item(row, 0).text().lower()
-                if search_text not in name and search_text not in ref:
-                    show = False
-            if cat_filter != "Toutes catégories" and self.table.item(row, 2).text() != cat_filter:
-                show = False
-            if sup_filter != "Tous fournisseurs" and self.table.item(row, 3).text() != sup_filter:
-                show = False
-            self.table.setRowHidden(row, not show)
+        self.search_timer.stop()
+        self.filter_model.set_filter(self.search_input.text(), self.category_filter.currentData(),
+                                     self.supplier_filter.currentData())
+
+    def selected_product(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            QMessageBox.warning(self, "Erreur", "Sélectionnez un produit")
+            return None
+        return self.filter_model.product_at(rows[0].row())
 
     def add_product(self):
         dialog = AddProductDialog(self)
-        if dialog.exec():
-            self.refresh_table()
+        dialog.exec()
 
     def edit_product(self):
-        selected = self.table.selectedItems()
-        if not selected:
-            QMessageBox.warning(self, "Erreur", "Sélectionnez un produit")
-            return
-        row = selected[0].row()
-        ref = self.table.item(row, 0).text()
-        product = next((p for p in products if p.reference == ref), None)
+        product = self.selected_product()
         if product:
             dialog = AddProductDialog(self, product)
-            if dialog.exec():
-                self.refresh_table()
+            dialog.exec()
 
     def delete_product(self):
-        selected = self.table.selectedItems()
-        if not selected:
-            QMessageBox.warning(self, "Erreur", "Sélectionnez un produit")
-            return
-        row = selected[0].row()
-        ref = self.table.item(row, 0).text()
-        product = next((p for p in products if p.reference == ref), None)
+        product = self.selected_product()
         if product:
             reply = QMessageBox.question(self, "Confirmer", f"Supprimer {product.name}?", QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
                 products.remove(product)
-                save_data()
-                self.refresh_table()
+                request_save()
 
     def adjust_stock(self):
-        dialog = StockAdjustmentDialog(self)
-        if dialog.exec():
-            self.refresh_table()
+        # Preselects the selected product, if any
+        rows = self.table.selectionModel().selectedRows()
+        product = self.filter_model.product_at(rows[0].row()) if rows else None
+        dialog = StockAdjustmentDialog(self, product.id if product else None)
+        dialog.exec()
 
     def view_details(self):
-        selected = self.table.selectedItems()
-        if not selected:
-            QMessageBox.warning(self, "Erreur", "Sélectionnez un produit")
-            return
-        row = selected[0].row()
-        ref = self.table.item(row, 0).text()
-        product = next((p for p in products if p.reference == ref), None)
+        product = self.selected_product()
         if product:
             dialog = ProductDetailsDialog(product, self)
             dialog.exec()
 
     def generate_barcode(self):
-        selected = self.table.selectedItems()
-        if not selected:
-            QMessageBox.warning(self, "Erreur", "Sélectionnez un produit")
-            return
-        row = selected[0].row()
-        ref = self.table.item(row, 0).text()
-        dialog = BarcodeDialog(ref, self)
-        dialog.exec()
+        product = self.selected_product()
+        if product:
+            dialog = BarcodeDialog(product.reference, self)
+            dialog.exec()
 
     def import_csv(self):
+        labels = {"Produits": 'products', "Catégories": 'categories', "Fournisseurs": 'suppliers',
+                  "Mouvements": 'movements'}
+        label, ok = QInputDialog.getItem(self, "Importer CSV", "Données:", list(labels), 0, False)
+        if not ok:
+            return
+        data_type = labels[label]
+        options = {}
+        if data_type == 'movements':
+            answer = QMessageBox.question(self, "Importer CSV", "Mettre à jour les quantités en stock ?")
+            options['update_stock'] = answer == QMessageBox.Yes
         file, _ = QFileDialog.getOpenFileName(self, "Importer CSV", "", "CSV (*.csv)")
         if file:
-            try:
-                import_csv(file, 'products')
-                load_data()
-                self.refresh_table()
-                QMessageBox.information(self, "Succès", "Import réussi")
-            except Exception as e:
-                QMessageBox.warning(self, "Erreur", f"Erreur lors de l'import: {str(e)}")
+            self.run_import(lambda progress: [(label, import_csv(file, data_type, progress=progress, commit=flush,
+                                                                         **options))])
+
+    def import_excel(self):
+        file, _ = QFileDialog.getOpenFileName(self, "Importer Excel", "", "Excel (*.xlsx)")
+        if file:
+            self.run_import(lambda progress: import_xlsx(file, progress=progress, commit=flush))
+
+    def run_import(self, run):
+        # run(progress) returns [(title, ImportReport)]
+        progress = QProgressDialog("Import en cours...", None, 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(fraction, report):
+            progress.setValue(int(fraction * 100))
+            progress.setLabelText(f"Import en cours... {report.rows} lignes")
+            QApplication.processEvents()
+
+        try:
+            # Views are updated once, when the import is over
+            with change_bus.hold():
+                reports = run(on_progress)
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Erreur lors de l'import: {str(e)}")
+            return
+        finally:
+            progress.close()
+        summary = "\n\n".join(f"{title}: {report.summary()}" for title, report in reports)
+        if any(report.error_count for _, report in reports):
+            QMessageBox.warning(self, "Import terminé avec erreurs", summary)
+        else:
+            QMessageBox.information(self, "Succès", summary)
 
     def export_json(self):
-        file, _ = QFileDialog.getSaveFileName(self, "Exporter JSON", "", "JSON (*.json)")
+        file, _ = QFileDialog.getSaveFileName(
+            self, "Exporter JSON", "",
+            "JSON (*.json);;JSON Lines (*.jsonl);;JSON compressé (*.json.gz);;JSON Lines compressé (*.jsonl.gz)")
         if file:
-            try:
-                with open(file, 'w') as f:
-                    data = []
-                    for p in products:
-                        d = p.__dict__.copy()
-                        d['created_at'] = d['created_at'].isoformat()
-                        d['updated_at'] = d['updated_at'].isoformat()
-                        d['variants'] = [v.__dict__ for v in d['variants']]
-                        data.append(d)
-                    json.dump(data, f, indent=4)
-                QMessageBox.information(self, "Succès", "Export réussi")
-            except Exception as e:
-                QMessageBox.warning(self, "Erreur", f"Erreur lors de l'export: {str(e)}")
+            self.run_export(export_json, file, 'products', records=list(products))
 
     def export_csv(self):
-        file, _ = QFileDialog.getSaveFileName(self, "Exporter CSV", "", "CSV (*.csv)")
+        file, _ = QFileDialog.getSaveFileName(self, "Exporter CSV", "", "CSV (*.csv);;Parquet (*.parquet)")
+        if file:
+            self.run_export(export_rows, file, 'products', records=list(products))
+
+    def export_excel(self):
+        file, _ = QFileDialog.getSaveFileName(self, "Exporter Excel", "", "Excel (*.xlsx)")
         if file:
-            try:
-                export_csv(file, 'products')
-                QMessageBox.information(self, "Succès", "Export réussi")
-            except Exception as e:
-                QMessageBox.warning(self, "Erreur", f"Erreur lors de l'export: {str(e)}")
+            self.run_export(export_xlsx, file, records={'products': list(products), 'movements': list(movements)})
+
+    def run_export(self, export, *args, **kwargs):
+        # The export runs on a worker thread; callers pass copies of the
+        # store lists (records=...) taken here on the GUI thread
+        task = ExportTask(export, *args, parent=self, **kwargs)
+        progress = QProgressDialog("Export en cours...", "Annuler", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(task.cancel)
+        task.progress.connect(progress.setValue)
+
+        def done():
+            progress.canceled.disconnect(task.cancel)
+            progress.close()
+            task.deleteLater()
+            self._export_task = None
+
+        def on_finished(count):
+            done()
+            QMessageBox.information(self, "Succès", f"Export réussi ({count} lignes)")
+
+        def on_failed(message):
+            done()
+            QMessageBox.warning(self, "Erreur", f"Erreur lors de l'export: {message}")
+
+        task.finished.connect(on_finished)
+        task.failed.connect(on_failed)
+        task.cancelled.connect(done)
+        self._export_task = task
+        task.start()
 
     def open_settings(self):
         dialog = SettingsDialog(self)
@@ -291,28 +373,24 @@ class StockWidget(QWidget):
     def add_category(self):
         name, ok = QInputDialog.getText(self, "Ajouter Catégorie", "Nom de la catégorie:")
         if ok and name.strip():
-            cat_id = max((c.id for c in categories), default=0) + 1
+            cat_id = next_id('categories')
             categories.append(Category(id=cat_id, name=name.strip()))
-            save_data()
-            self.refresh_table()
+            request_save()
 
     def add_supplier(self):
         name, ok = QInputDialog.getText(self, "Ajouter Fournisseur", "Nom du fournisseur:")
         if ok and name.strip():
-            sup_id = max((s.id for s in suppliers), default=0) + 1
+            sup_id = next_id('suppliers')
             suppliers.append(Supplier(id=sup_id, name=name.strip()))
-            save_data()
-            self.refresh_table()
+            request_save()
 
     def manage_categories(self):
         dialog = CategoriesDialog(self)
         dialog.exec()
-        self.refresh_table()  # Update filters
 
     def manage_suppliers(self):
         dialog = SuppliersDialog(self)
         dialog.exec()
-        self.refresh_table()  # Update filters
 
     def show_alerts(self):
         dialog = AlertsDialog(self)